@@ -0,0 +1,79 @@
+"""Measures CLI startup cost: the import time of cli.cli and the wall time of 'dblinker --version'.
+
+Run from the repository root:
+
+    python benchmarks/cli_startup.py [--runs 20] [--max-version-ms 150]
+
+Building the CLI parsers should stay free of psycopg, psycopg_pool and asyncio, the
+database drivers are only imported once a subcommand is dispatched.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+# Modules that must not be imported just to build the parser or print the version.
+HEAVY_MODULES = ('psycopg', 'psycopg_pool', 'asyncio', 'tests.database_integration_test')
+
+
+def run_python(code_or_args, runs):
+    """Runs a python subprocess several times, returning the wall times in milliseconds."""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *code_or_args], env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def heavy_imports():
+    """Lists the heavy modules that end up imported by building the CLI parsers."""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    code = "import sys, cli.cli; cli.cli.CLI(); print('\\n'.join(sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+    loaded = set(output.stdout.split())
+    return [module for module in HEAVY_MODULES if module in loaded]
+
+
+def summarize(label, timings):
+    print(f"{label:<28} median {statistics.median(timings):7.1f} ms   "
+          f"min {min(timings):7.1f} ms   max {max(timings):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dblinker CLI startup.')
+    parser.add_argument('--runs', type=int, default=20, help='Number of runs per measurement.')
+    parser.add_argument('--max-version-ms', type=float, default=None,
+                        help='Exit non-zero if the median --version wall time exceeds this.')
+    args = parser.parse_args()
+
+    baseline = run_python(['-c', 'pass'], args.runs)
+    import_cli = run_python(['-c', 'import cli.cli'], args.runs)
+    version = run_python(['-m', 'cli.cli', '--version'], args.runs)
+    help_ = run_python(['-m', 'cli.cli', '--help'], args.runs)
+
+    summarize('python -c pass', baseline)
+    summarize('import cli.cli', import_cli)
+    summarize('dblinker --version', version)
+    summarize('dblinker --help', help_)
+    print(f"{'import cli.cli overhead':<28} median "
+          f"{statistics.median(import_cli) - statistics.median(baseline):7.1f} ms")
+
+    failed = False
+    loaded = heavy_imports()
+    if loaded:
+        print(f"FAIL: building the CLI parsers loads {', '.join(loaded)}")
+        failed = True
+    if args.max_version_ms is not None and statistics.median(version) > args.max_version_ms:
+        print(f"FAIL: dblinker --version median exceeds {args.max_version_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
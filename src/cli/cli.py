@@ -1,11 +1,21 @@
-from .cli_toplevel_parser import cli_toplevel_parser
-from .cli_settings_subparser import cli_settings_subparser
-from .cli_dbconfig_subparser import cli_dbconfig_subparser
-from .cli_db_server_config_subparser import  cli_db_server_config_subparser
+import sys
 
 
 class CLI:
     def __init__(self):
+        # argparse and the subparser modules are imported here so 'dblinker --version' can skip them.
+        from .cli_toplevel_parser import cli_toplevel_parser
+        from .cli_settings_subparser import cli_settings_subparser
+        from .cli_dbconfig_subparser import cli_dbconfig_subparser
+        from .cli_db_server_config_subparser import cli_db_server_config_subparser
+        from .cli_load_subparser import cli_load_subparser
+        from .cli_stats_subparser import cli_stats_subparser
+        from .cli_bench_subparser import cli_bench_subparser
+        from .cli_scan_subparser import cli_scan_subparser
+        from .cli_export_subparser import cli_export_subparser
+        from .cli_transfer_subparser import cli_transfer_subparser
+        from .cli_slowlog_subparser import cli_slowlog_subparser
+
         # We need the main top level parser.
         self.parser = cli_toplevel_parser()
         # We attach a 'sub-parser container' to hold all subparsers, e.g. the subparser that handles settings.
@@ -14,6 +24,13 @@ class CLI:
         cli_settings_subparser(self.subparsers)
         cli_dbconfig_subparser(self.subparsers)
         cli_db_server_config_subparser(self.subparsers)
+        cli_load_subparser(self.subparsers)
+        cli_stats_subparser(self.subparsers)
+        cli_bench_subparser(self.subparsers)
+        cli_scan_subparser(self.subparsers)
+        cli_export_subparser(self.subparsers)
+        cli_transfer_subparser(self.subparsers)
+        cli_slowlog_subparser(self.subparsers)
 
     def run(self):
         # Parse all arguments from the command line into argparse.
@@ -36,6 +53,11 @@ class CLI:
 
 
 def main():
+    # Health checks call 'dblinker --version' constantly, answer it without building any parsers.
+    if sys.argv[1:] == ['--version']:
+        from dblinker import __version__
+        print(f"dblinker {__version__}")
+        return
     cli = CLI()
     cli.run()
 
@@ -0,0 +1,26 @@
+def cli_bench_subparser(subparsers):
+    bench_parser = subparsers.add_parser('bench',
+                                         help='Benchmark the connection types of a database configuration.')
+
+    bench_parser.add_argument('--filepath', required=True, help='Path to the database configuration file.')
+    bench_parser.add_argument('--workloads', default='select1,point_lookup,bulk_insert,mixed',
+                              help='Comma separated workloads: select1, point_lookup, bulk_insert, mixed.')
+    bench_parser.add_argument('--types', default=None,
+                              help='Comma separated connection types, defaults to every type the backend supports.')
+    bench_parser.add_argument('--concurrency', default='1,4,16', help='Comma separated concurrency levels.')
+    bench_parser.add_argument('--duration', type=float, default=2.0,
+                              help='Seconds each workload runs for at each concurrency level.')
+    bench_parser.add_argument('--json', dest='json_path', default=None, help='Also write the results to a JSON file.')
+    bench_parser.set_defaults(func=bench_handler)
+
+
+def bench_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    from dblinker.managers.benchmark_manager import BenchmarkManager
+    benchmark_manager = BenchmarkManager(duration=args.duration)
+
+    benchmark_manager.run(args.filepath,
+                          workloads=[w.strip() for w in args.workloads.split(',') if w.strip()],
+                          concurrency_levels=[int(c) for c in args.concurrency.split(',') if c.strip()],
+                          connection_types=[t.strip() for t in args.types.split(',')] if args.types else None,
+                          json_path=args.json_path)
@@ -1,20 +1,29 @@
-from dblinker.managers.db_server_config_manager import DBServerConfigManager
-
-
 def cli_db_server_config_subparser(subparsers):
-    db_server_config_manager = DBServerConfigManager()
-
     db_server_config_parser = subparsers.add_parser('dbserverconfig',
                                                     help='Generate suggested server configuration entries')
 
     db_server_config_parser.add_argument('--filepath', required=True,
                                          help='Path to the config you want settings generated.')
-    db_server_config_parser.set_defaults(func=db_server_config_create_handler,
-                                         db_server_config_manager=db_server_config_manager)
+    db_server_config_parser.add_argument('--config-dir', dest='config_dir',
+                                         help='Directory of dbconfigs whose pools on the same server are summed '
+                                              'into max_connections.')
+    db_server_config_parser.add_argument('--instances', type=int, default=1,
+                                         help='Application processes running each config, pools are per process. '
+                                              'Default: 1')
+    db_server_config_parser.add_argument('--ram', help='RAM of the database server, e.g. 16GB. '
+                                                       'Default: detected on this machine')
+    db_server_config_parser.add_argument('--cpus', type=int, help='CPU cores of the database server. '
+                                                                  'Default: detected on this machine')
+    db_server_config_parser.add_argument('--storage', choices=['ssd', 'hdd', 'san'],
+                                         help='Storage type of the database server. Default: detected on this machine')
+    db_server_config_parser.set_defaults(func=db_server_config_create_handler)
 
 
 def db_server_config_create_handler(args):
-    db_server_config_manager = args.db_server_config_manager
+    # Imported on dispatch so that other commands don't pay for it.
+    from dblinker.managers.db_server_config_manager import DBServerConfigManager
+    db_server_config_manager = DBServerConfigManager()
 
     if args.filepath:
-        db_server_config_manager.get_server_config(args.filepath)
+        db_server_config_manager.get_server_config(args.filepath, ram=args.ram, cpus=args.cpus, storage=args.storage,
+                                                   config_dir=args.config_dir, instances=args.instances)
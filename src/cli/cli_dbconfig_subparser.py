@@ -1,11 +1,4 @@
-from dblinker.managers.dbconfig_manager import DBConfigManager
-from pathlib import Path
-
-
 def cli_dbconfig_subparser(subparsers):
-    dbconfig_manager = DBConfigManager()
-
-
     dbconfig_parser = subparsers.add_parser('dbconfig', help='Manage database configurations')
     # Note, the following line is adding a subparser to this subparser which is allowed.
     dbconfig_subparsers = dbconfig_parser.add_subparsers(dest='dbconfig_command', help='dbconfig commands')
@@ -16,18 +9,35 @@ def cli_dbconfig_subparser(subparsers):
                                help='Database type for the configuration template.')
     create_parser.add_argument('--filepath', required=True,
                                help='Path to where you want your configuration file created.')
-    create_parser.set_defaults(func=dbconfig_create_handler, dbconfig_manager=dbconfig_manager)
+    create_parser.set_defaults(func=dbconfig_create_handler)
 
     # The "test" subcommand
     test_parser = dbconfig_subparsers.add_parser('test',
-                                                 help='Test the database connection using a configuration file.')
-    test_parser.add_argument('--filepath', required=True, help='Path to the configuration file you want to test.')
-    test_parser.set_defaults(func=dbconfig_test_handler, dbconfig_manager=dbconfig_manager)
+                                                 help='Test database connections using configuration files.')
+    test_parser.add_argument('--filepath', required=True,
+                             help="A configuration file, a directory of them or a quoted glob such as 'conf/*.yaml'.")
+    test_parser.add_argument('--timeout', type=float, default=5.0, help='Seconds allowed per target.')
+    test_parser.add_argument('--concurrency', type=int, default=64, help='Targets probed at the same time.')
+    test_parser.add_argument('--format', dest='output_format', choices=['table', 'json', 'csv'], default='table',
+                             help='Output format.')
+    test_parser.set_defaults(func=dbconfig_test_handler)
+
+    # The "list" subcommand
+    list_parser = dbconfig_subparsers.add_parser('list', help='List the named connections of a config directory.')
+    list_parser.add_argument('--dir', dest='directory',
+                             help='Directory of configuration files. Default: appConnectionConfigDir in app settings')
+    list_parser.set_defaults(func=dbconfig_list_handler)
 
 
+def get_dbconfig_manager():
+    # The manager and its database drivers are only imported once a dbconfig command is dispatched.
+    from dblinker.managers.dbconfig_manager import DBConfigManager
+    return DBConfigManager()
+
 
 def dbconfig_create_handler(args):
-    dbconfig_manager = args.dbconfig_manager
+    from pathlib import Path
+    dbconfig_manager = get_dbconfig_manager()
     filepath = Path(args.filepath)
     if filepath.exists():
         print(f'Configuration file already exists: {filepath}\nEdit this file to update settings.')
@@ -37,5 +47,26 @@ def dbconfig_create_handler(args):
 
 
 def dbconfig_test_handler(args):
-    dbconfig_manager = args.dbconfig_manager
-    dbconfig_manager.test_connection(args.filepath)
+    import sys
+    # Every target is probed with one short-lived connection, pools are never built for a health check.
+    from dblinker.managers.health_check_manager import HealthCheckManager
+    health_check_manager = HealthCheckManager(timeout=args.timeout, concurrency=args.concurrency)
+
+    failures = health_check_manager.check(args.filepath, output_format=args.output_format)
+    # A non-zero exit status lets scripts and monitoring act on unhealthy targets.
+    if failures:
+        sys.exit(1)
+
+
+def dbconfig_list_handler(args):
+    import sys
+    # Listing only reads the config files, no connection is opened.
+    from dblinker.connections.connection_catalog import ConnectionCatalog
+    catalog = ConnectionCatalog(args.directory)
+
+    entries = catalog.entries()
+    for entry in entries:
+        print(f"  {entry.name:<24} {entry.database_type:<10} {entry.connection_type:<10} {entry.path}")
+    print(f"{len(entries)} connections in {catalog.directory}")
+    for path, error in catalog.errors.items():
+        print(f"  skipped {path}: {error}", file=sys.stderr)
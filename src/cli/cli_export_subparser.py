@@ -0,0 +1,31 @@
+def cli_export_subparser(subparsers):
+    export_parser = subparsers.add_parser('export', help='Export a query or table into compressed files using COPY TO.')
+
+    export_parser.add_argument('--filepath', required=True, help='Path to the database configuration file.')
+    source = export_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--query', help='SELECT statement whose rows are exported.')
+    source.add_argument('--table', help='Table to export in full, optionally schema qualified.')
+    export_parser.add_argument('--output', required=True,
+                               help='Output file, e.g. exports/orders.csv. Parts are numbered with --max-size.')
+    export_parser.add_argument('--format', dest='file_format', choices=['csv', 'text', 'binary'], default='csv',
+                               help='COPY format of the files.')
+    export_parser.add_argument('--compress', dest='compression', choices=['gzip', 'zstd'], default=None,
+                               help='Compress the files, zstd needs the zstandard package.')
+    export_parser.add_argument('--level', type=int, default=None,
+                               help='Compression level. Default: 1 for gzip, 3 for zstd')
+    export_parser.add_argument('--max-size', dest='max_size', default=None,
+                               help='Start a new file once one reaches this size on disk, e.g. 512MB.')
+    export_parser.add_argument('--header', action='store_true', help='Start every csv file with a header line.')
+    export_parser.set_defaults(func=export_handler)
+
+
+def export_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    from dblinker.managers.export_manager import ExportManager
+    from dblinker.serversettings.host_profile import parse_size
+    export_manager = ExportManager()
+
+    max_size = parse_size(args.max_size) if args.max_size else None
+    export_manager.export(args.filepath, args.output, query=args.query, table=args.table,
+                          file_format=args.file_format, compression=args.compression, max_size=max_size,
+                          level=args.level, header=args.header)
@@ -0,0 +1,21 @@
+def cli_load_subparser(subparsers):
+    load_parser = subparsers.add_parser('load', help='Bulk load a file into a table using COPY FROM STDIN.')
+
+    load_parser.add_argument('--filepath', required=True, help='Path to the database configuration file.')
+    load_parser.add_argument('--table', required=True, help='Target table, optionally schema qualified.')
+    load_parser.add_argument('--source', required=True, help='Path to the file to load.')
+    load_parser.add_argument('--format', dest='file_format', choices=['csv', 'text', 'binary'], default='csv',
+                             help='Format of the source file.')
+    load_parser.add_argument('--columns', help='Comma separated target columns, defaults to all columns in order.')
+    load_parser.add_argument('--header', action='store_true', help='Skip the header line of a csv file.')
+    load_parser.set_defaults(func=load_handler)
+
+
+def load_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    from dblinker.managers.bulk_load_manager import BulkLoadManager
+    bulk_load_manager = BulkLoadManager()
+
+    columns = [column.strip() for column in args.columns.split(',')] if args.columns else None
+    bulk_load_manager.load(args.filepath, args.table, args.source, columns=columns, file_format=args.file_format,
+                           header=args.header)
@@ -0,0 +1,35 @@
+def cli_scan_subparser(subparsers):
+    scan_parser = subparsers.add_parser('scan', help='Export a table in parallel partitions across worker processes.')
+
+    scan_parser.add_argument('--filepath', required=True, help='Path to the database configuration file.')
+    scan_parser.add_argument('--table', required=True, help='Table to scan, optionally schema qualified.')
+    scan_parser.add_argument('--output-dir', dest='output_dir', required=True,
+                             help='Directory that receives one file per partition.')
+    scan_parser.add_argument('--format', dest='file_format', choices=['csv', 'text', 'binary'], default='csv',
+                             help='COPY format of the partition files.')
+    scan_parser.add_argument('--columns', help='Comma separated columns, defaults to all columns.')
+    scan_parser.add_argument('--where', help='SQL condition rows must match, e.g. "created_at >= \'2024-01-01\'".')
+    scan_parser.add_argument('--mode', choices=['ctid', 'key'], default='ctid',
+                             help='Split by physical block ranges (PostgreSQL 14+) or by ranges of --key.')
+    scan_parser.add_argument('--key', help='Column to split on in key mode, ideally indexed.')
+    scan_parser.add_argument('--workers', type=int, default=None, help='Worker processes. Default: CPU count')
+    scan_parser.add_argument('--partitions', type=int, default=None,
+                             help='Number of partitions. Default: 4 per worker')
+    scan_parser.add_argument('--no-snapshot', dest='consistent', action='store_false',
+                             help="Don't share one snapshot between partitions, e.g. on servers that can't export one.")
+    scan_parser.set_defaults(func=scan_handler)
+
+
+def scan_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    import time
+    from dblinker.managers.parallel_scan_manager import ParallelScanManager
+    parallel_scan_manager = ParallelScanManager(workers=args.workers, partitions=args.partitions,
+                                                consistent=args.consistent)
+
+    columns = [column.strip() for column in args.columns.split(',')] if args.columns else None
+    start = time.perf_counter()
+    results = parallel_scan_manager.scan(args.filepath, args.table, columns=columns, where=args.where,
+                                         mode=args.mode, key=args.key, output_dir=args.output_dir,
+                                         file_format=args.file_format)
+    parallel_scan_manager.print_results(results, time.perf_counter() - start)
@@ -1,7 +1,3 @@
-import argparse
-from dblinker.managers.settings_manager import SettingsManager
-
-
 def cli_settings_subparser(subparsers):
     # Create a subparser for the settings command
     subparser = subparsers.add_parser('settings', help='Manage application settings.')
@@ -14,6 +10,7 @@ def cli_settings_subparser(subparsers):
 
 
 def settings_subparser_handle(args):
+    from dblinker.managers.settings_manager import SettingsManager
     settings_manager = SettingsManager()
 
     if args.helloworld:
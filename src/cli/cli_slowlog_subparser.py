@@ -0,0 +1,24 @@
+def cli_slowlog_subparser(subparsers):
+    slowlog_parser = subparsers.add_parser('slowlog', help='Summarize slow query log files by statement fingerprint.')
+
+    slowlog_parser.add_argument('--file', dest='files', action='append', required=True,
+                                help="Slow query log written with slowlog_settings, repeat for several files.")
+    slowlog_parser.add_argument('--sort', choices=['total', 'mean', 'p99', 'count'], default='total',
+                                help='Order fingerprints by total, mean or p99 time, or by count. Default: total')
+    slowlog_parser.add_argument('--limit', type=int, default=20, help='Fingerprints shown. Default: 20')
+    slowlog_parser.add_argument('--slow-only', dest='slow_only', action='store_true',
+                                help='Leave out sampled statements that were under the threshold.')
+    slowlog_parser.add_argument('--connection', help='Only entries logged by this connectionName.')
+    slowlog_parser.add_argument('--plans', dest='show_plans', action='store_true',
+                                help='Print the most recent captured plan of each fingerprint.')
+    slowlog_parser.set_defaults(func=slowlog_handler)
+
+
+def slowlog_handler(args):
+    # Reading the logs needs no database driver.
+    from dblinker.managers.slowlog_manager import SlowLogManager
+    slowlog_manager = SlowLogManager()
+
+    summary = slowlog_manager.summarize(args.files, slow_only=args.slow_only, connection=args.connection,
+                                        sort=args.sort)
+    slowlog_manager.print_summary(summary, limit=args.limit, show_plans=args.show_plans)
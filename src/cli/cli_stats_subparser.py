@@ -0,0 +1,21 @@
+def cli_stats_subparser(subparsers):
+    stats_parser = subparsers.add_parser('stats',
+                                         help='Exercise a database configuration and print pool and query metrics.')
+
+    stats_parser.add_argument('--filepath', required=True, help='Path to the database configuration file.')
+    stats_parser.add_argument('--query', default='SELECT 1', help='Statement to run, defaults to SELECT 1.')
+    stats_parser.add_argument('--count', type=int, default=100, help='Number of times to run the statement.')
+    stats_parser.add_argument('--concurrency', type=int, default=4,
+                              help='Concurrent queries for pool connection types.')
+    stats_parser.add_argument('--format', dest='output_format', choices=['text', 'json', 'prometheus'],
+                              default='text', help='Output format.')
+    stats_parser.set_defaults(func=stats_handler)
+
+
+def stats_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    from dblinker.managers.stats_manager import StatsManager
+    stats_manager = StatsManager()
+
+    stats_manager.print_stats(args.filepath, query=args.query, count=args.count, concurrency=args.concurrency,
+                              output_format=args.output_format)
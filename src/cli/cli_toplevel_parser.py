@@ -1,5 +1,20 @@
 import argparse
-from dblinker.managers.toplevel_manager import ToplevelManager
+
+
+class LazyVersionAction(argparse.Action):
+    """Prints the package version, resolving it only when --version is actually given."""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help=None):
+        super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message=f"{parser.prog} {get_version()}\n")
+
+
+def get_version():
+    # dblinker/__init__.py is tiny, reading __version__ from it avoids the cost of importlib.metadata.
+    from dblinker import __version__
+    return __version__
 
 
 def cli_toplevel_parser():
@@ -25,11 +40,8 @@ def top_level_parser_arguments(parser):
     parser.add_argument(
         # add --version argument to the top level parser.
         '--version',
-        # The 'version' action is a builtin argparse action specific for versioning info.
-        action='version',
-        # Construct a string with version information that will be returned.
-        # Here we use the VersionManager class.
-        # We also use the prog string we defined in the top-level parser creation above.
-        version=f"%(prog)s {ToplevelManager.get_package_version('dblinker')}"
+        # A lazy stand-in for the builtin 'version' action, the version string is only built when asked for.
+        action=LazyVersionAction,
+        help="show program's version number and exit"
     )
     return parser
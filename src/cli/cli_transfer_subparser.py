@@ -0,0 +1,33 @@
+def cli_transfer_subparser(subparsers):
+    transfer_parser = subparsers.add_parser('transfer', help='Stream tables from one database config into another.')
+
+    transfer_parser.add_argument('--from', dest='source', required=True,
+                                 help='Path to the configuration file of the database to read from.')
+    transfer_parser.add_argument('--to', dest='target', required=True,
+                                 help='Path to the configuration file of the database to write to.')
+    transfer_parser.add_argument('--table', dest='tables', action='append', required=True,
+                                 help='Table to transfer, repeat for several tables. The target table must exist.')
+    transfer_parser.add_argument('--target-table', dest='target_table',
+                                 help='Name of the table in the target database, when transferring a single table.')
+    transfer_parser.add_argument('--columns', help='Comma separated columns, defaults to all columns.')
+    transfer_parser.add_argument('--where', help='SQL condition source rows must match.')
+    transfer_parser.add_argument('--batch-size', dest='batch_size', type=int, default=5000,
+                                 help='Rows read and written at once. Default: 5000')
+    transfer_parser.add_argument('--workers', type=int, default=1,
+                                 help='Tables transferred in parallel, SQLite targets always use one. Default: 1')
+    transfer_parser.add_argument('--truncate', action='store_true',
+                                 help='Empty each target table first, in the same transaction as the load.')
+    transfer_parser.set_defaults(func=transfer_handler)
+
+
+def transfer_handler(args):
+    # Imported on dispatch so that other commands don't pay for the database drivers.
+    import time
+    from dblinker.managers.transfer_manager import TransferManager
+    transfer_manager = TransferManager(batch_size=args.batch_size, workers=args.workers)
+
+    columns = [column.strip() for column in args.columns.split(',')] if args.columns else None
+    start = time.perf_counter()
+    results = transfer_manager.transfer(args.source, args.target, args.tables, target_table=args.target_table,
+                                        columns=columns, where=args.where, truncate=args.truncate)
+    transfer_manager.print_results(results, time.perf_counter() - start)
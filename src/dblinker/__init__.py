@@ -0,0 +1,2 @@
+# Single source of the package version, read by pyproject.toml and by 'dblinker --version'.
+__version__ = "0.0.4"
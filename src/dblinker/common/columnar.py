@@ -0,0 +1,183 @@
+from datetime import timezone
+
+# Rows copied into the arrays per fetch, and the capacity arrays start with when the row count is unknown.
+COLUMNAR_BATCH_SIZE = 10000
+# PostgreSQL type name -> NumPy dtype. Anything else, text and uuid included, is kept in an object array.
+POSTGRES_DTYPES = {
+    'bool': 'bool',
+    'int2': 'int16',
+    'int4': 'int32',
+    'int8': 'int64',
+    'oid': 'uint32',
+    'float4': 'float32',
+    'float8': 'float64',
+    # numeric becomes float64, pass dtypes={'column': 'object'} to keep exact Decimal values.
+    'numeric': 'float64',
+    'date': 'datetime64[D]',
+    'timestamp': 'datetime64[us]',
+    # Timezone aware values are converted to UTC, NumPy datetimes have no timezone.
+    'timestamptz': 'datetime64[us]',
+    'interval': 'timedelta64[us]',
+}
+# What a NULL is stored as in a typed array, its position is recorded in the column's mask.
+_FILL_VALUES = {'b': False, 'i': 0, 'u': 0, 'f': float('nan'), 'M': 'NaT', 'm': 'NaT', 'O': None}
+
+
+def import_numpy():
+    """Imports numpy on first use, it is an optional dependency only needed for columnar fetches."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Columnar fetches need NumPy, install it with: pip install dblinker[numpy]") from None
+    return numpy
+
+
+def _to_utc_naive(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ColumnarResult(dict):
+    """Column name -> NumPy array, in the order of the result set.
+
+    masks holds a boolean array per column that contained NULLs, True where the value was NULL. The
+    array itself stores 0, False, NaN or NaT there, object columns keep None.
+    """
+
+    def __init__(self, columns, masks):
+        super().__init__(columns)
+        self.masks = masks
+
+    @property
+    def row_count(self):
+        return len(next(iter(self.values()))) if self else 0
+
+    def masked(self, name):
+        """The column as a numpy.ma.MaskedArray with its NULLs masked."""
+        numpy = import_numpy()
+        mask = self.masks.get(name)
+        return numpy.ma.MaskedArray(self[name], mask=mask if mask is not None else False)
+
+    def to_structured(self):
+        """Copies the columns into one structured array with a field per column, NULL masks stay in masks."""
+        numpy = import_numpy()
+        array = numpy.empty(self.row_count, dtype=[(name, column.dtype) for name, column in self.items()])
+        for name, column in self.items():
+            array[name] = column
+        return array
+
+
+def concat_columnar(results):
+    """Joins ColumnarResults with the same columns end to end, e.g. one per shard."""
+    results = list(results)
+    if not results:
+        raise ValueError("concat_columnar needs at least one result.")
+    if len(results) == 1:
+        return results[0]
+    numpy = import_numpy()
+    names = list(results[0])
+    if any(list(result) != names for result in results):
+        raise ValueError("Columnar results can only be joined when they have the same columns.")
+    columns = {name: numpy.concatenate([result[name] for result in results]) for name in names}
+    masks = {}
+    for name in names:
+        if any(name in result.masks for result in results):
+            masks[name] = numpy.concatenate([result.masks.get(name, numpy.zeros(result.row_count, dtype=bool))
+                                             for result in results])
+    return ColumnarResult(columns, masks)
+
+
+class ColumnarBuilder:
+    """Fills preallocated typed arrays batch by batch, so a result is never held as a list of row tuples.
+
+    Arrays start at expected_rows (or COLUMNAR_BATCH_SIZE) and double when they fill up. Only the rows of
+    the current batch exist as Python objects at any one time.
+    """
+
+    def __init__(self, names, dtypes, expected_rows=None):
+        self.numpy = numpy = import_numpy()
+        if len(set(names)) != len(names):
+            raise ValueError(f"Columnar results need unique column names, alias the duplicates: {', '.join(names)}")
+        self.names = list(names)
+        self.dtypes = [numpy.dtype(dtype) for dtype in dtypes]
+        self.size = 0
+        capacity = max(int(expected_rows or COLUMNAR_BATCH_SIZE), 1)
+        self.arrays = [numpy.empty(capacity, dtype=dtype) for dtype in self.dtypes]
+        self.masks = [None] * len(self.names)
+        self.fill_values = [_FILL_VALUES.get(dtype.kind, 0) for dtype in self.dtypes]
+        # Per column callables applied to each value before it is stored, e.g. timestamptz to naive UTC.
+        self.converters = [None] * len(self.names)
+
+    @classmethod
+    def for_postgres(cls, description, dtypes=None, expected_rows=None):
+        """A builder for a psycopg cursor description, dtypes overrides the dtype of columns by name."""
+        from psycopg.postgres import types as postgres_types
+        dtypes = dtypes or {}
+        names = [column.name for column in description]
+        resolved = []
+        converters = []
+        for column in description:
+            info = postgres_types.get(column.type_code)
+            # The registry maps array oids to their element's type, arrays are kept as lists in object columns.
+            type_name = info.name if info is not None and info.oid == column.type_code else None
+            resolved.append(dtypes.get(column.name, POSTGRES_DTYPES.get(type_name, 'object')))
+            converters.append(_to_utc_naive if type_name == 'timestamptz' else None)
+        builder = cls(names, resolved, expected_rows)
+        builder.converters = [None if builder.dtypes[i].kind == 'O' else converter
+                              for i, converter in enumerate(converters)]
+        return builder
+
+    def _reserve(self, rows):
+        capacity = len(self.arrays[0]) if self.arrays else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2)
+        for index, array in enumerate(self.arrays):
+            grown = self.numpy.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[index] = grown
+            mask = self.masks[index]
+            if mask is not None:
+                grown_mask = self.numpy.zeros(capacity, dtype=bool)
+                grown_mask[:self.size] = mask[:self.size]
+                self.masks[index] = grown_mask
+
+    def append(self, rows):
+        """Copies a batch of row tuples into the arrays, one slice assignment per typed column."""
+        if not rows:
+            return
+        start = self.size
+        stop = start + len(rows)
+        self._reserve(stop)
+        for index, values in enumerate(zip(*rows)):
+            converter = self.converters[index]
+            if converter is not None:
+                values = [converter(value) for value in values]
+            # Not 'None in values', which compares with == and fails on array values.
+            if any(value is None for value in values):
+                mask = self.masks[index]
+                if mask is None:
+                    mask = self.masks[index] = self.numpy.zeros(len(self.arrays[index]), dtype=bool)
+                mask[start:stop] = [value is None for value in values]
+                fill_value = self.fill_values[index]
+                values = [fill_value if value is None else value for value in values]
+            array = self.arrays[index]
+            if array.dtype.kind == 'O':
+                # A slice assignment would turn list or array values (Postgres arrays, jsonb lists) into
+                # extra dimensions, object columns are filled one element at a time instead.
+                for offset, value in enumerate(values, start):
+                    array[offset] = value
+            else:
+                array[start:stop] = values
+        self.size = stop
+
+    def result(self):
+        """The filled arrays trimmed to the row count, over-allocated ones are copied so the spare room is freed."""
+        columns = {}
+        masks = {}
+        for name, array, mask in zip(self.names, self.arrays, self.masks):
+            columns[name] = array[:self.size] if len(array) == self.size else array[:self.size].copy()
+            if mask is not None:
+                masks[name] = mask[:self.size].copy()
+        return ColumnarResult(columns, masks)
@@ -0,0 +1 @@
+from .config_loader import ConfigLoader, DBConfig, default_config_loader, load_config
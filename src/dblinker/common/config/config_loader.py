@@ -0,0 +1,214 @@
+import copy
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+import yaml
+
+# The libyaml backed loader is several times faster, fall back to the pure python one if it is missing.
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# List of valid psycopg connection parameters
+POSTGRES_CONNECTION_KEYS = ('user', 'password', 'host', 'port', 'dbname', 'sslmode', 'sslcert', 'sslkey',
+                            'sslrootcert', 'connect_timeout', 'application_name', 'keepalives', 'keepalives_idle',
+                            'keepalives_interval', 'keepalives_count')
+POSTGRES_CONNECTION_TYPES = ('normal', 'pool', 'async', 'async_pool', 'routing', 'sharded')
+SQLITE_CONNECTION_TYPES = ('normal', 'pool', 'async', 'async_pool')
+# Sections the connection factories read besides the connection and pool settings, configs that differ in
+# any of them build different connections and must not share a DBConfig.key.
+KEY_SECTIONS = ('async_settings', 'pipeline_settings', 'cache_settings', 'metrics_settings', 'slowlog_settings',
+                'fork_settings', 'normal_settings', 'timeout_settings', 'routing_settings', 'shard_settings',
+                'connect_settings')
+# Descriptive keys that don't change which database a config connects to.
+DESCRIPTIVE_KEYS = ('connectionName', 'description', 'connection_type')
+SUPPORTED_DATABASE_TYPES = ('postgresql', 'sqlite')
+
+
+def make_conninfo(connection_settings):
+    """Builds a libpq conninfo string, quoting values the way libpq expects."""
+    parts = []
+    for key, value in connection_settings.items():
+        value = str(value)
+        if value == '' or any(c in value for c in " '\\\t\n"):
+            value = "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+        parts.append(f"{key}={value}")
+    return " ".join(parts)
+
+
+def _freeze_items(settings):
+    """Turns a settings dictionary into a sorted tuple usable as part of a dictionary key."""
+    return tuple(sorted((k, str(v)) for k, v in (settings or {}).items()))
+
+
+class DBConfig:
+    """A validated, immutable view of one dbconfig file."""
+
+    __slots__ = ('path', 'database_type', 'connection_type', 'connection_name', 'description',
+                 'connection_settings', 'conninfo', 'replicas', 'shards', 'pool_settings', 'async_settings',
+                 'async_pool_settings', 'sections', 'key', '_data')
+
+    def __init__(self, config_data_dictionary, path=None):
+        if not isinstance(config_data_dictionary, dict) or not config_data_dictionary:
+            raise ValueError(f"Config file is empty or malformed: {path}")
+        database_type = next(iter(config_data_dictionary))
+        if database_type not in SUPPORTED_DATABASE_TYPES:
+            raise ValueError(f"Unsupported database type: {database_type}")
+        sections = config_data_dictionary[database_type] or {}
+        if not isinstance(sections, dict):
+            raise ValueError(f"The '{database_type}' section of {path} must be a mapping.")
+
+        if database_type == 'postgresql':
+            connection_type = sections.get('connection_type')
+            if connection_type not in POSTGRES_CONNECTION_TYPES:
+                raise ValueError(f"Unsupported connection type: {connection_type}")
+            raw_settings = sections.get('connection_settings')
+            if not isinstance(raw_settings, dict):
+                raise ValueError(f"Missing 'connection_settings' in {path}")
+            connection_name = raw_settings.get('connectionName')
+            description = raw_settings.get('description')
+            connection_settings = {key: raw_settings[key] for key in POSTGRES_CONNECTION_KEYS if key in raw_settings}
+            # Empty values such as sslcert: '' are left out, libpq treats them as unset anyway.
+            conninfo = make_conninfo({k: v for k, v in connection_settings.items() if v not in (None, '')})
+            replicas = sections.get('replicas') or []
+            if not isinstance(replicas, list) or not all(isinstance(r, dict) for r in replicas):
+                raise ValueError(f"'replicas' in {path} must be a list of connection settings mappings.")
+            # A replica entry only lists what differs from the primary, usually host and port.
+            replicas = tuple(MappingProxyType(dict(connection_settings, **{k: r[k] for k in POSTGRES_CONNECTION_KEYS
+                                                                           if k in r}))
+                             for r in replicas)
+            shards = self._parse_shards(sections.get('shards'), connection_settings, path)
+            if connection_type == 'sharded' and not shards:
+                raise ValueError(f"The 'sharded' connection type needs a 'shards' list in {path}")
+        else:
+            connection_type = sections.get('connection_type', 'normal')
+            if connection_type not in SQLITE_CONNECTION_TYPES:
+                raise ValueError(f"Unsupported connection type: {connection_type}")
+            connection_name = sections.get('connectionName')
+            description = sections.get('description')
+            connection_settings = {k: v for k, v in sections.items()
+                                   if not isinstance(v, dict) and k not in DESCRIPTIVE_KEYS}
+            # Pragmas change how the file is opened, so configs that differ in them don't share a pool.
+            connection_settings.update({f"pragma.{k}": v for k, v in (sections.get('pragmas') or {}).items()})
+            conninfo = None
+            replicas = ()
+            shards = ()
+
+        pool_settings = sections.get('pool_settings') or {}
+        async_pool_settings = sections.get('async_pool_settings') or {}
+        # Shards of a sharded config are async pools as well.
+        active_pool_settings = async_pool_settings if connection_type in ('async_pool', 'sharded') else pool_settings
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'path', str(path) if path is not None else None)
+        setattr_(self, 'database_type', database_type)
+        setattr_(self, 'connection_type', connection_type)
+        setattr_(self, 'connection_name', connection_name)
+        setattr_(self, 'description', description)
+        setattr_(self, 'connection_settings', MappingProxyType(connection_settings))
+        setattr_(self, 'conninfo', conninfo)
+        setattr_(self, 'replicas', replicas)
+        setattr_(self, 'shards', shards)
+        setattr_(self, 'pool_settings', MappingProxyType(dict(pool_settings)))
+        setattr_(self, 'async_settings', MappingProxyType(dict(sections.get('async_settings') or {})))
+        setattr_(self, 'async_pool_settings', MappingProxyType(dict(async_pool_settings)))
+        setattr_(self, 'sections', MappingProxyType(sections))
+        # Identical connection targets share a key regardless of file, name or description.
+        setattr_(self, 'key', (database_type, connection_type,
+                               _freeze_items({k: v for k, v in connection_settings.items() if v not in (None, '')}),
+                               _freeze_items(active_pool_settings),
+                               tuple(_freeze_items(sections.get(name)) for name in KEY_SECTIONS),
+                               tuple(_freeze_items(replica) for replica in replicas),
+                               tuple(_freeze_items(shard) for shard in shards)))
+        setattr_(self, '_data', config_data_dictionary)
+
+    @staticmethod
+    def _parse_shards(shards, connection_settings, path):
+        """Validates the 'shards' list, each entry is either a 'config' file path or connection overrides.
+
+        Returns a tuple of mappings with a unique 'name' and either 'config' (an absolute path) or the
+        shard's full connection settings under their usual keys.
+        """
+        shards = shards or []
+        if not isinstance(shards, list) or not all(isinstance(shard, dict) for shard in shards):
+            raise ValueError(f"'shards' in {path} must be a list of mappings.")
+        parsed = []
+        for shard in shards:
+            if shard.get('config'):
+                # Relative shard config paths are resolved against the directory of this config file.
+                base = Path(path).parent if path is not None else Path.cwd()
+                entry = {'config': str((base / Path(shard['config']).expanduser()).resolve())}
+                entry['name'] = str(shard.get('name') or entry['config'])
+            else:
+                entry = dict(connection_settings, **{k: shard[k] for k in POSTGRES_CONNECTION_KEYS if k in shard})
+                # The name places the shard on the hash ring, keep it stable when hosts move.
+                entry['name'] = str(shard.get('name') or f"{entry.get('host') or 'localhost'}:"
+                                                          f"{entry.get('port') or 5432}/{entry.get('dbname')}")
+            parsed.append(MappingProxyType(entry))
+        names = [entry['name'] for entry in parsed]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Shard names in {path} must be unique: {', '.join(names)}")
+        return tuple(parsed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(path={self.path!r}, database_type={self.database_type!r}, "
+                f"connection_type={self.connection_type!r}, connection_name={self.connection_name!r})")
+
+    @classmethod
+    def from_dict(cls, config_data_dictionary, path=None):
+        """Validates an already parsed config dictionary, taking a private copy of it."""
+        return cls(copy.deepcopy(config_data_dictionary), path)
+
+    def as_dict(self):
+        """Returns a mutable copy of the parsed YAML data."""
+        return copy.deepcopy(self._data)
+
+
+class ConfigLoader:
+    """Parses each dbconfig file once, re-parsing only when its mtime or size changes."""
+
+    def __init__(self):
+        # Resolved path -> (mtime_ns, size, DBConfig)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def load(self, config_file_path):
+        """Returns the DBConfig for a file, served from the cache while the file is unchanged."""
+        path = Path(config_file_path).expanduser().resolve()
+        stat = os.stat(path)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        with open(path, 'r') as f:
+            config_data_dictionary = yaml.load(f, Loader=YAML_LOADER)
+        dbconfig = DBConfig(config_data_dictionary, path)
+        with self._lock:
+            self._cache[path] = (stat.st_mtime_ns, stat.st_size, dbconfig)
+        return dbconfig
+
+    def load_directory(self, directory, pattern='*.yaml'):
+        """Loads every config in a directory matching the pattern, sorted by file name."""
+        return [self.load(path) for path in sorted(Path(directory).expanduser().glob(pattern)) if path.is_file()]
+
+    def invalidate(self, config_file_path=None):
+        """Drops one file, or every file, from the cache."""
+        with self._lock:
+            if config_file_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(Path(config_file_path).expanduser().resolve(), None)
+
+
+# The process-wide loader shared by the factory, the managers and the CLI.
+default_config_loader = ConfigLoader()
+
+
+def load_config(config_file_path):
+    """Shortcut for default_config_loader.load()."""
+    return default_config_loader.load(config_file_path)
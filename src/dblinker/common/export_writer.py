@@ -0,0 +1,239 @@
+import asyncio
+import gzip
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+
+# File extension per COPY format, and the one added for each compression.
+EXPORT_FILE_FORMATS = {'csv': '.csv', 'text': '.txt', 'binary': '.bin'}
+EXPORT_COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+# Levels that keep compression ahead of the network: gzip's default of 6 is several times slower than 1.
+DEFAULT_COMPRESSION_LEVELS = {'gzip': 1, 'zstd': 3}
+# Uncompressed bytes handed to the writer thread at once, and how many such buffers may wait for it.
+# Together they bound the memory an export uses, whatever its size.
+EXPORT_BUFFER_SIZE = 1024 * 1024
+EXPORT_BUFFERS = 8
+# A binary COPY stream starts with an 11 byte signature, a flags word and a header extension, and ends with
+# a field count of -1. Every file gets its own header and trailer, so each one can be loaded on its own.
+BINARY_COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+BINARY_COPY_TRAILER = b'\xff\xff'
+# Put on the queue by finish(), the writer thread closes the last file and exits.
+_DONE = object()
+
+
+def import_zstandard():
+    """Imports zstandard on first use, it is an optional dependency only needed for zstd exports."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs zstandard, install it with: pip install dblinker[zstd]") from None
+    return zstandard
+
+
+class RotatingExportWriter:
+    """Writes the rows of a COPY ... TO STDOUT into numbered, optionally compressed files.
+
+    The server sends every row in a message of its own, add() collects them into buffers of about
+    buffer_size bytes and a background thread compresses and writes the buffers while the caller keeps
+    reading from the server. At most `buffers` buffers wait for the writer, a slow disk holds the reader
+    back instead of growing memory. With max_size a new file is started once the current one has reached
+    that many bytes on disk, always between rows, so files can run over by up to one compressed buffer.
+    """
+
+    def __init__(self, output, file_format='csv', compression=None, max_size=None, level=None, header=False,
+                 buffers=EXPORT_BUFFERS, buffer_size=EXPORT_BUFFER_SIZE):
+        if file_format not in EXPORT_FILE_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}. "
+                             f"Supported formats are: {', '.join(EXPORT_FILE_FORMATS)}")
+        if compression not in EXPORT_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}. Supported compressions are: gzip, zstd")
+        if max_size is not None and int(max_size) < 1:
+            raise ValueError("max_size must be a positive number of bytes.")
+        self.output = Path(output).expanduser()
+        self.file_format = file_format
+        self.compression = compression
+        self.max_size = int(max_size) if max_size is not None else None
+        self.level = level if level is not None else DEFAULT_COMPRESSION_LEVELS.get(compression)
+        # The compressor is created up front, so a missing zstandard fails before the export starts.
+        self._zstd = import_zstandard().ZstdCompressor(level=self.level) if compression == 'zstd' else None
+        # A csv header line is captured from the first row and repeated at the top of every file.
+        self.header = header and file_format == 'csv'
+        self.buffer_size = buffer_size
+        self._queue = queue.Queue(maxsize=max(int(buffers), 1))
+        # Written at the start of every file: the binary COPY header or the csv header line.
+        self._prologue = None
+        self._first = True
+        self._block = []
+        self._block_bytes = 0
+        self._error = None
+        self._thread = None
+        self._stream = self._raw = None
+        self._current = None
+        # One dict per finished file: path, rows, raw_bytes (uncompressed) and bytes on disk.
+        self.files = []
+        self.rows = 0
+        self.raw_bytes = 0
+        self._started = None
+
+    def path_for(self, index):
+        """The path of the index-th file: the output path itself, or numbered parts with max_size."""
+        suffix = self.output.suffix or EXPORT_FILE_FORMATS[self.file_format]
+        stem = self.output.name[:-len(self.output.suffix)] if self.output.suffix else self.output.name
+        part = f".{index:05d}" if self.max_size is not None else ''
+        return self.output.with_name(f"{stem}{part}{suffix}{EXPORT_COMPRESSIONS[self.compression]}")
+
+    def start(self):
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='dblinker-export-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, data):
+        """Takes one row from the COPY stream, returning a full buffer to pass to submit() or None."""
+        if self._first:
+            self._first = False
+            data = self._take_prologue(bytes(data))
+            if not data:
+                return None
+        elif self.file_format == 'binary' and data == BINARY_COPY_TRAILER:
+            # The writer adds a trailer to every file itself.
+            return None
+        self._block.append(data)
+        self._block_bytes += len(data)
+        if self._block_bytes >= self.buffer_size:
+            return self._take_block()
+        return None
+
+    def _take_prologue(self, data):
+        if self.file_format == 'binary':
+            if not data.startswith(BINARY_COPY_SIGNATURE):
+                raise ValueError("The COPY stream doesn't start with a binary COPY header.")
+            extension_length = struct.unpack_from('!I', data, len(BINARY_COPY_SIGNATURE) + 4)[0]
+            end = len(BINARY_COPY_SIGNATURE) + 8 + extension_length
+            self._prologue = data[:end]
+            # The header may share its message with the first row, or with the trailer of an empty result.
+            rest = data[end:]
+            return b'' if rest == BINARY_COPY_TRAILER else rest
+        if self.header:
+            self._prologue = data
+            return b''
+        return data
+
+    def _take_block(self):
+        block, self._block, self._block_bytes = self._block, [], 0
+        return block
+
+    def submit(self, block):
+        """Hands a buffer to the writer thread, waiting while the queue is full."""
+        self._raise_error()
+        self._queue.put(block)
+
+    async def submit_async(self, block):
+        """submit() for event loops, only a full queue costs a hop through the default executor."""
+        self._raise_error()
+        try:
+            self._queue.put_nowait(block)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, block)
+
+    def finish(self):
+        """Writes what is left, closes the last file and returns the export summary."""
+        if self._block:
+            self.submit(self._take_block())
+        self._queue.put(_DONE)
+        self._thread.join()
+        self._raise_error()
+        return self.summary()
+
+    async def finish_async(self):
+        if self._block:
+            await self.submit_async(self._take_block())
+        await asyncio.get_running_loop().run_in_executor(None, self._finish_thread)
+        self._raise_error()
+        return self.summary()
+
+    def _finish_thread(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+
+    def abort(self):
+        """Stops the writer thread after a failed export, the files written so far are left in place."""
+        if self._thread is not None and self._thread.is_alive():
+            self._error = self._error or RuntimeError("Export aborted.")
+            self._queue.put(_DONE)
+            self._thread.join()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def summary(self):
+        seconds = time.perf_counter() - self._started
+        return {'rows': self.rows, 'files': list(self.files), 'raw_bytes': self.raw_bytes,
+                'bytes': sum(f['bytes'] for f in self.files), 'seconds': round(seconds, 3)}
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is _DONE:
+                break
+            if self._error is not None:
+                # Keep draining so the reader never blocks on a writer that has given up.
+                continue
+            try:
+                self._write_block(block)
+            except BaseException as e:
+                self._error = e
+        try:
+            if self._error is None:
+                if self._stream is None:
+                    # An empty result still produces a valid, empty file.
+                    self._open(len(self.files))
+                self._close()
+            elif self._raw is not None:
+                # The file being written when the export failed is left incomplete and not listed.
+                self._raw.close()
+        except BaseException as e:
+            self._error = e
+
+    def _write_block(self, block):
+        if self._stream is None:
+            self._open(len(self.files))
+        elif self.max_size is not None and self._raw.tell() >= self.max_size:
+            self._close()
+            self._open(len(self.files))
+        data = b''.join(block)
+        self._stream.write(data)
+        self._current['rows'] += len(block)
+        self._current['raw_bytes'] += len(data)
+
+    def _open(self, index):
+        path = self.path_for(index)
+        self._raw = open(path, 'wb')
+        if self.compression == 'gzip':
+            # mtime=0 keeps the output byte-for-byte reproducible.
+            self._stream = gzip.GzipFile(filename='', mode='wb', fileobj=self._raw, compresslevel=self.level, mtime=0)
+        elif self.compression == 'zstd':
+            self._stream = self._zstd.stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._current = {'path': str(path), 'rows': 0, 'raw_bytes': 0, 'bytes': 0}
+        if self._prologue:
+            self._stream.write(self._prologue)
+            self._current['raw_bytes'] += len(self._prologue)
+
+    def _close(self):
+        if self.file_format == 'binary':
+            self._stream.write(BINARY_COPY_TRAILER)
+            self._current['raw_bytes'] += len(BINARY_COPY_TRAILER)
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._current['bytes'] = Path(self._current['path']).stat().st_size
+        self.rows += self._current['rows']
+        self.raw_bytes += self._current['raw_bytes']
+        self.files.append(self._current)
+        self._stream = self._raw = None
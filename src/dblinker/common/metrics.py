@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from half a millisecond to ten seconds. Anything slower lands in the +Inf bucket.
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label_value(value):
+    """Escapes a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class LatencyHistogram:
+    """A fixed-bucket latency histogram, recording a value is a bisect and two additions."""
+
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One counter per bucket plus the +Inf bucket.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, percent):
+        """Estimates a percentile by interpolating inside the bucket it falls in."""
+        with self._lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        return self._percentile(counts, count, maximum, percent)
+
+    def _percentile(self, counts, count, maximum, percent):
+        if count == 0:
+            return 0.0
+        rank = count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, maximum)
+            seen += bucket_count
+        return maximum
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total, maximum = list(self.counts), self.count, self.total, self.max
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'max': maximum,
+            'p50': self._percentile(counts, count, maximum, 50),
+            'p95': self._percentile(counts, count, maximum, 95),
+            'p99': self._percentile(counts, count, maximum, 99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], counts)),
+        }
+
+
+class ConnectionMetrics:
+    """Checkout wait, query latency and error counts for one connection object."""
+
+    def __init__(self, name=None, buckets=DEFAULT_LATENCY_BUCKETS, pool_stats=None):
+        # Reported as the 'connection' label, usually the config's connectionName.
+        self.name = name
+        self.checkout_wait = LatencyHistogram(buckets)
+        self.query_latency = LatencyHistogram(buckets)
+        self.errors = {}
+        # A callable returning the pool's own counters, e.g. psycopg_pool's get_stats().
+        self.pool_stats = pool_stats
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record_error(self, error):
+        name = type(error).__name__
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def snapshot(self):
+        snapshot = {
+            'connection': self.name,
+            'uptime_seconds': time.time() - self.started,
+            'checkout_wait': self.checkout_wait.snapshot(),
+            'query_latency': self.query_latency.snapshot(),
+            'errors': dict(self.errors),
+        }
+        pool_stats = self.pool_stats() if self.pool_stats is not None else None
+        if pool_stats is not None:
+            snapshot['pool'] = pool_stats
+        return snapshot
+
+    def to_json(self, indent=2, snapshot=None):
+        """Renders snapshot, or a fresh one, as JSON."""
+        return json.dumps(snapshot if snapshot is not None else self.snapshot(), indent=indent, default=str)
+
+    def to_prometheus(self, prefix='dblinker', snapshot=None):
+        """Renders snapshot, or a fresh one, in the Prometheus text exposition format."""
+        if snapshot is None:
+            snapshot = self.snapshot()
+        labels = f'connection="{escape_label_value(self.name)}"' if self.name else ''
+        lines = []
+        histograms = (('checkout_wait_seconds', 'checkout_wait', 'Time spent waiting for a pool connection.'),
+                      ('query_duration_seconds', 'query_latency', 'Query latency.'))
+        for metric, key, help_text in histograms:
+            histogram = snapshot[key]
+            name = f"{prefix}_{metric}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in histogram['buckets'].items():
+                cumulative += count
+                bucket_labels = ','.join(filter(None, [labels, f'le="{bound}"']))
+                lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ''
+            lines.append(f"{name}_sum{suffix} {histogram['sum']}")
+            lines.append(f"{name}_count{suffix} {histogram['count']}")
+        name = f"{prefix}_query_errors_total"
+        lines.append(f"# HELP {name} Failed statements by exception type.")
+        lines.append(f"# TYPE {name} counter")
+        for error, count in sorted(snapshot['errors'].items()):
+            error_labels = ','.join(filter(None, [labels, f'error="{escape_label_value(error)}"']))
+            lines.append(f"{name}{{{error_labels}}} {count}")
+        for stat, value in sorted(snapshot.get('pool', {}).items()):
+            if isinstance(value, (int, float)):
+                name = f"{prefix}_pool_{stat}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,187 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dblinker.common.sql_text import is_read_only_statement, is_volatile_statement, normalize_sql, referenced_tables
+
+# Returned by lookup() on a miss, None is a valid cached result.
+MISS = object()
+
+
+def _freeze(value):
+    """Turns query parameters into something hashable, lists become tuples and dicts sorted item tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+def estimate_size(rows):
+    """Approximate bytes held by a list of row tuples."""
+    if rows is None:
+        return 0
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """An LRU cache of read-only query results with a TTL, bounded by entry count and bytes.
+
+    Results are keyed by normalized SQL plus parameters. A write run through the same connection drops
+    every entry that references a table the write touched. Writes made any other way (triggers, functions,
+    other clients) are only caught by the TTL, or by LISTEN/NOTIFY when other dblinker processes publish them.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (rows, size, expires_at, tables), ordered from least to most recently used.
+        self._entries = OrderedDict()
+        # table -> keys of the entries that read it.
+        self._tables = {}
+        self._bytes = 0
+        # Bumped by every invalidation, table -> generation of its last invalidation. A result whose query
+        # started before its table was invalidated may be stale and is not stored.
+        self._generation = 0
+        self._invalidated = {}
+        self._lock = threading.Lock()
+        # Called with the set of tables a local write invalidated, used to publish it to other processes.
+        self.on_invalidate = None
+        # A notifier such as PGCacheNotifier, stopped by close().
+        self.notifier = None
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls, cache_settings):
+        """Builds a cache from a 'cache_settings' config section."""
+        return cls(ttl=float(cache_settings.get('ttl', 60)),
+                   max_entries=int(cache_settings.get('max_entries', 1024)),
+                   max_bytes=int(cache_settings.get('max_bytes', 64 * 1024 * 1024)))
+
+    @staticmethod
+    def make_key(query, params=None):
+        """The cache key of a statement, None when it must not be cached."""
+        if not isinstance(query, str) or not is_read_only_statement(query) or is_volatile_statement(query):
+            return None
+        try:
+            return normalize_sql(query), _freeze(params)
+        except TypeError:
+            # Unhashable parameters, e.g. a custom adapter object.
+            return None
+
+    def lookup(self, query, params=None):
+        """Returns (token, rows), rows is MISS when the statement isn't cached or can't be.
+
+        Pass the token to store() with the rows once the statement has run.
+        """
+        key = self.make_key(query, params)
+        if key is None:
+            return None, MISS
+        with self._lock:
+            token = (key, self._generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return token, MISS
+            if entry[2] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return token, MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # A copy, so callers can't change what the next caller gets.
+        return token, list(entry[0]) if entry[0] is not None else None
+
+    def store(self, token, query, rows):
+        """Caches rows under a token from lookup(), or invalidates the tables a write touched when it is None."""
+        if token is None:
+            self.invalidate_statement(query)
+            return
+        key, generation = token
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        tables = referenced_tables(query)
+        with self._lock:
+            if any(self._invalidated.get(table, -1) >= generation for table in tables):
+                # A write to one of the tables landed while the query ran.
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (list(rows) if rows is not None else None, size, time.monotonic() + self.ttl,
+                                  tables)
+            self._bytes += size
+            for table in tables:
+                self._tables.setdefault(table, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables, publish=True):
+        """Drops every entry that read one of tables, returning how many were dropped."""
+        # Unquoted names are expected lower-cased, as referenced_tables() returns them.
+        tables = set(tables)
+        if not tables:
+            return 0
+        dropped = 0
+        with self._lock:
+            for table in tables:
+                self._invalidated[table] = self._generation
+                for key in list(self._tables.get(table, ())):
+                    self._remove(key)
+                    dropped += 1
+            self._generation += 1
+            self.invalidations += dropped
+        if publish and self.on_invalidate is not None:
+            self.on_invalidate(tables)
+        return dropped
+
+    def invalidate_statement(self, query):
+        """Invalidates the tables a write statement touches, read-only statements are ignored."""
+        if isinstance(query, str) and not is_read_only_statement(query):
+            self.invalidate_tables(referenced_tables(query))
+
+    def _remove(self, key):
+        # Called with the lock held.
+        rows, size, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._tables.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tables[table]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tables.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'invalidations': self.invalidations}
+
+    def handle_fork(self):
+        """Called in a forked child: fresh lock, and a listener of its own if one was attached."""
+        self._lock = threading.Lock()
+        if self.notifier is not None:
+            self.notifier.handle_fork()
+
+    def close(self):
+        """Stops the cross-process notifier, if one was attached, and empties the cache."""
+        if self.notifier is not None:
+            self.notifier.stop()
+            self.notifier = None
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,206 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from dblinker.common.sql_text import fingerprint_sql, normalize_sql
+
+DEFAULT_THRESHOLD_MS = 500
+# Seconds before a fingerprint that was just explained gets another plan, ANALYZE runs the statement again.
+DEFAULT_EXPLAIN_INTERVAL = 300
+# Entries waiting for the writer thread. Past this they are dropped and counted, logging never slows queries.
+SLOWLOG_QUEUE_SIZE = 10000
+# Seconds the writer gets at interpreter exit to write what is still queued.
+FLUSH_TIMEOUT = 5
+_STOP = object()
+
+# Resolved path -> SlowQueryWriter, every connection logging to the same file shares one writer thread.
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def query_id(fingerprint):
+    """A short stable id for a fingerprint, to grep and join log lines on."""
+    return hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def redact_params(params):
+    """Parameter type names in place of their values, so log lines never carry user data."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+def statement_text(query):
+    """The SQL text of a statement, composed psycopg.sql objects included, None when it can't be rendered."""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    try:
+        return query.as_string(None)
+    except Exception:
+        return None
+
+
+class SlowQueryWriter:
+    """Appends JSON lines to one file from a background thread, started on the first entry.
+
+    Each line goes out in a single write() on a file opened with O_APPEND, so processes sharing the file
+    never interleave their lines. Plans are captured on this thread as well, off the query's path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.written = self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, log, entry):
+        if self._pid != os.getpid():
+            # First use, or a forked child whose copy of the thread is gone.
+            self._start()
+        try:
+            self._queue.put_nowait((log, entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=SLOWLOG_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='dblinker-slowlog',
+                                            daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, entries):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            while True:
+                item = entries.get()
+                if item is _STOP:
+                    break
+                log, entry = item
+                try:
+                    line = log.render(entry)
+                except Exception:
+                    # A statement that can't be rendered is not worth losing the log over.
+                    self.dropped += 1
+                    continue
+                os.write(fd, line.encode('utf-8') + b'\n')
+                self.written += 1
+        finally:
+            os.close(fd)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Writes the queued entries and stops the thread, the next entry starts a new one."""
+        with self._lock:
+            thread, entries = self._thread, self._queue
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = self._queue = self._pid = None
+        entries.put(_STOP)
+        thread.join(timeout)
+
+
+def get_writer(path):
+    """The process-wide writer of a log file."""
+    path = str(Path(path).expanduser().resolve())
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = SlowQueryWriter(path)
+        return writer
+
+
+@atexit.register
+def _flush_writers():
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+class SlowQueryLog:
+    """Logs statements slower than a threshold, plus a random sample of the rest, as JSON lines.
+
+    observe() is called by observe_query() for every statement and only compares the duration with the
+    threshold, anything else happens on the writer thread: fingerprinting, parameter redaction and, for slow
+    statements, capturing a plan with the explainer (at most once per fingerprint per explain_interval).
+    Summarize a log with 'dblinker slowlog'.
+    """
+
+    def __init__(self, path, threshold_ms=DEFAULT_THRESHOLD_MS, sample_percent=0, redact=True, name=None,
+                 explainer=None, explain_interval=DEFAULT_EXPLAIN_INTERVAL):
+        if float(threshold_ms) < 0 or not 0 <= float(sample_percent) <= 100:
+            raise ValueError("threshold_ms must be at least 0 and sample_percent between 0 and 100.")
+        self.threshold = float(threshold_ms) / 1000
+        self.sample_rate = float(sample_percent) / 100
+        self.redact = redact
+        # Reported as 'connection' on every line, usually the config's connectionName.
+        self.name = name
+        # Called as explainer(sql, params) on the writer thread, returns a plan or None.
+        self.explainer = explainer
+        self.explain_interval = float(explain_interval)
+        self.writer = get_writer(path)
+        # query id -> monotonic time of its last plan, only touched by the writer thread.
+        self._explained = {}
+
+    @classmethod
+    def from_settings(cls, slowlog_settings, name=None, explainer=None):
+        """Builds a log from a 'slowlog_settings' config section, explainer is used when 'explain' is on."""
+        return cls(slowlog_settings.get('path') or 'dblinker-slowlog.jsonl',
+                   threshold_ms=slowlog_settings.get('threshold_ms', DEFAULT_THRESHOLD_MS),
+                   sample_percent=slowlog_settings.get('sample_percent') or 0,
+                   redact=slowlog_settings.get('redact_params', True),
+                   name=name,
+                   explainer=explainer if slowlog_settings.get('explain') else None,
+                   explain_interval=slowlog_settings.get('explain_interval', DEFAULT_EXPLAIN_INTERVAL))
+
+    def observe(self, query, params, seconds, error=None):
+        slow = seconds >= self.threshold
+        if not slow and (not self.sample_rate or random.random() >= self.sample_rate):
+            return
+        self.writer.submit(self, (query, params, seconds, error, slow, time.time()))
+
+    def render(self, entry):
+        """Turns a queued entry into its JSON line, runs on the writer thread."""
+        query, params, seconds, error, slow, logged_at = entry
+        text = statement_text(query)
+        fingerprint = fingerprint_sql(text) if text is not None else type(query).__name__
+        record = {'ts': round(logged_at, 6), 'pid': os.getpid(), 'connection': self.name,
+                  'query_id': query_id(fingerprint), 'fingerprint': fingerprint,
+                  'ms': round(seconds * 1000, 3), 'slow': slow}
+        if not self.redact and text is not None:
+            # The statement as run, literals included, and the actual parameter values.
+            record['sql'] = normalize_sql(text)
+            record['params'] = params
+        else:
+            record['params'] = redact_params(params)
+        if error is not None:
+            record['error'] = type(error).__name__
+        elif slow and self.explainer is not None and text is not None:
+            record.update(self._explain(record['query_id'], text, params))
+        return json.dumps(record, default=str)
+
+    def _explain(self, key, text, params):
+        now = time.monotonic()
+        last = self._explained.get(key)
+        if last is not None and now - last < self.explain_interval:
+            return {}
+        self._explained[key] = now
+        try:
+            plan = self.explainer(text, params)
+        except Exception as e:
+            return {'plan_error': f"{type(e).__name__}: {e}"}
+        return {'plan': plan} if plan is not None else {}
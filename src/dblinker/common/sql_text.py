@@ -0,0 +1,80 @@
+import re
+
+# Statements starting with these keywords can run on a hot standby.
+READ_ONLY_KEYWORDS = ('select', 'with', 'show', 'values', 'table')
+# Anything matching this makes an otherwise read-only looking statement write or lock rows.
+_WRITE_MARKERS = re.compile(r"\b(insert|update|delete|merge|into|nextval|setval|for\s+(no\s+key\s+)?update"
+                            r"|for\s+(key\s+)?share)\b", re.IGNORECASE)
+# Results of statements calling these differ between runs even when the data doesn't.
+_VOLATILE_MARKERS = re.compile(r"\b(random|gen_random_uuid|uuid_generate_v\d|clock_timestamp|txid_current"
+                               r"|pg_advisory\w*)\s*\(", re.IGNORECASE)
+# Quoted strings and identifiers are kept as they are, comments are dropped and whitespace runs collapsed.
+_SQL_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(?:\s|--[^\n]*|/\*.*?\*/)+""", re.DOTALL)
+# A table name, optionally schema qualified and quoted, and the list of them a FROM clause can hold.
+_TABLE_NAME = r"""(?:"[^"]+"|[\w$]+)(?:\s*\.\s*(?:"[^"]+"|[\w$]+))?"""
+_ALIASED_TABLE = rf"""{_TABLE_NAME}(?:\s+(?:as\s+)?[\w$]+)?"""
+_TABLE_LIST = re.compile(rf"""\b(?:from|join|update|into|table|truncate)\s+(?:only\s+)?"""
+                         rf"""({_ALIASED_TABLE}(?:\s*,\s*{_ALIASED_TABLE})*)""", re.IGNORECASE)
+_TABLE_NAME_PREFIX = re.compile(_TABLE_NAME)
+# Literals and placeholders replaced by '?' in fingerprints, quoted identifiers are matched so they stay as they are.
+_FINGERPRINT_TOKENS = re.compile(r"""("(?:[^"]|"")*")|'(?:[^']|'')*'|\$\d+|%\(\w+\)s|%s"""
+                                 r"""|\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b""", re.IGNORECASE)
+# IN lists and multi-row VALUES of any length share one fingerprint.
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+
+
+def is_read_only_statement(query):
+    """Returns True for plain SQL text that is safe to send to a read-only replica.
+
+    Composed psycopg.sql objects and anything doubtful count as writes, they stay on the primary.
+    """
+    if not isinstance(query, str):
+        return False
+    words = query.lstrip().split(None, 1)
+    return bool(words) and words[0].lower() in READ_ONLY_KEYWORDS and not _WRITE_MARKERS.search(query)
+
+
+def is_volatile_statement(query):
+    """True when a read-only statement calls functions such as random() whose results must not be reused."""
+    return bool(_VOLATILE_MARKERS.search(query))
+
+
+def normalize_sql(query):
+    """Collapses whitespace and drops comments outside quotes, so formatting differences share a cache key."""
+    return _SQL_TOKENS.sub(lambda match: match.group(1) or ' ', query).strip().rstrip(';').rstrip()
+
+
+def referenced_tables(query):
+    """Returns the lower-cased, unqualified names of the tables a statement reads or writes.
+
+    Names are unqualified so that 'public.orders' and 'orders' match, the price is the occasional extra
+    invalidation of a same-named table in another schema.
+    """
+    if not isinstance(query, str):
+        return frozenset()
+    query = normalize_sql(query)
+    tables = set()
+    for match in _TABLE_LIST.finditer(query):
+        # 'FROM a x, b y' lists several tables, each item starts with its name and may end with an alias.
+        for item in match.group(1).split(','):
+            name = _TABLE_NAME_PREFIX.match(item.strip()).group(0).split('.')[-1].strip()
+            if name.startswith('"'):
+                tables.add(name[1:-1].replace('""', '"'))
+            else:
+                tables.add(name.lower())
+    return frozenset(tables)
+
+
+def fingerprint_sql(query):
+    """Reduces a statement to its shape: literals and placeholders become '?' and keywords are lower-cased.
+
+    Statements differing only in their values, formatting or IN list lengths share a fingerprint, the way
+    pg_stat_statements groups them.
+    """
+    query = normalize_sql(query)
+    query = _FINGERPRINT_TOKENS.sub(lambda match: match.group(1) or '?', query)
+    # Lower-case everything outside quoted identifiers, which are case sensitive.
+    query = re.sub(r'("(?:[^"]|"")*")|[^"]+', lambda match: match.group(1) or match.group(0).lower(), query)
+    query = _PLACEHOLDER_LIST.sub('(?)', query)
+    return _REPEATED_ROWS.sub(r'\1', query)
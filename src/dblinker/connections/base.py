@@ -1,6 +1,24 @@
+import os
+import time
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dblinker.common.metrics import ConnectionMetrics, DEFAULT_LATENCY_BUCKETS
+from dblinker.connections import fork_safety
 
 class BaseConnection(ABC):
+    # Set by enable_metrics(), while it is None instrumentation costs one attribute check per statement.
+    metrics = None
+    # Set by enable_result_cache(), a dblinker.common.result_cache.ResultCache in front of execute().
+    result_cache = None
+    # Set by enable_slow_query_log(), a dblinker.common.slow_query_log.SlowQueryLog fed by observe_query().
+    slow_query_log = None
+    # Set by track_forks(), the process whose sockets this connection holds.
+    owner_pid = None
+    # Open a fresh pool straight after a fork instead of on first use, from 'fork_settings'.
+    prewarm_after_fork = False
+    # time.monotonic() of the last checkout or statement, set by the pool types PoolRegistry shares.
+    last_used = 0.0
+
     @abstractmethod
     def connect(self):
         """Establish a database connection."""
@@ -15,3 +33,99 @@ class BaseConnection(ABC):
     def disconnect(self):
         """Close the database connection."""
         pass
+
+    def release(self):
+        """Closes the connections of an idle shared pool, called by PoolRegistry when it evicts one.
+
+        Pools override it to stay usable and keep their result cache, their next use opens connections again.
+        They return False, keeping their connections, when a statement started since PoolRegistry checked.
+        """
+        return self.disconnect()
+
+    def in_use(self):
+        """Whether a statement or checkout is running right now, PoolRegistry never releases a pool in use."""
+        return False
+
+    def enable_metrics(self, name=None, buckets=DEFAULT_LATENCY_BUCKETS):
+        """Starts recording checkout wait, query latency and errors, returning the ConnectionMetrics."""
+        self.metrics = ConnectionMetrics(name, buckets, pool_stats=self.pool_stats)
+        return self.metrics
+
+    def enable_result_cache(self, cache):
+        """Serves repeated read-only execute() calls from cache, writes through this connection invalidate it."""
+        self.result_cache = cache
+        return cache
+
+    def enable_slow_query_log(self, slow_query_log):
+        """Logs statements over the log's threshold, and a sample of the others, to its JSON lines file."""
+        self.slow_query_log = slow_query_log
+        return slow_query_log
+
+    def invalidate_cached_tables(self, *tables):
+        """Drops cached results reading tables, called after bulk loads and batches that write to them."""
+        if self.result_cache is not None:
+            # Names passed here are quoted as identifiers, so only the schema is stripped.
+            self.result_cache.invalidate_tables({table.split('.')[-1] for table in tables})
+
+    def close_result_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+    def track_forks(self, fork_settings=None):
+        """Makes a forked child drop the connections it inherited from this object and open its own.
+
+        Call it from __init__ of connection types that hold sockets or threads.
+        """
+        fork_settings = fork_settings or {}
+        self.prewarm_after_fork = bool(fork_settings.get('prewarm_after_fork', False))
+        self.owner_pid = os.getpid()
+        fork_safety.track(self)
+
+    def check_fork(self):
+        """Resets inherited connections on first use in a child that forked without running at-fork handlers.
+
+        uWSGI and C extensions can fork without os.register_at_fork() handlers, this pid check catches that.
+        """
+        if self.owner_pid is not None and self.owner_pid != os.getpid():
+            self.handle_fork()
+
+    def handle_fork(self):
+        self.owner_pid = os.getpid()
+        self.discard_inherited()
+        if self.result_cache is not None:
+            self.result_cache.handle_fork()
+
+    def discard_inherited(self):
+        """Forgets the parent's connections without closing them, connection types with sockets override it."""
+        pass
+
+    def pool_stats(self):
+        """Pool counters included in metrics snapshots, connection types without a pool have none."""
+        return None
+
+    @contextmanager
+    def observe_query(self, query=None, params=None):
+        """Times the statement run inside the block and counts it as an error if it raises.
+
+        The timing goes to the metrics and, for single statements, to the slow query log.
+        """
+        metrics = self.metrics
+        slow_query_log = self.slow_query_log if query is not None else None
+        if metrics is None and slow_query_log is None:
+            yield
+            return
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            if metrics is not None:
+                metrics.record_error(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if metrics is not None:
+                metrics.query_latency.observe(seconds)
+            if slow_query_log is not None:
+                slow_query_log.observe(query, params, seconds, error)
@@ -0,0 +1,206 @@
+import atexit
+import os
+import threading
+from pathlib import Path
+
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.connections.pool_registry import PoolRegistry
+from dblinker.connections.postgres.postgres_connection_factory import PostgresConnectionFactory
+from dblinker.connections.sqlite.sqlite_connection_factory import SQLiteConnectionFactory
+
+# Connection types served by get(), the others are asyncio connections handed out by aget().
+SYNC_CONNECTION_TYPES = ('normal', 'pool', 'routing')
+# Connection types shared through the pool registry, 'normal' and 'async' connections belong to the caller.
+SHARED_CONNECTION_TYPES = ('pool', 'routing', 'async_pool', 'sharded')
+
+
+class CatalogEntry:
+    """One indexed config file: the connection name it is served under and where it came from."""
+
+    __slots__ = ('name', 'path', 'database_type', 'connection_type', 'description')
+
+    def __init__(self, name, path, database_type, connection_type, description):
+        self.name = name
+        self.path = path
+        self.database_type = database_type
+        self.connection_type = connection_type
+        self.description = description
+
+    def __repr__(self):
+        return f"CatalogEntry({self.name!r}, {self.path!r})"
+
+
+class ConnectionCatalog:
+    """Serves the configs of one directory by their connectionName, building pools only when first asked for.
+
+    The directory is indexed on first use and re-indexed whenever its mtime changes, which adding, removing
+    or renaming a file does. A file edited in place is picked up on its next get() through the config
+    loader's own mtime check. Pools live in the catalog's PoolRegistry: a pool that hasn't been asked for or
+    run a statement in idle_timeout seconds is released, by the next get() or by a background reaper thread when the process
+    goes quiet. Its connections are closed and opened again on its next use, callers may keep holding it.
+    """
+
+    def __init__(self, directory=None, pattern='*.yaml', pool_registry=None, config_loader=None, idle_timeout=600,
+                 max_pools=64):
+        if directory is None:
+            # The default directory comes from appConnectionConfigDir in app_settings.yaml.
+            from dblinker.managers.settings_manager import SettingsManager
+            directory = SettingsManager().connection_config_dir()
+            if directory is None:
+                raise ValueError("No config directory given and appConnectionConfigDir is not set in app_settings.yaml.")
+        self.directory = Path(directory).expanduser()
+        self.pattern = pattern
+        self.config_loader = config_loader if config_loader is not None else default_config_loader
+        if pool_registry is None:
+            # A registry of its own, so idle_timeout and max_pools apply to the catalog's pools only.
+            pool_registry = PoolRegistry(max_pools=max_pools, idle_timeout=idle_timeout)
+            atexit.register(pool_registry.close_all)
+        self.pool_registry = pool_registry
+        # name -> CatalogEntry, rebuilt when the directory's mtime moves away from _indexed_mtime.
+        self._index = {}
+        self._indexed_mtime = None
+        # Path -> error message of the files that could not be indexed, broken or sharing a name.
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def _check_index(self):
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Connection config directory does not exist: {self.directory}") from None
+        if mtime != self._indexed_mtime:
+            with self._lock:
+                if mtime != self._indexed_mtime:
+                    self._build_index(mtime)
+
+    def _build_index(self, mtime):
+        index, errors, duplicates = {}, {}, {}
+        for path in sorted(self.directory.glob(self.pattern)):
+            if not path.is_file():
+                continue
+            try:
+                dbconfig = self.config_loader.load(path)
+            except Exception as e:
+                # One broken file must not take every other connection down with it.
+                errors[str(path)] = str(e)
+                continue
+            name = self.connection_name(dbconfig, path)
+            if name in index or name in duplicates:
+                duplicates.setdefault(name, [index.pop(name).path] if name in index else []).append(str(path))
+                continue
+            index[name] = CatalogEntry(name, str(path), dbconfig.database_type, dbconfig.connection_type,
+                                       dbconfig.description)
+        # An ambiguous name is served by none of its files rather than by whichever sorts first.
+        for name, paths in duplicates.items():
+            for path in paths:
+                errors[path] = f"connectionName '{name}' is used by {len(paths)} files: {', '.join(paths)}"
+        self._index, self.errors, self._indexed_mtime = index, errors, mtime
+
+    @staticmethod
+    def connection_name(dbconfig, path):
+        """The name a config is served under: its connectionName, or the file name without its suffix."""
+        name = dbconfig.connection_name
+        # The config templates ship a '# ...' placeholder, a file still holding it has no name of its own.
+        if not isinstance(name, str) or not name.strip() or name.lstrip().startswith('#'):
+            return Path(path).stem
+        return name.strip()
+
+    def refresh(self):
+        """Re-indexes the directory on the next lookup, e.g. after editing a file's connectionName."""
+        with self._lock:
+            self._indexed_mtime = None
+
+    def entries(self):
+        """The indexed configs, sorted by name."""
+        self._check_index()
+        return sorted(self._index.values(), key=lambda entry: entry.name)
+
+    def names(self):
+        return [entry.name for entry in self.entries()]
+
+    def config(self, name):
+        """Returns the DBConfig served under name."""
+        self._check_index()
+        entry = self._index.get(name)
+        if entry is None:
+            hint = f", {len(self.errors)} file(s) in the directory failed to load" if self.errors else ''
+            raise KeyError(f"No connection named '{name}' in {self.directory}{hint}")
+        dbconfig = self.config_loader.load(entry.path)
+        if self.connection_name(dbconfig, entry.path) != name:
+            # The file was edited in place and renamed its connection, look the name up afresh.
+            self.refresh()
+            return self.config(name)
+        return dbconfig
+
+    def get(self, name):
+        """Returns the connection for name: the shared pool for pool and routing configs, built on first use,
+        or a new connected 'normal' connection owned by the caller. Async connection types need aget().
+        """
+        dbconfig = self.config(name)
+        if dbconfig.connection_type not in SYNC_CONNECTION_TYPES:
+            raise ValueError(f"'{name}' is an {dbconfig.connection_type} connection, use aget() instead.")
+        if dbconfig.connection_type in SHARED_CONNECTION_TYPES:
+            self._start_reaper()
+            return self.pool_registry.get_pool(dbconfig)
+        connection = self._factory(dbconfig).get_connection()
+        connection.connect()
+        return connection
+
+    async def aget(self, name):
+        """Returns the asyncio connection for name: the shared async_pool or sharded router on this event loop,
+        built on first use, or a new connected 'async' connection owned by the caller.
+        """
+        dbconfig = self.config(name)
+        if dbconfig.connection_type in SYNC_CONNECTION_TYPES:
+            raise ValueError(f"'{name}' is a {dbconfig.connection_type} connection, use get() instead.")
+        if dbconfig.connection_type in SHARED_CONNECTION_TYPES:
+            return await self.pool_registry.get_async_pool(dbconfig)
+        connection = self._factory(dbconfig).get_connection()
+        await connection.connect()
+        return connection
+
+    @staticmethod
+    def _factory(dbconfig):
+        if dbconfig.database_type == 'sqlite':
+            return SQLiteConnectionFactory(dbconfig)
+        return PostgresConnectionFactory(dbconfig)
+
+    def _start_reaper(self):
+        # Started on the first pool, and again in a forked child whose copy of the thread is gone.
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self._lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._stop.clear()
+                self._reaper = threading.Thread(target=self._reap, name='dblinker-catalog-reaper', daemon=True)
+                self._reaper.start()
+
+    def _reap(self):
+        # Async pools are bound to their event loop, they are closed by the next aget() on that loop instead.
+        interval = max(self.pool_registry.idle_timeout / 2, 1)
+        while not self._stop.wait(interval):
+            self.pool_registry.evict_idle()
+
+    def pool_count(self):
+        """Open pools built by the catalog, released ones excluded."""
+        return len(self.pool_registry)
+
+    def close(self):
+        """Stops the reaper and closes every synchronous pool."""
+        self._stop.set()
+        self.pool_registry.close_all()
+
+    async def aclose(self):
+        """Stops the reaper and closes every pool, awaiting the async pools of the running loop."""
+        self._stop.set()
+        await self.pool_registry.aclose_all()
+
+    def __contains__(self, name):
+        self._check_index()
+        return name in self._index
+
+    def __len__(self):
+        self._check_index()
+        return len(self._index)
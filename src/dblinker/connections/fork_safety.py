@@ -0,0 +1,64 @@
+import os
+import weakref
+
+# Objects to reset in a forked child, anything with a handle_fork() method.
+_tracked = weakref.WeakSet()
+# Connections inherited from the parent process. They are kept referenced so garbage collection never
+# closes them, closing would end the parent's session or, for SQLite, checkpoint the parent's WAL.
+_abandoned = []
+_registered = False
+
+
+def track(obj):
+    """Calls obj.handle_fork() in the child after every os.fork(), gunicorn and multiprocessing forks included."""
+    global _registered
+    if not _registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        _registered = True
+    _tracked.add(obj)
+
+
+def _after_fork_in_child():
+    # Abandoned objects were inherited once more by this child, they stay referenced here as well.
+    for obj in list(_tracked):
+        try:
+            obj.handle_fork()
+        except Exception:
+            # A failure here must not break the child, the object is rebuilt on its next use at worst.
+            pass
+
+
+def detach_socket(connection):
+    """Points a psycopg connection's socket at /dev/null in this process only.
+
+    The parent's copy of the socket stays open and in use. Anything libpq writes on close, such as the
+    Terminate message or a TLS close_notify, goes nowhere instead of into the parent's session.
+    """
+    try:
+        fd = connection.pgconn.socket
+    except Exception:
+        # Already closed or broken, there is no socket left to protect.
+        return
+    devnull = os.open(os.devnull, os.O_RDWR)
+    try:
+        os.dup2(devnull, fd)
+    finally:
+        os.close(devnull)
+
+
+def abandon(*objects):
+    """Keeps inherited objects alive for the rest of the process so they are never closed."""
+    _abandoned.extend(obj for obj in objects if obj is not None)
+
+
+def abandon_pool(pool):
+    """Abandons a psycopg_pool pool inherited from the parent, detaching the sockets of its idle connections.
+
+    Connections that were checked out at fork time belong to threads that don't exist in the child,
+    they are never returned to the pool and never closed.
+    """
+    if pool is None:
+        return
+    for connection in list(getattr(pool, '_pool', ())):
+        detach_socket(connection)
+    abandon(pool)
@@ -0,0 +1,242 @@
+import asyncio
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from dblinker.common.config.config_loader import DBConfig
+from dblinker.connections import fork_safety
+from dblinker.connections.postgres.postgres_connection_factory import PostgresConnectionFactory
+from dblinker.connections.sqlite.sqlite_connection_factory import SQLiteConnectionFactory
+
+
+class PoolRegistry:
+    """Process-wide registry handing back the same live pool for identical connection settings."""
+
+    def __init__(self, max_pools=32, idle_timeout=600):
+        # Maximum number of open pools kept before the least recently used one is released.
+        self.max_pools = max_pools
+        # Time in seconds a pool can go without being requested or running a statement before it is released.
+        self.idle_timeout = idle_timeout
+        # Ordered from least to most recently used, values are [connection, last_used, loop, released].
+        # Released pools closed their connections but stay registered: callers may still hold them, and
+        # they open new connections on their next use, so handing out another object would duplicate them.
+        self._pools = OrderedDict()
+        # key -> asyncio.Future of an async pool being connected, later callers await it instead of using
+        # the pool before it is open.
+        self._connecting = {}
+        self._lock = threading.Lock()
+        # Registered pools rebuild themselves in a forked child, so preloading apps can share one registry.
+        fork_safety.track(self)
+
+    def handle_fork(self):
+        # The lock may have been held by one of the parent's threads at fork time.
+        self._lock = threading.Lock()
+        # The parent's event loops don't run in the child.
+        self._connecting = {}
+
+    @staticmethod
+    def make_key(config):
+        """Builds a hashable key from the normalized connection and pool settings of a config."""
+        dbconfig = config if isinstance(config, DBConfig) else DBConfig.from_dict(config)
+        return dbconfig.key
+
+    @staticmethod
+    def _build_connection(dbconfig):
+        if dbconfig.database_type == 'sqlite':
+            connection = SQLiteConnectionFactory(dbconfig).get_connection()
+        else:
+            connection = PostgresConnectionFactory(dbconfig).get_connection()
+        connection.registry_managed = True
+        return connection
+
+    def get_pool(self, config):
+        """Returns the shared pool connection for a DBConfig (or config dict), creating it on first use."""
+        dbconfig = config if isinstance(config, DBConfig) else DBConfig.from_dict(config)
+        key = dbconfig.key
+        with self._lock:
+            evicted = self._collect_evictions(skip_key=key, include_async=False)
+            entry = self._pools.get(key)
+            if entry is None:
+                connection = self._build_connection(dbconfig)
+                # Sync connect() only sets up the pools (routing opens one per host), it doesn't wait on the server.
+                connection.connect()
+                entry = self._pools[key] = [connection, time.monotonic(), None, False]
+            self._touch(key, entry)
+        self._release_sync(evicted)
+        return entry[0]
+
+    async def get_async_pool(self, config):
+        """Returns the shared async pool (or sharded router) for a DBConfig (or config dict) on the running loop.
+
+        A pool is only handed out once connected, tasks asking while the first one connects wait for it.
+        """
+        dbconfig = config if isinstance(config, DBConfig) else DBConfig.from_dict(config)
+        loop = asyncio.get_running_loop()
+        # Async pools are bound to the loop that opened them, so each loop gets its own pool.
+        key = dbconfig.key + (id(loop),)
+        while True:
+            with self._lock:
+                evicted = self._collect_evictions(skip_key=key, include_async=True)
+                entry = self._pools.get(key)
+                if entry is not None and entry[2] is not loop:
+                    # The id belonged to a loop that has since been closed, the old pool is unusable.
+                    del self._pools[key]
+                    entry = None
+                pending = self._connecting.get(key)
+                if pending is not None and pending.get_loop() is not loop:
+                    pending = None
+                creating = entry is None and pending is None
+                if entry is not None:
+                    self._touch(key, entry)
+                elif creating:
+                    pending = self._connecting[key] = loop.create_future()
+            try:
+                for connection, connection_loop in evicted:
+                    await self._release(connection, connection_loop)
+            except BaseException as e:
+                if creating:
+                    # Waiting tasks would otherwise wait on a pool nobody is connecting anymore.
+                    self._abandon_pending(key, pending, e)
+                raise
+            if entry is not None:
+                return entry[0]
+            if creating:
+                return await self._connect_async(key, dbconfig, loop, pending)
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The task connecting the pool was cancelled, this one tries again.
+
+    async def _connect_async(self, key, dbconfig, loop, pending):
+        connection = self._build_connection(dbconfig)
+        try:
+            await connection.connect()
+        except BaseException as e:
+            self._abandon_pending(key, pending, e)
+            try:
+                await connection.disconnect()
+            except Exception:
+                pass
+            raise
+        with self._lock:
+            self._connecting.pop(key, None)
+            entry = self._pools[key] = [connection, time.monotonic(), loop, False]
+            self._touch(key, entry)
+        pending.set_result(connection)
+        return connection
+
+    def _abandon_pending(self, key, pending, error):
+        """Fails the future other tasks wait on when connecting a pool did not complete."""
+        with self._lock:
+            if self._connecting.get(key) is pending:
+                del self._connecting[key]
+        if isinstance(error, asyncio.CancelledError):
+            pending.cancel()
+        else:
+            pending.set_exception(error)
+            # Marks the exception as retrieved when no other task was waiting for it.
+            pending.exception()
+
+    def _touch(self, key, entry):
+        entry[1] = time.monotonic()
+        # A released pool reopens on its next use, it counts as open again.
+        entry[3] = False
+        self._pools.move_to_end(key)
+
+    def _collect_evictions(self, skip_key, include_async):
+        """Marks idle and least recently used pools as released, returning (connection, loop) pairs to release.
+
+        Only synchronous pools, and with include_async the async pools of the running loop, are considered,
+        async pools of other loops can't be closed from here.
+        """
+        for key in [key for key, entry in self._pools.items() if entry[2] is not None and entry[2].is_closed()]:
+            # The pool's loop is gone, nothing can use or close it anymore.
+            del self._pools[key]
+        running = asyncio.get_running_loop() if include_async else None
+        candidates = [(key, entry) for key, entry in self._pools.items()
+                      if key != skip_key and not entry[3] and (entry[2] is None or entry[2] is running)]
+        # A pool counts as used when it was handed out or ran a statement, callers may keep holding it.
+        candidates.sort(key=lambda item: self._last_used(item[1]))
+        now = time.monotonic()
+        evicted = []
+        for key, entry in candidates:
+            if now - self._last_used(entry) > self.idle_timeout and not entry[0].in_use():
+                entry[3] = True
+                evicted.append((entry[0], entry[2]))
+        # Keep room for the pool that is about to be requested.
+        reserve = 0 if skip_key is None or skip_key in self._pools else 1
+        overflow = len(self) - self.max_pools + reserve
+        for key, entry in candidates:
+            if overflow <= 0:
+                break
+            if entry[3] or entry[0].in_use():
+                continue
+            entry[3] = True
+            evicted.append((entry[0], entry[2]))
+            overflow -= 1
+        return evicted
+
+    @staticmethod
+    def _last_used(entry):
+        return max(entry[1], entry[0].last_used)
+
+    def _keep_open(self, connection):
+        """Counts a pool whose release() found a statement running as open again."""
+        with self._lock:
+            for entry in self._pools.values():
+                if entry[0] is connection:
+                    entry[3] = False
+
+    def _release_sync(self, evicted):
+        for connection, _ in evicted:
+            if connection.release() is False:
+                self._keep_open(connection)
+
+    async def _release(self, connection, loop):
+        # Synchronous pools release in place, async ones (loop is the running loop here) are awaited.
+        released = connection.release() if loop is None else await connection.release()
+        if released is False:
+            self._keep_open(connection)
+
+    @staticmethod
+    async def _close(connection, loop):
+        if loop is None:
+            connection.disconnect()
+        elif loop is asyncio.get_running_loop():
+            await connection.disconnect()
+        # Async pools of other loops cannot be awaited from here, they are dropped with their loop.
+
+    def evict_idle(self):
+        """Releases synchronous pools that have not been requested within idle_timeout."""
+        with self._lock:
+            evicted = self._collect_evictions(skip_key=None, include_async=False)
+        self._release_sync(evicted)
+
+    def close_all(self):
+        """Closes every synchronous pool and forgets all async pools, used on shutdown."""
+        with self._lock:
+            entries = list(self._pools.values())
+            self._pools.clear()
+        for connection, _, loop, _ in entries:
+            if loop is None:
+                connection.disconnect()
+
+    async def aclose_all(self):
+        """Closes every pool, awaiting the async pools that belong to the running loop."""
+        with self._lock:
+            entries = list(self._pools.values())
+            self._pools.clear()
+        for connection, _, loop, _ in entries:
+            await self._close(connection, loop)
+
+    def __len__(self):
+        """The number of open pools, released ones excluded."""
+        return sum(not entry[3] for entry in self._pools.values())
+
+
+# The process-wide registry used by DBConnectionManager unless another registry is given.
+default_pool_registry = PoolRegistry()
+atexit.register(default_pool_registry.close_all)
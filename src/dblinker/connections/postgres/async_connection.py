@@ -1,28 +1,147 @@
+from contextlib import asynccontextmanager
 from psycopg import AsyncConnection, OperationalError
-from .base_connection import BaseConnection
+from psycopg.pq import TransactionStatus
+from dblinker.common.result_cache import MISS
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE
+from ..fork_safety import abandon, detach_socket
+from .base_connection import PostgresBaseConnection, COPY_CHUNK_SIZE, STREAM_BATCH_SIZE, TIMEOUT_SETTINGS
 
 
-class PGAsyncConnection(BaseConnection):
-    def __init__(self, config, post_connect_async_settings=None):
+class PGAsyncConnection(PostgresBaseConnection):
+    def __init__(self, config, post_connect_async_settings=None, pipeline_settings=None, fork_settings=None,
+                 timeout_settings=None):
         super().__init__()
         self.config = config
         # This dictionary can contain settings to be applied after the connection is established
         self.post_connect_async_settings = post_connect_async_settings or {}
         self.connection: AsyncConnection = None
+        self.init_pipeline_settings(pipeline_settings)
+        # Timeouts given in async_settings take precedence over the timeout_settings section.
+        self.init_timeout_settings(dict(timeout_settings or {}, **{
+            key: value for key, value in self.post_connect_async_settings.items() if key in TIMEOUT_SETTINGS}))
+        self.track_forks(fork_settings)
 
     async def connect(self):
         """Establishes an asynchronous database connection."""
         if self.connection is None or self.connection.closed:
             self.connection = await AsyncConnection.connect(**self.config)
+            await self.configure_session_async(self.connection)
             await self.apply_post_connect_settings()
 
+    def discard_inherited(self):
+        """Forgets the parent's connection in a forked child, the next statement opens this process's own."""
+        inherited, self.connection = self.connection, None
+        if inherited is not None:
+            detach_socket(inherited)
+            abandon(inherited)
+
     async def apply_post_connect_settings(self):
         """Applies any settings that need to be set after the connection is established."""
         for setting, value in self.post_connect_async_settings.items():
+            if setting in TIMEOUT_SETTINGS:
+                # Already applied, statement_timeout by configure_session_async and command_timeout per call.
+                continue
             # This example assumes settings can be applied directly as attributes
             # Adjust this method based on the actual async settings and their required handling
             setattr(self.connection, setting, value)
 
+    @asynccontextmanager
+    async def borrow_connection(self):
+        """Yields the underlying psycopg connection, connecting first if needed.
+
+        Like a pool checkout, a transaction started inside the block is committed when it ends, or rolled
+        back on error. A transaction the caller already had open is left for the caller to finish.
+        """
+        self.check_fork()
+        if self.connection is None or self.connection.closed:
+            await self.connect()
+        conn = self.connection
+        owns_transaction = conn.info.transaction_status == TransactionStatus.IDLE
+        try:
+            yield conn
+        except BaseException:
+            if owns_transaction and not conn.closed:
+                await conn.rollback()
+            raise
+        if owns_transaction:
+            await conn.commit()
+
+    async def bulk_load(self, table, columns=None, rows=None, source_file=None, file_format='csv', header=False,
+                        binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """Streams rows (an iterable or async iterable of tuples) or a COPY file into table using COPY FROM STDIN.
+
+        binary=True sends rows in the binary COPY format, pass types (e.g. ['int8', 'text']) alongside it.
+        Returns the number of rows loaded.
+        """
+        async with self.borrow_connection() as conn:
+            with self.observe_query():
+                loaded = await self.copy_rows_async(conn, table, columns, rows, source_file, file_format, header,
+                                                    binary, types, chunk_size)
+        self.invalidate_cached_tables(table)
+        return loaded
+
+    async def export(self, query, output, params=None, file_format='csv', compression=None, max_size=None,
+                     level=None, header=False):
+        """Streams the result of query into files through COPY TO STDOUT, see copy_to_files.
+
+        compression is None, 'gzip' or 'zstd', max_size starts numbered files of about that many bytes.
+        """
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                return await self.copy_to_files_async(conn, query, output, params, file_format, compression,
+                                                      max_size, level, header)
+
+    async def stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of query from a server-side cursor, or lists of rows with batches=True.
+
+        The connection is held until the generator is exhausted or closed with aclose().
+        """
+        async with self.borrow_connection() as conn:
+            rows = self.stream_rows_async(conn, query, params, batch_size, batches)
+            try:
+                with self.observe_query(query, params):
+                    async for item in rows:
+                        yield item
+            finally:
+                # 'async for' doesn't close the inner generator, close it now so its transaction ends in order.
+                await rows.aclose()
+
+    async def fetch_numpy(self, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE, expected_rows=None,
+                          structured=False):
+        """Fetches a SELECT into NumPy arrays instead of row tuples, see fetch_columns. Needs numpy installed."""
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                return await self.fetch_columns_async(conn, query, params, dtypes, batch_size, expected_rows,
+                                                      structured)
+
+    async def execute(self, query, params=None, prepare=None, timeout=None):
+        """Runs one statement, returning its rows when it produces a result set and None otherwise.
+
+        timeout is a deadline in seconds, command_timeout when None and 0 for none. The server cancels the
+        statement when it passes, as it does when the calling task is cancelled, see run_execute_async.
+        """
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(query, params)
+            if rows is not MISS:
+                return rows
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                rows = await self.run_execute_async(conn, query, params, prepare, self.resolve_timeout(timeout))
+        if cache is not None:
+            cache.store(token, query, rows)
+        return rows
+
+    async def execute_batch(self, query, params_seq, prepare=None):
+        """Runs query once per parameter set in pipeline mode and one transaction, returning the statement count."""
+        return await self.execute_pipeline(((query, params) for params in params_seq), prepare)
+
+    async def execute_pipeline(self, statements, prepare=None):
+        """Runs a sync or async iterable of (query, params) pairs in pipeline mode and one transaction."""
+        async with self.borrow_connection() as conn:
+            with self.observe_query():
+                return await self.run_pipeline_async(conn, statements, prepare)
+
     async def __aenter__(self):
         if self.connection is None or self.connection.closed:
             await self.connect()
@@ -42,6 +161,7 @@ class PGAsyncConnection(BaseConnection):
 
     async def disconnect(self):
         """Closes the asynchronous database connection."""
+        self.close_result_cache()
         if self.connection and not self.connection.closed:
             await self.connection.close()
             self.connection = None
@@ -1,13 +1,54 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from psycopg_pool import AsyncConnectionPool
-from .base_connection import PostgresBaseConnection
+from dblinker.common.result_cache import MISS
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE
+from ..fork_safety import abandon_pool
+from .base_connection import PostgresBaseConnection, COPY_CHUNK_SIZE, STREAM_BATCH_SIZE
+
+
+class QueryResult:
+    """The outcome of one query run by run_many() or as_completed()."""
+
+    __slots__ = ('index', 'query', 'params', 'rows', 'error', 'wait_time', 'latency')
+
+    def __init__(self, index, query, params):
+        # Position of the query in the input, results of as_completed() arrive out of order.
+        self.index = index
+        self.query = query
+        self.params = params
+        self.rows = None
+        self.error = None
+        # Seconds spent waiting for a pool connection, and seconds from checkout to the last row.
+        self.wait_time = 0.0
+        self.latency = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'error={self.error!r}'
+        return f"QueryResult(index={self.index}, {status}, wait={self.wait_time:.4f}s, latency={self.latency:.4f}s)"
 
 
 class PGAsyncPoolConnection(PostgresBaseConnection):
-    def __init__(self, config, pool_settings=None):
+    def __init__(self, config, pool_settings=None, conninfo=None, pipeline_settings=None, fork_settings=None,
+                 timeout_settings=None):
         super().__init__()  # Call super if the base class has an __init__ method
         self.config = config
+        # A precomputed conninfo string (see DBConfig) saves rebuilding it from the config dict.
+        self.conninfo = conninfo
         self.pool_settings = pool_settings or {}
+        # Set by PoolRegistry when the pool is shared, shared pools outlive 'async with' blocks.
+        self.registry_managed = False
+        self.init_pipeline_settings(pipeline_settings)
+        self.init_timeout_settings(timeout_settings)
         self.pool = None
+        # Checkouts running right now, only touched on the pool's event loop.
+        self._borrowers = 0
+        self.track_forks(fork_settings)
 
     def construct_dsn(self):
         """Assuming self.config directly contains connection info as a dict."""
@@ -16,9 +57,202 @@ class PGAsyncPoolConnection(PostgresBaseConnection):
         return " ".join([f"{k}={v}" for k, v in self.config.items()])
 
     async def connect(self):
-        dsn = self.construct_dsn()
+        dsn = self.conninfo or self.construct_dsn()
         # Initialize AsyncConnectionPool with DSN and any pool-specific settings
-        self.pool = AsyncConnectionPool(conninfo=dsn, **self.pool_settings)
+        self.pool = AsyncConnectionPool(conninfo=dsn, configure=self.configure_session_async,
+                                        **self.pool_settings)
+
+    def discard_inherited(self):
+        """Abandons the parent's pool in a forked child, the first checkout opens this process's own.
+
+        Async pools belong to an event loop, so there is nothing to prewarm until the child runs one.
+        """
+        inherited, self.pool = self.pool, None
+        self._borrowers = 0
+        abandon_pool(inherited)
+
+    @asynccontextmanager
+    async def borrow_connection(self):
+        """Checks a connection out of the pool for the duration of the block."""
+        self.check_fork()
+        if not self.pool:
+            await self.connect()
+        # Counted before the first await, so a release() on the same loop sees the checkout.
+        pool = self.pool
+        self._borrowers += 1
+        self.last_used = time.monotonic()
+        try:
+            metrics = self.metrics
+            requested = time.perf_counter()
+            async with pool.connection() as conn:
+                if metrics is not None:
+                    metrics.checkout_wait.observe(time.perf_counter() - requested)
+                yield conn
+        finally:
+            self._borrowers -= 1
+            self.last_used = time.monotonic()
+
+    def in_use(self):
+        return self._borrowers > 0
+
+    def pool_stats(self):
+        """psycopg_pool's counters and gauges, see AsyncConnectionPool.get_stats()."""
+        pool = self.pool
+        return pool.get_stats() if pool else {}
+
+    async def bulk_load(self, table, columns=None, rows=None, source_file=None, file_format='csv', header=False,
+                        binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """Streams rows (an iterable or async iterable of tuples) or a COPY file into table using COPY FROM STDIN.
+
+        binary=True sends rows in the binary COPY format, pass types (e.g. ['int8', 'text']) alongside it.
+        Returns the number of rows loaded.
+        """
+        async with self.borrow_connection() as conn:
+            with self.observe_query():
+                loaded = await self.copy_rows_async(conn, table, columns, rows, source_file, file_format, header,
+                                                    binary, types, chunk_size)
+        self.invalidate_cached_tables(table)
+        return loaded
+
+    async def export(self, query, output, params=None, file_format='csv', compression=None, max_size=None,
+                     level=None, header=False):
+        """Streams the result of query into files through COPY TO STDOUT, see copy_to_files.
+
+        compression is None, 'gzip' or 'zstd', max_size starts numbered files of about that many bytes.
+        """
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                return await self.copy_to_files_async(conn, query, output, params, file_format, compression,
+                                                      max_size, level, header)
+
+    async def stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of query from a server-side cursor, or lists of rows with batches=True.
+
+        The connection is held until the generator is exhausted or closed with aclose().
+        """
+        async with self.borrow_connection() as conn:
+            rows = self.stream_rows_async(conn, query, params, batch_size, batches)
+            try:
+                with self.observe_query(query, params):
+                    async for item in rows:
+                        yield item
+            finally:
+                # 'async for' doesn't close the inner generator, close it now so its transaction ends in order.
+                await rows.aclose()
+
+    async def fetch_numpy(self, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE, expected_rows=None,
+                          structured=False):
+        """Fetches a SELECT into NumPy arrays instead of row tuples, see fetch_columns. Needs numpy installed."""
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                return await self.fetch_columns_async(conn, query, params, dtypes, batch_size, expected_rows,
+                                                      structured)
+
+    async def execute(self, query, params=None, prepare=None, timeout=None):
+        """Runs one statement, returning its rows when it produces a result set and None otherwise.
+
+        timeout is a deadline in seconds, command_timeout when None and 0 for none. The server cancels the
+        statement when it passes, as it does when the calling task is cancelled, see run_execute_async.
+        """
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(query, params)
+            if rows is not MISS:
+                return rows
+        async with self.borrow_connection() as conn:
+            with self.observe_query(query, params):
+                rows = await self.run_execute_async(conn, query, params, prepare, self.resolve_timeout(timeout))
+        if cache is not None:
+            cache.store(token, query, rows)
+        return rows
+
+    async def execute_batch(self, query, params_seq, prepare=None):
+        """Runs query once per parameter set in pipeline mode and one transaction, returning the statement count."""
+        return await self.execute_pipeline(((query, params) for params in params_seq), prepare)
+
+    async def execute_pipeline(self, statements, prepare=None):
+        """Runs a sync or async iterable of (query, params) pairs in pipeline mode and one transaction."""
+        async with self.borrow_connection() as conn:
+            with self.observe_query():
+                return await self.run_pipeline_async(conn, statements, prepare)
+
+    def default_concurrency(self):
+        """The pool's max_size, running more queries than that at once only queues them inside the pool."""
+        if self.pool is not None:
+            return self.pool.max_size
+        return self.pool_settings.get('max_size') or self.pool_settings.get('min_size', 4)
+
+    async def _run_one(self, index, query, params, timeout):
+        result = QueryResult(index, query, params)
+        requested = time.perf_counter()
+        checked_out = None
+        # Checkout failures, a PoolTimeout for one, are reported through result.error like query errors.
+        try:
+            async with self.borrow_connection() as conn:
+                checked_out = time.perf_counter()
+                result.wait_time = checked_out - requested
+                with self.observe_query(query, params):
+                    result.rows = await self.run_execute_async(conn, query, params, timeout=timeout)
+        except Exception as e:
+            result.error = e
+            if checked_out is None:
+                result.wait_time = time.perf_counter() - requested
+                # observe_query() never saw this statement, count the failed checkout here.
+                if self.metrics is not None:
+                    self.metrics.record_error(e)
+        if checked_out is not None:
+            result.latency = time.perf_counter() - checked_out
+        return result
+
+    async def as_completed(self, queries, concurrency=None, return_exceptions=False, timeout=None):
+        """Runs queries on the pool, yielding a QueryResult as each one finishes.
+
+        queries is an iterable of SQL strings or (query, params) pairs and is consumed lazily: at most
+        concurrency queries (the pool's max_size by default) are in flight, the next one is only started
+        when another finishes. With return_exceptions=False the first failure cancels the queries still
+        running and is raised, otherwise failures are reported through QueryResult.error. Closing the
+        generator or cancelling the consuming task cancels everything still in flight, on the server too.
+        timeout is the deadline of each query, as for execute().
+        """
+        if not self.pool:
+            await self.connect()
+        concurrency = min(concurrency or self.default_concurrency(), self.default_concurrency())
+        timeout = self.resolve_timeout(timeout)
+        pending = set()
+        items = enumerate(queries)
+        try:
+            while True:
+                for index, item in items:
+                    query, params = (item, None) if isinstance(item, str) else item
+                    pending.add(asyncio.ensure_future(self._run_one(index, query, params, timeout)))
+                    if len(pending) >= concurrency:
+                        break
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result.error is not None and not return_exceptions:
+                        raise result.error
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                # Wait for the cancelled queries so their connections are back in the pool before returning.
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run_many(self, queries, concurrency=None, return_exceptions=False, timeout=None):
+        """Runs queries with bounded concurrency, returning their QueryResults in input order."""
+        results = []
+        completed = self.as_completed(queries, concurrency, return_exceptions, timeout)
+        try:
+            async for result in completed:
+                results.append(result)
+        finally:
+            await completed.aclose()
+        results.sort(key=lambda result: result.index)
+        return results
 
     async def __aenter__(self):
         if not self.pool:
@@ -26,17 +260,29 @@ class PGAsyncPoolConnection(PostgresBaseConnection):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.disconnect()
+        if not self.registry_managed:
+            await self.disconnect()
 
     async def test_connection(self):
         if not self.pool:
             await self.connect()
-        async with self.pool.connection() as conn:
+        async with self.borrow_connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute('SELECT 1;')
                 print("Async pool connection successful: ", await cur.fetchone())
 
     async def disconnect(self):
-        if self.pool:
-            await self.pool.close()
-            self.pool = None
+        self.close_result_cache()
+        await self._close_pool()
+
+    async def release(self):
+        """Closes the pool, the next checkout opens a new one. False while a connection is checked out."""
+        if self._borrowers:
+            return False
+        await self._close_pool()
+        return True
+
+    async def _close_pool(self):
+        pool, self.pool = self.pool, None
+        if pool:
+            await pool.close()
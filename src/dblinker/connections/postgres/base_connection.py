@@ -1,7 +1,454 @@
+import asyncio
+import itertools
 from abc import ABC, abstractmethod
+from pathlib import Path
+from psycopg import sql, Pipeline, AsyncPipeline
+from psycopg.pq import TransactionStatus
+from dblinker.common.columnar import ColumnarBuilder, COLUMNAR_BATCH_SIZE
+from dblinker.common.export_writer import RotatingExportWriter
+from dblinker.common.sql_text import is_read_only_statement
 from ..base import BaseConnection  # Assuming base.py contains BaseConnection and is in the same directory level
 
+# Bytes read from a source file per COPY write, this bounds memory use regardless of the file size.
+COPY_CHUNK_SIZE = 1024 * 1024
+COPY_FILE_FORMATS = ('csv', 'text', 'binary')
+# Rows fetched from a server-side cursor per round-trip when streaming.
+STREAM_BATCH_SIZE = 2000
+# Statements queued in pipeline mode before a sync point waits for the server's results.
+PIPELINE_DEPTH = 1000
+# The keys of the 'timeout_settings' section, both in seconds.
+TIMEOUT_SETTINGS = ('statement_timeout', 'command_timeout')
+# Seconds the client waits past a deadline for the server's statement_timeout to fire before it cancels the
+# query itself, which covers a server or network that has stopped answering.
+CANCEL_GRACE = 0.5
+# Statements that set statement_timeout, for the session or only the current transaction.
+_SET_SESSION_TIMEOUT = "SELECT set_config('statement_timeout', %s, false)"
+_SET_LOCAL_TIMEOUT = "SELECT current_setting('statement_timeout'), set_config('statement_timeout', %s, true)"
+_RESTORE_LOCAL_TIMEOUT = "SELECT set_config('statement_timeout', %s, true)"
+# Server-side cursors need a name that is unique within the session.
+_cursor_ids = itertools.count(1)
+
+
+def timeout_seconds(value, name='timeout'):
+    """Validates a timeout in seconds, 0 and None both mean no timeout and return None."""
+    if value is None:
+        return None
+    value = float(value)
+    if value < 0:
+        raise ValueError(f"{name} must be a number of seconds, 0 or null to disable it.")
+    return value or None
+
+
+def timeout_setting(seconds):
+    """A timeout in seconds as a statement_timeout value, rounded up so it never becomes 0 (no limit)."""
+    return f"{max(int(seconds * 1000 + 0.999), 1)}ms"
+
 
 class PostgresBaseConnection(BaseConnection, ABC):
-    # PostgreSQL-specific shared behavior (if any)
-    pass
+    # PostgreSQL-specific shared behavior
+
+    def init_pipeline_settings(self, pipeline_settings=None):
+        """Reads the 'pipeline_settings' config section, shared by every Postgres connection type."""
+        pipeline_settings = pipeline_settings or {}
+        self.pipeline_depth = int(pipeline_settings.get('pipeline_depth', PIPELINE_DEPTH))
+        if self.pipeline_depth < 1:
+            raise ValueError("pipeline_depth must be at least 1.")
+        # None keeps psycopg's own defaults: prepare after 5 executions, keep up to 100 prepared statements.
+        self.prepare_threshold = pipeline_settings.get('prepare_threshold', 5)
+        self.prepared_max = pipeline_settings.get('prepared_max', 100)
+
+    def init_timeout_settings(self, timeout_settings=None):
+        """Reads the 'timeout_settings' config section, both values are seconds and 0 or null disables them.
+
+        statement_timeout is set on every session, the server cancels any statement running longer.
+        command_timeout is the default per-call deadline of execute(), see run_execute.
+        """
+        timeout_settings = timeout_settings or {}
+        self.statement_timeout = timeout_seconds(timeout_settings.get('statement_timeout'), 'statement_timeout')
+        self.command_timeout = timeout_seconds(timeout_settings.get('command_timeout'), 'command_timeout')
+
+    def resolve_timeout(self, timeout):
+        """The deadline of one call: the given one, or command_timeout when it is None. 0 disables it."""
+        if timeout is None:
+            return getattr(self, 'command_timeout', None)
+        return timeout_seconds(timeout)
+
+    def configure_session(self, connection):
+        """Prepares a new psycopg connection: prepared statement cache settings, then statement_timeout."""
+        self.configure_prepared_statements(connection)
+        if getattr(self, 'statement_timeout', None):
+            connection.execute(_SET_SESSION_TIMEOUT, (timeout_setting(self.statement_timeout),))
+            # Pools expect configured connections to be idle, not inside the transaction the SELECT opened.
+            connection.commit()
+
+    async def configure_session_async(self, connection):
+        """The asyncio version of configure_session, also the configure callback of async pools."""
+        self.configure_prepared_statements(connection)
+        if getattr(self, 'statement_timeout', None):
+            await connection.execute(_SET_SESSION_TIMEOUT, (timeout_setting(self.statement_timeout),))
+            await connection.commit()
+
+    def configure_prepared_statements(self, connection):
+        """Applies the prepared statement cache settings to a new psycopg connection.
+
+        psycopg keeps a per-connection LRU of prepared statements: a query is prepared once it has run
+        prepare_threshold times, and the least recently used statement is deallocated past prepared_max.
+        """
+        connection.prepare_threshold = self.prepare_threshold
+        if self.prepared_max is not None:
+            connection.prepared_max = int(self.prepared_max)
+
+    @staticmethod
+    def table_identifier(table):
+        """Quotes a table name, 'schema.table' is split into its two parts."""
+        return sql.Identifier(*table.split('.'))
+
+    @classmethod
+    def build_copy_from_statement(cls, table, columns=None, file_format='text', header=False):
+        """Builds COPY table (columns) FROM STDIN with the requested format options."""
+        if file_format not in COPY_FILE_FORMATS:
+            raise ValueError(f"Unsupported COPY format: {file_format}. "
+                             f"Supported formats are: {', '.join(COPY_FILE_FORMATS)}")
+        statement = sql.SQL("COPY {table}").format(table=cls.table_identifier(table))
+        if columns:
+            statement += sql.SQL(" ({columns})").format(columns=sql.SQL(', ').join(map(sql.Identifier, columns)))
+        options = [sql.SQL("FORMAT {}").format(sql.SQL(file_format.upper()))]
+        if header and file_format == 'csv':
+            options.append(sql.SQL("HEADER"))
+        return statement + sql.SQL(" FROM STDIN ({options})").format(options=sql.SQL(', ').join(options))
+
+    @staticmethod
+    def open_source_file(source_file, file_format):
+        """Opens a path for COPY, binary files are read as bytes and text formats as utf-8."""
+        if isinstance(source_file, (str, Path)):
+            path = Path(source_file).expanduser()
+            if file_format == 'binary':
+                return open(path, 'rb')
+            return open(path, 'r', encoding='utf-8', newline='')
+        # Already an open file object, the caller stays responsible for closing it.
+        return None
+
+    @classmethod
+    def copy_rows(cls, connection, table, columns, rows=None, source_file=None, file_format='csv', header=False,
+                  binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """Streams rows or a file into a table over COPY FROM STDIN, returning the number of rows loaded."""
+        if (rows is None) == (source_file is None):
+            raise ValueError("Pass either rows or source_file to bulk_load.")
+        if rows is not None:
+            statement = cls.build_copy_from_statement(table, columns, 'binary' if binary else 'text')
+        else:
+            statement = cls.build_copy_from_statement(table, columns, file_format, header)
+        with connection.transaction():
+            with connection.cursor() as cur:
+                with cur.copy(statement) as copy:
+                    if rows is not None:
+                        if types:
+                            # Binary COPY needs the column types to pick the right wire format.
+                            copy.set_types(types)
+                        for row in rows:
+                            copy.write_row(row)
+                    else:
+                        opened = cls.open_source_file(source_file, file_format)
+                        source = opened or source_file
+                        try:
+                            while True:
+                                chunk = source.read(chunk_size)
+                                if not chunk:
+                                    break
+                                copy.write(chunk)
+                        finally:
+                            if opened:
+                                opened.close()
+                return cur.rowcount
+
+    @classmethod
+    async def copy_rows_async(cls, connection, table, columns, rows=None, source_file=None, file_format='csv',
+                              header=False, binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """The asyncio version of copy_rows, rows may also be an async iterable."""
+        if (rows is None) == (source_file is None):
+            raise ValueError("Pass either rows or source_file to bulk_load.")
+        if rows is not None:
+            statement = cls.build_copy_from_statement(table, columns, 'binary' if binary else 'text')
+        else:
+            statement = cls.build_copy_from_statement(table, columns, file_format, header)
+        async with connection.transaction():
+            async with connection.cursor() as cur:
+                async with cur.copy(statement) as copy:
+                    if rows is not None:
+                        if types:
+                            copy.set_types(types)
+                        async for row in cls.iterate_async(rows):
+                            await copy.write_row(row)
+                    else:
+                        # Local file reads are short, they are done inline rather than on an executor.
+                        opened = cls.open_source_file(source_file, file_format)
+                        source = opened or source_file
+                        try:
+                            while True:
+                                chunk = source.read(chunk_size)
+                                if not chunk:
+                                    break
+                                await copy.write(chunk)
+                        finally:
+                            if opened:
+                                opened.close()
+                return cur.rowcount
+
+    @staticmethod
+    def build_copy_to_statement(query, file_format='csv', header=False):
+        """Builds COPY (query) TO STDOUT with the requested format options."""
+        if file_format not in COPY_FILE_FORMATS:
+            raise ValueError(f"Unsupported COPY format: {file_format}. "
+                             f"Supported formats are: {', '.join(COPY_FILE_FORMATS)}")
+        options = [sql.SQL("FORMAT {}").format(sql.SQL(file_format.upper()))]
+        if header and file_format == 'csv':
+            options.append(sql.SQL("HEADER"))
+        return sql.SQL("COPY ({query}) TO STDOUT ({options})").format(
+            query=sql.SQL(query) if isinstance(query, str) else query, options=sql.SQL(', ').join(options))
+
+    @classmethod
+    def copy_to_files(cls, connection, query, output, params=None, file_format='csv', compression=None,
+                      max_size=None, level=None, header=False):
+        """Streams COPY (query) TO STDOUT into rotating, optionally compressed files, see RotatingExportWriter.
+
+        Rows are written as the server sends them and are never decoded, memory use stays constant.
+        Returns the export summary: rows, files, raw_bytes, bytes and seconds.
+        """
+        writer = RotatingExportWriter(output, file_format, compression, max_size, level, header)
+        statement = cls.build_copy_to_statement(query, file_format, header)
+        writer.start()
+        try:
+            with connection.cursor() as cur:
+                with cur.copy(statement, params) as copy:
+                    for data in copy:
+                        block = writer.add(data)
+                        if block is not None:
+                            writer.submit(block)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    @classmethod
+    async def copy_to_files_async(cls, connection, query, output, params=None, file_format='csv',
+                                  compression=None, max_size=None, level=None, header=False):
+        """The asyncio version of copy_to_files, compression and file writes stay off the event loop."""
+        writer = RotatingExportWriter(output, file_format, compression, max_size, level, header)
+        statement = cls.build_copy_to_statement(query, file_format, header)
+        writer.start()
+        try:
+            async with connection.cursor() as cur:
+                async with cur.copy(statement, params) as copy:
+                    async for data in copy:
+                        block = writer.add(data)
+                        if block is not None:
+                            await writer.submit_async(block)
+            return await writer.finish_async()
+        except BaseException:
+            writer.abort()
+            raise
+
+    @staticmethod
+    def next_cursor_name():
+        return f"dblinker_stream_{next(_cursor_ids)}"
+
+    @classmethod
+    def stream_rows(cls, connection, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Runs query on a named server-side cursor, yielding rows (or lists of rows) batch_size at a time.
+
+        Only one batch is held in client memory. The cursor lives in a transaction that is closed when
+        the generator is exhausted or closed.
+        """
+        with connection.transaction():
+            with connection.cursor(name=cls.next_cursor_name()) as cur:
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if batches:
+                        yield rows
+                    else:
+                        yield from rows
+
+    @classmethod
+    async def stream_rows_async(cls, connection, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """The asyncio version of stream_rows."""
+        async with connection.transaction():
+            async with connection.cursor(name=cls.next_cursor_name()) as cur:
+                await cur.execute(query, params)
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if batches:
+                        yield rows
+                    else:
+                        for row in rows:
+                            yield row
+
+    @classmethod
+    def fetch_columns(cls, connection, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE,
+                      expected_rows=None, structured=False):
+        """Runs a SELECT on a binary server-side cursor and copies its rows into NumPy arrays batch by batch.
+
+        Returns a ColumnarResult (column name -> array, with NULL masks), or one structured array with
+        structured=True. dtypes maps column names to NumPy dtypes that override POSTGRES_DTYPES.
+        """
+        with connection.transaction():
+            # Binary results skip parsing numbers and timestamps from text.
+            with connection.cursor(name=cls.next_cursor_name(), binary=True) as cur:
+                cur.execute(query, params)
+                builder = ColumnarBuilder.for_postgres(cur.description, dtypes, expected_rows)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    builder.append(rows)
+        result = builder.result()
+        return result.to_structured() if structured else result
+
+    @classmethod
+    async def fetch_columns_async(cls, connection, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE,
+                                  expected_rows=None, structured=False):
+        """The asyncio version of fetch_columns."""
+        async with connection.transaction():
+            async with connection.cursor(name=cls.next_cursor_name(), binary=True) as cur:
+                await cur.execute(query, params)
+                builder = ColumnarBuilder.for_postgres(cur.description, dtypes, expected_rows)
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    builder.append(rows)
+        result = builder.result()
+        return result.to_structured() if structured else result
+
+    @staticmethod
+    def run_execute(connection, query, params=None, prepare=None, timeout=None):
+        """Runs one statement, returning its rows when it produces a result set and None otherwise.
+
+        With a timeout in seconds the statement gets a statement_timeout of its own, set with SET LOCAL
+        semantics in the same round-trip where pipeline mode is available. The server cancels the statement
+        at the deadline and psycopg raises QueryCanceled, the connection is usable again once the
+        transaction is rolled back, which borrow_connection() and the pools do.
+        """
+        with connection.cursor() as cur:
+            if not timeout:
+                cur.execute(query, params, prepare=prepare)
+                return cur.fetchall() if cur.description is not None else None
+            # Inside a transaction the caller opened, the previous limit is put back once the statement ends.
+            restore = connection.info.transaction_status != TransactionStatus.IDLE
+            if Pipeline.is_supported():
+                # The cursor holds the statement's result once the pipeline has synced on leaving the block.
+                with connection.pipeline():
+                    cur.execute(_SET_LOCAL_TIMEOUT, (timeout_setting(timeout),))
+                    previous = cur.fetchone()[0] if restore else None
+                    cur.execute(query, params, prepare=prepare)
+            else:
+                cur.execute(_SET_LOCAL_TIMEOUT, (timeout_setting(timeout),))
+                previous = cur.fetchone()[0]
+                cur.execute(query, params, prepare=prepare)
+            rows = cur.fetchall() if cur.description is not None else None
+            if restore:
+                cur.execute(_RESTORE_LOCAL_TIMEOUT, (previous,))
+            return rows
+
+    @staticmethod
+    async def run_execute_async(connection, query, params=None, prepare=None, timeout=None):
+        """The asyncio version of run_execute.
+
+        Cancelling the calling task cancels the statement on the server too. With a timeout the client also
+        gives up CANCEL_GRACE seconds after the deadline, should the server's statement_timeout not have
+        fired by then, cancelling the statement and raising asyncio.TimeoutError.
+        """
+        if not timeout:
+            async with connection.cursor() as cur:
+                await cur.execute(query, params, prepare=prepare)
+                return await cur.fetchall() if cur.description is not None else None
+        return await asyncio.wait_for(PostgresBaseConnection._execute_with_timeout_async(
+            connection, query, params, prepare, timeout), timeout + CANCEL_GRACE)
+
+    @staticmethod
+    async def _execute_with_timeout_async(connection, query, params, prepare, timeout):
+        async with connection.cursor() as cur:
+            restore = connection.info.transaction_status != TransactionStatus.IDLE
+            if AsyncPipeline.is_supported():
+                async with connection.pipeline():
+                    await cur.execute(_SET_LOCAL_TIMEOUT, (timeout_setting(timeout),))
+                    previous = (await cur.fetchone())[0] if restore else None
+                    await cur.execute(query, params, prepare=prepare)
+            else:
+                await cur.execute(_SET_LOCAL_TIMEOUT, (timeout_setting(timeout),))
+                previous = (await cur.fetchone())[0]
+                await cur.execute(query, params, prepare=prepare)
+            rows = await cur.fetchall() if cur.description is not None else None
+            if restore:
+                await cur.execute(_RESTORE_LOCAL_TIMEOUT, (previous,))
+            return rows
+
+    def run_pipeline(self, connection, statements, prepare=None):
+        """Sends (query, params) pairs in pipeline mode inside one transaction, returning how many were sent.
+
+        Without pipeline mode every statement costs a network round-trip. Here statements are queued
+        and the client only waits for results at a sync point every pipeline_depth statements.
+        """
+        count = 0
+        # Distinct statements sent, their tables are invalidated in the result cache once committed.
+        written = set() if self.result_cache is not None else None
+        with connection.transaction():
+            with connection.cursor() as cur:
+                if not Pipeline.is_supported():
+                    # libpq older than 14 has no pipeline mode, fall back to one round-trip per statement.
+                    for query, params in statements:
+                        cur.execute(query, params, prepare=prepare)
+                        count += 1
+                        if written is not None:
+                            written.add(query)
+                else:
+                    with connection.pipeline() as pipeline:
+                        for query, params in statements:
+                            cur.execute(query, params, prepare=prepare)
+                            count += 1
+                            if written is not None:
+                                written.add(query)
+                            if count % self.pipeline_depth == 0:
+                                pipeline.sync()
+        for query in written or ():
+            self.result_cache.invalidate_statement(query)
+        return count
+
+    async def run_pipeline_async(self, connection, statements, prepare=None):
+        """The asyncio version of run_pipeline, statements may also be an async iterable."""
+        count = 0
+        written = set() if self.result_cache is not None else None
+        async with connection.transaction():
+            async with connection.cursor() as cur:
+                if not AsyncPipeline.is_supported():
+                    async for query, params in self.iterate_async(statements):
+                        await cur.execute(query, params, prepare=prepare)
+                        count += 1
+                        if written is not None:
+                            written.add(query)
+                else:
+                    async with connection.pipeline() as pipeline:
+                        async for query, params in self.iterate_async(statements):
+                            await cur.execute(query, params, prepare=prepare)
+                            count += 1
+                            if written is not None:
+                                written.add(query)
+                            if count % self.pipeline_depth == 0:
+                                await pipeline.sync()
+        for query in written or ():
+            self.result_cache.invalidate_statement(query)
+        return count
+
+    @staticmethod
+    async def iterate_async(items):
+        """Iterates a sync or async iterable with 'async for'."""
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
@@ -0,0 +1,99 @@
+import json
+import os
+import queue
+import threading
+import uuid
+from psycopg import connect, sql
+from ..fork_safety import abandon, detach_socket
+
+# Seconds the listener waits for notifications before it sends queued ones and checks for stop().
+POLL_INTERVAL = 0.5
+
+
+class PGCacheNotifier:
+    """Shares ResultCache invalidations between processes over PostgreSQL LISTEN/NOTIFY.
+
+    One background thread owns a dedicated autocommit connection: it LISTENs on the channel, drops the
+    tables other processes report from the local cache, and sends this process's own invalidations.
+    Publishing only queues the tables, so it never blocks a query, async ones included.
+    """
+
+    def __init__(self, conninfo, channel, cache):
+        self.conninfo = conninfo
+        self.channel = channel
+        self.cache = cache
+        # Identifies this notifier's own messages, which it receives too and skips.
+        self.sender = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._outbox = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        # The listener's connection, detached rather than closed by a forked child.
+        self._conn = None
+        self._pid = os.getpid()
+
+    def start(self):
+        if self._thread is None:
+            self.cache.on_invalidate = self.publish
+            self.cache.notifier = self
+            self._thread = threading.Thread(target=self._run, name='dblinker-cache-notifier', daemon=True)
+            self._thread.start()
+        return self
+
+    def publish(self, tables):
+        self._outbox.put(sorted(tables))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with connect(self.conninfo, autocommit=True) as conn:
+                    self._conn = conn
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=POLL_INTERVAL):
+                            self._receive(notify.payload)
+                        self._send(conn)
+            except Exception:
+                # Lost connection, try again after a pause. Entries still expire by their TTL meanwhile,
+                # and everything is dropped because invalidations may have been missed.
+                self.cache.clear()
+                self._stop.wait(5)
+
+    def _receive(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get('sender') != self.sender:
+            self.cache.invalidate_tables(message.get('tables') or (), publish=False)
+
+    def _send(self, conn):
+        while True:
+            try:
+                tables = self._outbox.get_nowait()
+            except queue.Empty:
+                return
+            payload = json.dumps({'sender': self.sender, 'tables': tables})
+            conn.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    def handle_fork(self):
+        """Restarts the listener in a forked child, on a connection of its own."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        inherited, self._conn = self._conn, None
+        if inherited is not None:
+            detach_socket(inherited)
+            abandon(inherited)
+        running = self._thread is not None
+        self._outbox = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        if running:
+            self.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=POLL_INTERVAL * 4)
+        self._thread = None
+        self.cache.on_invalidate = None
@@ -0,0 +1,52 @@
+import os
+from psycopg import ClientCursor, connect, sql
+from dblinker.common.sql_text import is_read_only_statement
+from ..fork_safety import abandon, detach_socket
+from .base_connection import timeout_setting
+
+# Seconds an EXPLAIN ANALYZE may run before the server cancels it.
+DEFAULT_EXPLAIN_TIMEOUT = 10
+EXPLAIN_PREFIX = sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ")
+
+
+class PGExplainer:
+    """Captures EXPLAIN (ANALYZE, BUFFERS) plans for the slow query log, on a connection of its own.
+
+    ANALYZE runs the statement again, so only read-only statements are explained, in a READ ONLY
+    transaction that is always rolled back and under a statement_timeout. Parameters are bound client-side,
+    the plan is the one a literal query with the same values gets.
+    """
+
+    def __init__(self, conninfo, timeout=DEFAULT_EXPLAIN_TIMEOUT):
+        self.conninfo = conninfo
+        self.timeout = float(timeout)
+        self._conn = None
+        self._pid = os.getpid()
+
+    def __call__(self, query, params=None):
+        if not is_read_only_statement(query):
+            return None
+        conn = self._connection()
+        try:
+            with conn.transaction(force_rollback=True):
+                conn.execute("SET TRANSACTION READ ONLY")
+                conn.execute("SELECT set_config('statement_timeout', %s, true)", (timeout_setting(self.timeout),))
+                with ClientCursor(conn) as cur:
+                    cur.execute(EXPLAIN_PREFIX + sql.SQL(query), params)
+                    return cur.fetchone()[0]
+        except Exception:
+            if conn.broken:
+                self._conn = None
+            raise
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # A forked child leaves the parent's session alone and opens its own.
+            inherited, self._conn = self._conn, None
+            if inherited is not None:
+                detach_socket(inherited)
+                abandon(inherited)
+            self._pid = os.getpid()
+        if self._conn is None or self._conn.closed:
+            self._conn = connect(self.conninfo)
+        return self._conn
@@ -1,18 +1,183 @@
+import threading
+from contextlib import contextmanager
 from psycopg import connect, OperationalError  # This imports psycopg3, assuming you have installed 'psycopg' version 3+
-from .base_connection import PostgresBaseConnection
+from psycopg.pq import TransactionStatus
+from dblinker.common.result_cache import MISS
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE
+from ..fork_safety import abandon, detach_socket
+from .base_connection import PostgresBaseConnection, COPY_CHUNK_SIZE, STREAM_BATCH_SIZE
 
 
 class PGNormalConnection(PostgresBaseConnection):
-    def __init__(self, config):
+    """One dedicated psycopg connection, or one per thread with normal_settings thread_local enabled.
+
+    In thread-local mode each thread lazily opens its own connection and keeps it for its lifetime, so
+    fixed-size worker threads never wait on a pool checkout or share a connection's lock. Connections of
+    threads that have exited are closed whenever a new one is opened, or by reap_dead_threads().
+    """
+
+    def __init__(self, config, pipeline_settings=None, fork_settings=None, normal_settings=None,
+                 timeout_settings=None):
         # The configuration dict should contain connection parameters like dbname, user, password, etc.
         self.config = config
-        self.connection = None
+        normal_settings = normal_settings or {}
+        self.thread_local = bool(normal_settings.get('thread_local', False))
+        self._connection = None
+        self._local = threading.local()
+        # Thread -> its connection in thread-local mode, kept to reap dead threads and close them all.
+        self._thread_connections = {}
+        self._lock = threading.Lock()
+        self.init_pipeline_settings(pipeline_settings)
+        self.init_timeout_settings(timeout_settings)
+        self.track_forks(fork_settings)
+
+    @property
+    def connection(self):
+        """The calling thread's connection in thread-local mode, the shared one otherwise."""
+        if self.thread_local:
+            return getattr(self._local, 'connection', None)
+        return self._connection
+
+    @connection.setter
+    def connection(self, connection):
+        if not self.thread_local:
+            self._connection = connection
+            return
+        self._local.connection = connection
+        thread = threading.current_thread()
+        with self._lock:
+            if connection is None:
+                self._thread_connections.pop(thread, None)
+            else:
+                self._thread_connections[thread] = connection
 
     def connect(self):
         # Establishes a synchronous connection to the PostgreSQL server.
         # The 'connect' function is used both in psycopg2 and psycopg3 for this purpose.
-        self.connection = connect(**self.config)
+        if self.thread_local:
+            self.reap_dead_threads()
+        connection = connect(**self.config)
+        self.configure_session(connection)
+        self.connection = connection
+
+    def reap_dead_threads(self):
+        """Closes the connections of threads that have exited, returning how many were closed."""
+        with self._lock:
+            dead = [thread for thread in self._thread_connections if not thread.is_alive()]
+            connections = [self._thread_connections.pop(thread) for thread in dead]
+        for connection in connections:
+            connection.close()
+        return len(connections)
+
+    def open_connection_count(self):
+        """The number of open connections, one per live thread that has run a statement in thread-local mode."""
+        if not self.thread_local:
+            return int(self._connection is not None and not self._connection.closed)
+        self.reap_dead_threads()
+        with self._lock:
+            return sum(1 for connection in self._thread_connections.values() if not connection.closed)
+
+    def pool_stats(self):
+        """Open connection counts in thread-local mode, which has no checkout queue to report on."""
+        if not self.thread_local:
+            return None
+        return {'open_connections': self.open_connection_count()}
+
+    def discard_inherited(self):
+        """Forgets the parent's connections in a forked child, the next statement opens this process's own."""
+        inherited = list(self._thread_connections.values())
+        if self._connection is not None:
+            inherited.append(self._connection)
+        self._connection = None
+        self._thread_connections = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        for connection in inherited:
+            detach_socket(connection)
+        abandon(*inherited)
+
+    @contextmanager
+    def borrow_connection(self):
+        """Yields the underlying psycopg connection, connecting first if needed.
+
+        Like a pool checkout, a transaction started inside the block is committed when it ends, or rolled
+        back on error. A transaction the caller already had open is left for the caller to finish.
+        """
+        self.check_fork()
+        conn = self.connection
+        if conn is None or conn.closed:
+            self.connect()
+            conn = self.connection
+        owns_transaction = conn.info.transaction_status == TransactionStatus.IDLE
+        try:
+            yield conn
+        except BaseException:
+            if owns_transaction and not conn.closed:
+                conn.rollback()
+            raise
+        if owns_transaction:
+            conn.commit()
+
+    def bulk_load(self, table, columns=None, rows=None, source_file=None, file_format='csv', header=False,
+                  binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """Streams rows (an iterable of tuples) or a csv/text/binary COPY file into table using COPY FROM STDIN.
+
+        binary=True sends rows in the binary COPY format, pass types (e.g. ['int8', 'text']) alongside it.
+        Returns the number of rows loaded.
+        """
+        with self.borrow_connection() as conn, self.observe_query():
+            loaded = self.copy_rows(conn, table, columns, rows, source_file, file_format, header, binary, types,
+                                    chunk_size)
+        self.invalidate_cached_tables(table)
+        return loaded
+
+    def export(self, query, output, params=None, file_format='csv', compression=None, max_size=None, level=None,
+               header=False):
+        """Streams the result of query into files through COPY TO STDOUT, see copy_to_files.
+
+        compression is None, 'gzip' or 'zstd', max_size starts numbered files of about that many bytes.
+        """
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            return self.copy_to_files(conn, query, output, params, file_format, compression, max_size, level, header)
+
+    def stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of query from a server-side cursor, or lists of rows with batches=True.
+
+        The connection is held until the generator is exhausted or closed.
+        """
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            yield from self.stream_rows(conn, query, params, batch_size, batches)
+
+    def fetch_numpy(self, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE, expected_rows=None,
+                    structured=False):
+        """Fetches a SELECT into NumPy arrays instead of row tuples, see fetch_columns. Needs numpy installed."""
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            return self.fetch_columns(conn, query, params, dtypes, batch_size, expected_rows, structured)
+
+    def execute(self, query, params=None, prepare=None, timeout=None):
+        """Runs one statement, returning its rows when it produces a result set and None otherwise.
+
+        timeout is a deadline in seconds enforced by the server, command_timeout when None, 0 for none.
+        """
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(query, params)
+            if rows is not MISS:
+                return rows
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            rows = self.run_execute(conn, query, params, prepare, self.resolve_timeout(timeout))
+        if cache is not None:
+            cache.store(token, query, rows)
+        return rows
+
+    def execute_batch(self, query, params_seq, prepare=None):
+        """Runs query once per parameter set in pipeline mode and one transaction, returning the statement count."""
+        return self.execute_pipeline(((query, params) for params in params_seq), prepare)
 
+    def execute_pipeline(self, statements, prepare=None):
+        """Runs an iterable of (query, params) pairs in pipeline mode and one transaction."""
+        with self.borrow_connection() as conn, self.observe_query():
+            return self.run_pipeline(conn, statements, prepare)
 
     def test_connection(self):
         try:
@@ -23,9 +188,18 @@ class PGNormalConnection(PostgresBaseConnection):
             print(f"Connection failed: {e}")
 
     def disconnect(self):
-        # Closes the connection to the database.
-        if self.connection:
-            self.connection.close()
+        # Closes the connection to the database, every thread's connection in thread-local mode.
+        self.close_result_cache()
+        if self.thread_local:
+            with self._lock:
+                connections, self._thread_connections = list(self._thread_connections.values()), {}
+                # Threads that run another statement open a fresh connection.
+                self._local = threading.local()
+            for connection in connections:
+                connection.close()
+        elif self._connection:
+            self._connection.close()
+            self._connection = None
 
     def __enter__(self):
         # Ensures the connection is established when entering the context.
@@ -1,16 +1,66 @@
+import threading
+import time
+from contextlib import contextmanager
 from psycopg_pool import ConnectionPool
 from psycopg import OperationalError
 # Assuming PostgresBaseConnection is correctly implemented elsewhere
-from .base_connection import PostgresBaseConnection
+from dblinker.common.result_cache import MISS
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE
+from ..fork_safety import abandon_pool
+from .base_connection import PostgresBaseConnection, COPY_CHUNK_SIZE, STREAM_BATCH_SIZE
 
 
 class PGPoolConnection(PostgresBaseConnection):
-    def __init__(self, config, pool_settings=None):
+    def __init__(self, config, pool_settings=None, conninfo=None, pipeline_settings=None, fork_settings=None,
+                 timeout_settings=None):
         super().__init__()  # Initialize the base class, if necessary
         self.config = config
+        # A precomputed conninfo string (see DBConfig) saves rebuilding it from the config dict.
+        self.conninfo = conninfo or self.construct_conninfo(self.config)
         self.pool_settings = pool_settings or {}
+        # Set by PoolRegistry when the pool is shared, shared pools outlive 'with' blocks.
+        self.registry_managed = False
+        self.init_pipeline_settings(pipeline_settings)
+        self.init_timeout_settings(timeout_settings)
+        # Set in a forked child, or once the pool was released, until a new pool is opened on first use.
+        self._pending_rebuild = False
+        # Guards swapping the pool and _borrowers, the checkouts running right now.
+        self._rebuild_lock = threading.Lock()
+        self._borrowers = 0
+        self.pool = self.build_pool()
+        # A child forked from this process rebuilds the pool instead of sharing the parent's sockets.
+        self.track_forks(fork_settings)
+
+    def build_pool(self):
         # Directly pass connection parameters and pool settings to ConnectionPool
-        self.pool = ConnectionPool(conninfo=self.construct_conninfo(self.config), **self.pool_settings)
+        return ConnectionPool(conninfo=self.conninfo, configure=self.configure_session,
+                              **self.pool_settings)
+
+    def discard_inherited(self):
+        """Abandons the parent's pool, whose worker threads didn't survive the fork, and opens a new one.
+
+        The new pool opens its connections in the background right away with prewarm_after_fork, on the
+        first checkout otherwise.
+        """
+        inherited, self.pool = self.pool, None
+        # A lock held by one of the parent's threads at fork time would never be released here.
+        self._rebuild_lock = threading.Lock()
+        # Checkouts of the parent's threads never end in the child.
+        self._borrowers = 0
+        if inherited is None:
+            # Disconnected before the fork, stay disconnected.
+            return
+        abandon_pool(inherited)
+        if self.prewarm_after_fork:
+            self.pool = self.build_pool()
+        else:
+            self._pending_rebuild = True
+
+    def rebuild_pool(self):
+        with self._rebuild_lock:
+            if self._pending_rebuild:
+                self.pool = self.build_pool()
+                self._pending_rebuild = False
 
     @staticmethod
     def construct_conninfo(config):
@@ -20,11 +70,106 @@ class PGPoolConnection(PostgresBaseConnection):
         # Construct and return the connection info string
         return " ".join([f"{k}={v}" for k, v in conn_params.items()])
 
+    @contextmanager
+    def borrow_connection(self, timeout=None):
+        """Checks a connection out of the pool for the duration of the block.
+
+        timeout is the most seconds to wait for a connection, the pool's own timeout when None.
+        """
+        self.check_fork()
+        with self._rebuild_lock:
+            if self._pending_rebuild:
+                self.pool = self.build_pool()
+                self._pending_rebuild = False
+            # Counted under the lock, so release() either runs first or leaves this pool open.
+            pool = self.pool
+            self._borrowers += 1
+            self.last_used = time.monotonic()
+        try:
+            metrics = self.metrics
+            requested = time.perf_counter()
+            with pool.connection(timeout=timeout) as conn:
+                if metrics is not None:
+                    metrics.checkout_wait.observe(time.perf_counter() - requested)
+                yield conn
+        finally:
+            with self._rebuild_lock:
+                self._borrowers -= 1
+                self.last_used = time.monotonic()
+
+    def in_use(self):
+        return self._borrowers > 0
+
+    def pool_stats(self):
+        """psycopg_pool's counters and gauges, see ConnectionPool.get_stats()."""
+        pool = self.pool
+        return pool.get_stats() if pool else {}
+
+    def bulk_load(self, table, columns=None, rows=None, source_file=None, file_format='csv', header=False,
+                  binary=False, types=None, chunk_size=COPY_CHUNK_SIZE):
+        """Streams rows (an iterable of tuples) or a csv/text/binary COPY file into table using COPY FROM STDIN.
+
+        binary=True sends rows in the binary COPY format, pass types (e.g. ['int8', 'text']) alongside it.
+        Returns the number of rows loaded.
+        """
+        with self.borrow_connection() as conn, self.observe_query():
+            loaded = self.copy_rows(conn, table, columns, rows, source_file, file_format, header, binary, types,
+                                    chunk_size)
+        self.invalidate_cached_tables(table)
+        return loaded
+
+    def export(self, query, output, params=None, file_format='csv', compression=None, max_size=None, level=None,
+               header=False):
+        """Streams the result of query into files through COPY TO STDOUT, see copy_to_files.
+
+        compression is None, 'gzip' or 'zstd', max_size starts numbered files of about that many bytes.
+        """
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            return self.copy_to_files(conn, query, output, params, file_format, compression, max_size, level, header)
+
+    def stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of query from a server-side cursor, or lists of rows with batches=True.
+
+        The connection is held until the generator is exhausted or closed.
+        """
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            yield from self.stream_rows(conn, query, params, batch_size, batches)
+
+    def fetch_numpy(self, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE, expected_rows=None,
+                    structured=False):
+        """Fetches a SELECT into NumPy arrays instead of row tuples, see fetch_columns. Needs numpy installed."""
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            return self.fetch_columns(conn, query, params, dtypes, batch_size, expected_rows, structured)
+
+    def execute(self, query, params=None, prepare=None, timeout=None):
+        """Runs one statement, returning its rows when it produces a result set and None otherwise.
+
+        timeout is a deadline in seconds enforced by the server, command_timeout when None, 0 for none.
+        """
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(query, params)
+            if rows is not MISS:
+                return rows
+        with self.borrow_connection() as conn, self.observe_query(query, params):
+            rows = self.run_execute(conn, query, params, prepare, self.resolve_timeout(timeout))
+        if cache is not None:
+            cache.store(token, query, rows)
+        return rows
+
+    def execute_batch(self, query, params_seq, prepare=None):
+        """Runs query once per parameter set in pipeline mode and one transaction, returning the statement count."""
+        return self.execute_pipeline(((query, params) for params in params_seq), prepare)
+
+    def execute_pipeline(self, statements, prepare=None):
+        """Runs an iterable of (query, params) pairs in pipeline mode and one transaction."""
+        with self.borrow_connection() as conn, self.observe_query():
+            return self.run_pipeline(conn, statements, prepare)
 
     def test_connection(self):
         """Tests a connection from the pool."""
         try:
-            with self.pool.connection() as conn:
+            with self.borrow_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('SELECT 1;')
                     result = cur.fetchone()
@@ -34,9 +179,23 @@ class PGPoolConnection(PostgresBaseConnection):
 
     def disconnect(self):
         """Closes all connections in the pool."""
-        if self.pool:
-            self.pool.close()
-            self.pool = None
+        self.close_result_cache()
+        with self._rebuild_lock:
+            pool, self.pool = self.pool, None
+            self._pending_rebuild = False
+        if pool:
+            pool.close()
+
+    def release(self):
+        """Closes all connections in the pool, the next checkout opens a new pool. False while one is checked out."""
+        with self._rebuild_lock:
+            if self._borrowers:
+                return False
+            pool, self.pool = self.pool, None
+            self._pending_rebuild = self._pending_rebuild or pool is not None
+        if pool:
+            pool.close()
+        return True
 
     def connect(self):
         # This method is implemented to satisfy the interface of the abstract base class.
@@ -48,5 +207,6 @@ class PGPoolConnection(PostgresBaseConnection):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        # Ensure the pool is properly closed when exiting the context
-        self.disconnect()
+        # Ensure the pool is properly closed when exiting the context, unless the registry owns it.
+        if not self.registry_managed:
+            self.disconnect()
@@ -1,25 +1,69 @@
+from dblinker.common.metrics import DEFAULT_LATENCY_BUCKETS
+from dblinker.common.result_cache import ResultCache
+from dblinker.common.slow_query_log import SlowQueryLog
+from dblinker.common.config.config_loader import (DBConfig, POSTGRES_CONNECTION_KEYS, default_config_loader,
+                                                  make_conninfo)
+from dblinker.connections.postgres.cache_notifier import PGCacheNotifier
+from dblinker.connections.postgres.explainer import PGExplainer, DEFAULT_EXPLAIN_TIMEOUT
 from dblinker.connections.postgres.normal_connection import PGNormalConnection
 from dblinker.connections.postgres.pool_connection import PGPoolConnection
 from dblinker.connections.postgres.async_connection import PGAsyncConnection
 from dblinker.connections.postgres.async_pool_connection import PGAsyncPoolConnection
+from dblinker.connections.postgres.routing_connection import PGRoutingConnection
+from dblinker.connections.postgres.sharded_connection import PGShardedConnection, DEFAULT_VIRTUAL_NODES
 
 
 class PostgresConnectionFactory:
     def __init__(self, config):
-        self.connection_type = config['postgresql']['connection_type']
-        self.config = self.filter_config(config['postgresql']['connection_settings'])
-        self.pool_settings = config['postgresql'].get('pool_settings', {})
-        self.async_settings = config['postgresql'].get('async_settings', {})
-        self.async_pool_settings = config['postgresql'].get('async_pool_settings', {})
+        # Accept either a compiled DBConfig or a raw config dictionary, which is validated on the way in.
+        self.dbconfig = config if isinstance(config, DBConfig) else DBConfig.from_dict(config)
+        self.connection_type = self.dbconfig.connection_type
+        self.config = dict(self.dbconfig.connection_settings)
+        self.conninfo = self.dbconfig.conninfo
+        self.pool_settings = dict(self.dbconfig.pool_settings)
+        self.async_settings = dict(self.dbconfig.async_settings)
+        self.async_pool_settings = dict(self.dbconfig.async_pool_settings)
+        # Pipeline depth and prepared statement cache settings, shared by every connection type.
+        self.pipeline_settings = dict(self.dbconfig.sections.get('pipeline_settings') or {})
+        self.metrics_settings = dict(self.dbconfig.sections.get('metrics_settings') or {})
+        self.cache_settings = dict(self.dbconfig.sections.get('cache_settings') or {})
+        # Replica selection settings for the 'routing' connection type.
+        self.routing_settings = dict(self.dbconfig.sections.get('routing_settings') or {})
+        self.shard_settings = dict(self.dbconfig.sections.get('shard_settings') or {})
+        # thread_local gives each thread its own connection with the 'normal' connection type.
+        self.normal_settings = dict(self.dbconfig.sections.get('normal_settings') or {})
+        # How pools behave in processes forked after they were created, e.g. gunicorn workers.
+        self.fork_settings = dict(self.dbconfig.sections.get('fork_settings') or {})
+        # Server-side statement_timeout for every session and the default deadline of execute() calls.
+        self.timeout_settings = dict(self.dbconfig.sections.get('timeout_settings') or {})
+        # Threshold, sampling and EXPLAIN capture of the slow query log.
+        self.slowlog_settings = dict(self.dbconfig.sections.get('slowlog_settings') or {})
 
     @staticmethod
     def filter_config(config):
-        # List of valid psycopg connection parameters
-        valid_keys = ['user', 'password', 'host', 'port', 'dbname', 'sslmode', 'sslcert', 'sslkey', 'sslrootcert',
-                      'connect_timeout', 'application_name', 'keepalives', 'keepalives_idle', 'keepalives_interval',
-                      'keepalives_count']
-        # Filter the config dictionary to include only the valid keys
-        return {key: config[key] for key in valid_keys if key in config}
+        # Filter the config dictionary to include only the valid psycopg connection parameters
+        return {key: config[key] for key in POSTGRES_CONNECTION_KEYS if key in config}
+
+    def build_shard_pools(self):
+        """Builds a PGAsyncPoolConnection per entry of the 'shards' list, keyed by shard name."""
+        shards = {}
+        for shard in self.dbconfig.shards:
+            if 'config' in shard:
+                shard_config = default_config_loader.load(shard['config'])
+                if shard_config.database_type != 'postgresql':
+                    raise ValueError(f"Shard config {shard['config']} is not a PostgreSQL config.")
+                settings = dict(shard_config.connection_settings)
+                conninfo = shard_config.conninfo
+                pool_settings = dict(shard_config.async_pool_settings) or self.async_pool_settings
+            else:
+                settings = {k: v for k, v in shard.items() if k != 'name'}
+                conninfo = make_conninfo({k: v for k, v in settings.items() if v not in (None, '')})
+                pool_settings = self.async_pool_settings
+            shards[shard['name']] = PGAsyncPoolConnection(config=settings, pool_settings=pool_settings,
+                                                          conninfo=conninfo, pipeline_settings=self.pipeline_settings,
+                                                          fork_settings=self.fork_settings,
+                                                          timeout_settings=self.timeout_settings)
+        return shards
 
     def get_connection(self):
         # print(self.config)
@@ -27,15 +71,63 @@ class PostgresConnectionFactory:
 
         if connection_type == 'normal':
             # Only connection_settings are needed for a normal connection
-            return PGNormalConnection(self.config)
+            connection = PGNormalConnection(self.config, pipeline_settings=self.pipeline_settings,
+                                            fork_settings=self.fork_settings, normal_settings=self.normal_settings,
+                                            timeout_settings=self.timeout_settings)
         elif connection_type == 'pool':
             # Merge connection_settings with pool_settings
-            return PGPoolConnection(self.config, self.pool_settings)
+            connection = PGPoolConnection(self.config, self.pool_settings, conninfo=self.conninfo,
+                                          pipeline_settings=self.pipeline_settings, fork_settings=self.fork_settings,
+                                          timeout_settings=self.timeout_settings)
         elif connection_type == 'async':
             # Merge connection_settings with async_settings
-            return PGAsyncConnection(self.config, post_connect_async_settings=self.async_settings)
+            connection = PGAsyncConnection(self.config, post_connect_async_settings=self.async_settings,
+                                           pipeline_settings=self.pipeline_settings, fork_settings=self.fork_settings,
+                                           timeout_settings=self.timeout_settings)
         elif connection_type == 'async_pool':
             # Merge connection_settings with async_pool_settings
-            return PGAsyncPoolConnection(config=self.config, pool_settings=self.async_pool_settings)
+            connection = PGAsyncPoolConnection(config=self.config, pool_settings=self.async_pool_settings,
+                                               conninfo=self.conninfo, pipeline_settings=self.pipeline_settings,
+                                               fork_settings=self.fork_settings, timeout_settings=self.timeout_settings)
+        elif connection_type == 'routing':
+            # A pool per host, built from connection_settings for the primary and the 'replicas' list
+            connection = PGRoutingConnection(self.config, replicas=[dict(r) for r in self.dbconfig.replicas],
+                                             pool_settings=self.pool_settings,
+                                             routing_settings=self.routing_settings,
+                                             pipeline_settings=self.pipeline_settings,
+                                             fork_settings=self.fork_settings,
+                                             timeout_settings=self.timeout_settings)
+        elif connection_type == 'sharded':
+            # An async pool per shard, all using async_pool_settings unless a shard config file has its own
+            connection = PGShardedConnection(self.build_shard_pools(),
+                                             int(self.shard_settings.get('virtual_nodes', DEFAULT_VIRTUAL_NODES)))
         else:
             raise ValueError(f"Unsupported connection type: {connection_type}")
+
+        if self.metrics_settings.get('enabled'):
+            connection.enable_metrics(self.dbconfig.connection_name,
+                                      self.metrics_settings.get('buckets') or DEFAULT_LATENCY_BUCKETS)
+        if self.cache_settings.get('enabled'):
+            if connection_type == 'sharded':
+                # Shards hold different rows for the same statement, one shared cache would mix them up.
+                raise ValueError("cache_settings are not supported by the 'sharded' connection type.")
+            cache = connection.enable_result_cache(ResultCache.from_settings(self.cache_settings))
+            if self.cache_settings.get('notify_channel'):
+                # Other processes using the same channel drop their entries when this one writes, and vice versa.
+                PGCacheNotifier(self.conninfo, self.cache_settings['notify_channel'], cache).start()
+        if self.slowlog_settings.get('enabled'):
+            self.enable_slow_query_log(connection)
+        return connection
+
+    def enable_slow_query_log(self, connection):
+        name = self.dbconfig.connection_name
+        explain_timeout = self.slowlog_settings.get('explain_timeout', DEFAULT_EXPLAIN_TIMEOUT)
+        if self.connection_type == 'sharded':
+            # Every shard gets a log of its own, so plans are captured on the shard that ran the statement.
+            for shard_name, shard in connection.shards.items():
+                shard.enable_slow_query_log(SlowQueryLog.from_settings(
+                    self.slowlog_settings, f"{name}/{shard_name}", PGExplainer(shard.conninfo, explain_timeout)))
+        else:
+            # Routed reads are explained on the primary, which holds the same data.
+            connection.enable_slow_query_log(SlowQueryLog.from_settings(
+                self.slowlog_settings, name, PGExplainer(self.conninfo, explain_timeout)))
@@ -0,0 +1,385 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from psycopg import OperationalError
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE
+from dblinker.common.result_cache import MISS
+from dblinker.common.config.config_loader import make_conninfo
+from .base_connection import PostgresBaseConnection, is_read_only_statement, STREAM_BATCH_SIZE
+from .pool_connection import PGPoolConnection
+
+# Defaults for the 'routing_settings' config section.
+DEFAULT_ROUTING_SETTINGS = {
+    # Replicas further behind the primary than this many seconds receive no reads.
+    'max_replication_lag': 10,
+    # Seconds between lag and latency probes of a host, probes run lazily when a read is routed.
+    'health_check_interval': 5,
+    # Seconds a host that failed a query or a probe is left out of routing.
+    'unhealthy_cooldown': 30,
+    # Weight of the newest latency sample in the moving average, between 0 and 1.
+    'ewma_alpha': 0.3,
+    # Send reads to the primary when no replica is usable, instead of raising.
+    'fallback_to_primary': True,
+}
+# Replication lag in seconds, 0 on a primary and when a replica has replayed everything it received.
+REPLICATION_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class NoHealthyHostError(OperationalError):
+    """Raised when no host is available for a read or write."""
+
+
+def is_host_failure(error):
+    """Lost connections and pool timeouts carry no SQLSTATE, errors the server reported (timeouts included) do."""
+    return isinstance(error, OperationalError) and getattr(error, 'sqlstate', None) is None
+
+
+class RoutedHost:
+    """One host of a routing connection: its pool and the measurements routing decisions are made from."""
+
+    __slots__ = ('name', 'settings', 'conninfo', 'is_primary', 'connection', 'latency', 'lag', 'down_until',
+                 'last_checked', 'failures', 'verified')
+
+    def __init__(self, settings, is_primary):
+        self.name = f"{settings.get('host') or 'localhost'}:{settings.get('port') or 5432}"
+        self.settings = settings
+        self.conninfo = make_conninfo({k: v for k, v in settings.items() if v not in (None, '')})
+        self.is_primary = is_primary
+        self.connection = None
+        # Exponentially weighted moving average of query latency in seconds, None until the first sample.
+        self.latency = None
+        self.lag = 0.0
+        self.down_until = 0.0
+        self.last_checked = 0.0
+        self.failures = 0
+        # Replicas take reads only once a probe has answered, the primary is trusted from the start.
+        self.verified = is_primary
+
+    def healthy(self, now):
+        return self.connection is not None and self.verified and now >= self.down_until
+
+    def as_dict(self, now):
+        return {
+            'host': self.name,
+            'role': 'primary' if self.is_primary else 'replica',
+            'healthy': self.healthy(now),
+            'latency_ms': round(self.latency * 1000, 3) if self.latency is not None else None,
+            'replication_lag': self.lag,
+            'failures': self.failures,
+        }
+
+
+class PGRoutingConnection(PostgresBaseConnection):
+    """Sends writes to the primary and read-only statements to the replica with the best measured latency.
+
+    Every host gets its own PGPoolConnection. Replicas lagging more than max_replication_lag, or that failed
+    within unhealthy_cooldown seconds, are skipped.
+    """
+
+    def __init__(self, config, replicas=None, pool_settings=None, routing_settings=None, pipeline_settings=None,
+                 fork_settings=None, timeout_settings=None):
+        super().__init__()
+        self.config = config
+        self.pool_settings = pool_settings or {}
+        self.routing_settings = dict(DEFAULT_ROUTING_SETTINGS, **(routing_settings or {}))
+        if not 0 < float(self.routing_settings['ewma_alpha']) <= 1:
+            raise ValueError("ewma_alpha must be greater than 0 and at most 1.")
+        self.pipeline_settings = pipeline_settings
+        self.init_pipeline_settings(pipeline_settings)
+        self.timeout_settings = timeout_settings
+        self.init_timeout_settings(timeout_settings)
+        # Set by PoolRegistry when the router is shared, shared routers outlive 'with' blocks.
+        self.registry_managed = False
+        self.primary = RoutedHost(config, True)
+        self.replicas = [RoutedHost(settings, False) for settings in (replicas or [])]
+        self._lock = threading.Lock()
+        # Only one thread probes replica lag at a time, the others route on the current figures.
+        self._probe_lock = threading.Lock()
+        self.fork_settings = fork_settings
+        # The host pools handle forks themselves, the router only needs fresh locks.
+        self.track_forks(fork_settings)
+
+    def discard_inherited(self):
+        # Either lock may have been held by a thread of the parent, which doesn't exist in the child.
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    @property
+    def hosts(self):
+        return [self.primary] + self.replicas
+
+    def connect(self):
+        """Opens one pool per host, a replica that can't be reached drops out of rotation on its first probe."""
+        for host in self.hosts:
+            if host.connection is None:
+                host.connection = PGPoolConnection(host.settings, self.pool_settings, conninfo=host.conninfo,
+                                                   pipeline_settings=self.pipeline_settings,
+                                                   fork_settings=self.fork_settings,
+                                                   timeout_settings=self.timeout_settings)
+                # The host pools record checkout waits into the router's metrics.
+                host.connection.metrics = self.metrics
+        # Replicas are probed in the background, reads use the primary until one of them answers.
+        self.refresh()
+
+    def enable_metrics(self, *args, **kwargs):
+        metrics = super().enable_metrics(*args, **kwargs)
+        for host in self.hosts:
+            if host.connection is not None:
+                host.connection.metrics = metrics
+        return metrics
+
+    def mark_down(self, host):
+        with self._lock:
+            host.failures += 1
+            host.down_until = time.monotonic() + float(self.routing_settings['unhealthy_cooldown'])
+
+    def record_latency(self, host, seconds):
+        alpha = float(self.routing_settings['ewma_alpha'])
+        with self._lock:
+            host.latency = seconds if host.latency is None else alpha * seconds + (1 - alpha) * host.latency
+
+    def refresh(self, force=False):
+        """Probes replication lag and latency of replicas whose last check is older than health_check_interval.
+
+        Routing calls this without force, the probes then run on a background thread and reads carry on with
+        the current figures, so a replica that hangs never stalls the caller. force=True probes inline.
+        """
+        interval = float(self.routing_settings['health_check_interval'])
+        now = time.monotonic()
+        due = [host for host in self.replicas
+               if host.connection is not None and (force or now - host.last_checked >= interval)]
+        if not due or not self._probe_lock.acquire(blocking=force):
+            return
+        for host in due:
+            host.last_checked = now
+        if force:
+            self._probe(due, interval)
+        else:
+            threading.Thread(target=self._probe, args=(due, interval), name='dblinker-replica-probe',
+                             daemon=True).start()
+
+    def _probe(self, hosts, timeout):
+        # Runs with _probe_lock held and releases it when done.
+        try:
+            for host in hosts:
+                connection = host.connection
+                if connection is None:
+                    continue
+                # A host in its cooldown is probed too, a passing probe brings it back early.
+                try:
+                    start = time.perf_counter()
+                    # Through borrow_connection(), which reopens a pool the registry released.
+                    with connection.borrow_connection(timeout=timeout) as conn:
+                        lag = conn.execute(REPLICATION_LAG_QUERY).fetchone()[0]
+                    self.record_latency(host, time.perf_counter() - start)
+                    with self._lock:
+                        host.lag = float(lag)
+                        host.down_until = 0.0
+                        host.verified = True
+                except Exception:
+                    self.mark_down(host)
+        finally:
+            self._probe_lock.release()
+
+    def choose_replica(self, exclude=()):
+        """Picks a replica by the power of two choices on latency, None when none is usable."""
+        self.refresh()
+        now = time.monotonic()
+        max_lag = float(self.routing_settings['max_replication_lag'])
+        candidates = [host for host in self.replicas
+                      if host not in exclude and host.healthy(now) and host.lag <= max_lag]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+        # Comparing two random replicas spreads load while still steering away from slow hosts, always
+        # taking the fastest would pile every read onto one replica.
+        first, second = random.sample(candidates, 2)
+        return min(first, second, key=lambda host: host.latency if host.latency is not None else float('inf'))
+
+    def route(self, read_only, exclude=()):
+        if read_only:
+            host = self.choose_replica(exclude)
+            if host is not None:
+                return host
+            if not self.routing_settings['fallback_to_primary']:
+                raise NoHealthyHostError("No replica is healthy and within max_replication_lag.")
+        if self.primary.connection is None:
+            raise NoHealthyHostError("The routing connection is not connected.")
+        return self.primary
+
+    @contextmanager
+    def borrow_connection(self, read_only=False):
+        """Checks a psycopg connection out of the primary's pool, or a replica's pool with read_only=True."""
+        host = self.route(read_only)
+        try:
+            with host.connection.borrow_connection() as conn:
+                yield conn
+        except OperationalError as e:
+            if not host.is_primary and is_host_failure(e):
+                self.mark_down(host)
+            raise
+
+    def reader(self):
+        """A connection for read-only work, from a replica when one is usable."""
+        return self.borrow_connection(read_only=True)
+
+    def writer(self):
+        """A connection to the primary."""
+        return self.borrow_connection(read_only=False)
+
+    def execute(self, query, params=None, prepare=None, read_only=None, timeout=None):
+        """Runs one statement, read-only statements go to a replica and are retried once elsewhere on failure.
+
+        read_only=None detects plain SELECT/SHOW/VALUES statements, pass True or False to override it.
+        timeout is a deadline in seconds enforced by the server, command_timeout when None, 0 for none.
+        A statement cancelled at its deadline is not retried.
+        """
+        timeout = self.resolve_timeout(timeout)
+        if read_only is None:
+            read_only = is_read_only_statement(query)
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(query, params)
+            if rows is not MISS:
+                return rows
+        host = self.route(read_only)
+        with self.observe_query(query, params):
+            try:
+                rows = self._execute_on(host, query, params, prepare, timeout)
+            except OperationalError as e:
+                if host.is_primary or not is_host_failure(e):
+                    raise
+                self.mark_down(host)
+                retry = self.route(read_only, exclude=(host,))
+                rows = self._execute_on(retry, query, params, prepare, timeout)
+        if cache is not None:
+            cache.store(token, query, rows)
+        return rows
+
+    def _execute_on(self, host, query, params, prepare, timeout):
+        start = time.perf_counter()
+        with host.connection.borrow_connection() as conn:
+            result = self.run_execute(conn, query, params, prepare, timeout)
+        self.record_latency(host, time.perf_counter() - start)
+        return result
+
+    def stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, batches=False, read_only=None):
+        """Yields the rows of query from a server-side cursor, on a replica when the statement is read-only."""
+        if read_only is None:
+            read_only = is_read_only_statement(query)
+        with self.borrow_connection(read_only) as conn, self.observe_query(query, params):
+            yield from self.stream_rows(conn, query, params, batch_size, batches)
+
+    def fetch_numpy(self, query, params=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE, expected_rows=None,
+                    structured=False, read_only=None):
+        """Fetches a SELECT into NumPy arrays, on a replica when the statement is read-only. Needs numpy."""
+        if read_only is None:
+            read_only = is_read_only_statement(query)
+        with self.borrow_connection(read_only) as conn, self.observe_query(query, params):
+            return self.fetch_columns(conn, query, params, dtypes, batch_size, expected_rows, structured)
+
+    def execute_batch(self, query, params_seq, prepare=None):
+        """Runs query once per parameter set on the primary, in pipeline mode and one transaction."""
+        count = self.primary_connection().execute_batch(query, params_seq, prepare)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_statement(query)
+        return count
+
+    def execute_pipeline(self, statements, prepare=None):
+        """Runs (query, params) pairs on the primary, in pipeline mode and one transaction."""
+        if self.result_cache is None:
+            return self.primary_connection().execute_pipeline(statements, prepare)
+        written = set()
+
+        def tracked():
+            for query, params in statements:
+                written.add(query)
+                yield query, params
+
+        count = self.primary_connection().execute_pipeline(tracked(), prepare)
+        for query in written:
+            self.result_cache.invalidate_statement(query)
+        return count
+
+    def bulk_load(self, table, *args, **kwargs):
+        """COPY FROM STDIN into a table on the primary, see PGPoolConnection.bulk_load."""
+        loaded = self.primary_connection().bulk_load(table, *args, **kwargs)
+        self.invalidate_cached_tables(table)
+        return loaded
+
+    def export(self, query, output, params=None, file_format='csv', compression=None, max_size=None, level=None,
+               header=False, read_only=None):
+        """Streams the result of query into files through COPY TO STDOUT, on a replica for read-only queries."""
+        if read_only is None:
+            read_only = isinstance(query, str) and is_read_only_statement(query)
+        with self.borrow_connection(read_only) as conn, self.observe_query(query, params):
+            return self.copy_to_files(conn, query, output, params, file_format, compression, max_size, level, header)
+
+    def primary_connection(self):
+        if self.primary.connection is None:
+            raise NoHealthyHostError("The routing connection is not connected.")
+        return self.primary.connection
+
+    def routing_stats(self):
+        """Role, health, latency and lag of every host, refreshed first."""
+        self.refresh(force=True)
+        now = time.monotonic()
+        return [host.as_dict(now) for host in self.hosts]
+
+    def pool_stats(self):
+        """psycopg_pool's counters per host."""
+        return {host.name: host.connection.pool_stats() for host in self.hosts if host.connection is not None}
+
+    def test_connection(self):
+        """Tests the primary and every replica."""
+        self.refresh(force=True)
+        for host in self.hosts:
+            if host.connection is None:
+                print(f"{host.name}: not connected")
+                continue
+            try:
+                with host.connection.borrow_connection() as conn:
+                    result = conn.execute('SELECT 1').fetchone()
+                role = 'primary' if host.is_primary else f'replica, lag {host.lag}s'
+                print(f"{host.name} ({role}) connection successful: ", result)
+            except OperationalError as e:
+                print(f"{host.name} connection failed: {e}")
+
+    def disconnect(self):
+        """Closes the pool of every host."""
+        self.close_result_cache()
+        for host in self.hosts:
+            if host.connection is not None:
+                host.connection.disconnect()
+                host.connection = None
+
+    def release(self):
+        """Closes the pool of every host, each one opens a new pool on its next checkout.
+
+        Returns False when a host's pool had a connection checked out and was left open.
+        """
+        released = [host.connection.release() for host in self.hosts if host.connection is not None]
+        return all(released)
+
+    def in_use(self):
+        return any(host.connection.in_use() for host in self.hosts if host.connection is not None)
+
+    @property
+    def last_used(self):
+        return max((host.connection.last_used for host in self.hosts if host.connection is not None), default=0.0)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.registry_managed:
+            self.disconnect()
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+from bisect import bisect
+from operator import itemgetter
+from dblinker.common.columnar import COLUMNAR_BATCH_SIZE, concat_columnar
+from .base_connection import PostgresBaseConnection, STREAM_BATCH_SIZE
+
+# Points each shard gets on the hash ring, more points spread keys more evenly between shards.
+DEFAULT_VIRTUAL_NODES = 128
+
+
+def hash_key(value):
+    """A stable 64-bit hash, Python's hash() changes between processes for strings."""
+    if not isinstance(value, bytes):
+        value = str(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+
+class ConsistentHashRing:
+    """Maps keys to shard names, adding or removing a shard only moves the keys of that shard."""
+
+    def __init__(self, names, virtual_nodes=DEFAULT_VIRTUAL_NODES):
+        if virtual_nodes < 1:
+            raise ValueError("virtual_nodes must be at least 1.")
+        points = sorted((hash_key(f"{name}#{i}"), name) for name in names for i in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def get(self, key):
+        if not self._hashes:
+            raise ValueError("The hash ring has no shards.")
+        # The first point clockwise from the key's hash, wrapping around past the end of the ring.
+        index = bisect(self._hashes, hash_key(key)) % len(self._hashes)
+        return self._names[index]
+
+
+class PGShardedConnection(PostgresBaseConnection):
+    """Routes keyed statements to one shard by consistent hashing and scatter-gathers the rest.
+
+    Every shard is a PGAsyncPoolConnection, statements that span shards run on all of them concurrently.
+    """
+
+    def __init__(self, shards, virtual_nodes=DEFAULT_VIRTUAL_NODES):
+        super().__init__()
+        if not shards:
+            raise ValueError("A sharded connection needs at least one shard.")
+        # Shard name -> PGAsyncPoolConnection
+        self.shards = dict(shards)
+        self.ring = ConsistentHashRing(self.shards, virtual_nodes)
+        # Set by PoolRegistry when the router is shared, shared routers outlive 'async with' blocks.
+        self.registry_managed = False
+
+    def enable_metrics(self, *args, **kwargs):
+        # Shard pools record into the router's metrics, so one snapshot covers every shard.
+        metrics = super().enable_metrics(*args, **kwargs)
+        for shard in self.shards.values():
+            shard.metrics = metrics
+        return metrics
+
+    def enable_slow_query_log(self, slow_query_log):
+        # The shards time their own statements, the router never runs one itself.
+        for shard in self.shards.values():
+            shard.enable_slow_query_log(slow_query_log)
+        return super().enable_slow_query_log(slow_query_log)
+
+    def shard_for(self, key):
+        """The name of the shard that owns key."""
+        return self.ring.get(key)
+
+    def shard(self, key):
+        """The PGAsyncPoolConnection of the shard that owns key."""
+        return self.shards[self.ring.get(key)]
+
+    async def connect(self):
+        await asyncio.gather(*(shard.connect() for shard in self.shards.values() if shard.pool is None))
+
+    async def execute(self, query, params=None, key=None, prepare=None, timeout=None):
+        """Runs one statement on the shard that owns key, returning its rows or None.
+
+        Without a key the statement runs on every shard, see scatter(). timeout is the deadline in seconds,
+        the shards' command_timeout when None.
+        """
+        if key is None:
+            return await self.scatter(query, params, prepare=prepare, timeout=timeout)
+        return await self.shard(key).execute(query, params, prepare, timeout)
+
+    async def execute_batch(self, query, params_seq, key, prepare=None):
+        """Runs query once per parameter set on the shard each set's key maps to.
+
+        key is a callable taking a parameter set, e.g. operator.itemgetter(0). Every shard gets one
+        pipelined transaction and the shards run concurrently. Returns the total statement count.
+        """
+        grouped = {}
+        for params in params_seq:
+            grouped.setdefault(self.shard_for(key(params)), []).append(params)
+        counts = await asyncio.gather(*(self.shards[name].execute_batch(query, batch, prepare)
+                                        for name, batch in grouped.items()))
+        return sum(counts)
+
+    async def scatter(self, query, params=None, order_by=None, reverse=False, limit=None, prepare=None,
+                      timeout=None):
+        """Runs query on every shard concurrently and merges the rows.
+
+        With order_by (a column index, a tuple of indexes or a key function) each shard's rows must already
+        be sorted the same way, e.g. by an ORDER BY in query, and they are merged into one sorted list.
+        limit stops the merge early, put the same LIMIT in query so no shard sends more rows than needed.
+        Statements without a result set return None. timeout applies on every shard, a shard that misses
+        it fails the whole call and the statements still running on the other shards are cancelled.
+        """
+        results = await self._gather(query, params, prepare, timeout)
+        if all(rows is None for rows in results):
+            return None
+        results = [rows or [] for rows in results]
+        if order_by is None:
+            merged = itertools.chain.from_iterable(results)
+        else:
+            if isinstance(order_by, int):
+                order_by = itemgetter(order_by)
+            elif isinstance(order_by, (tuple, list)):
+                order_by = itemgetter(*order_by)
+            merged = heapq.merge(*results, key=order_by, reverse=reverse)
+        return list(itertools.islice(merged, limit))
+
+    async def scatter_by_shard(self, query, params=None, prepare=None, timeout=None):
+        """Runs query on every shard concurrently, returning {shard name: rows}."""
+        return dict(zip(self.shards, await self._gather(query, params, prepare, timeout)))
+
+    async def _gather(self, query, params, prepare, timeout):
+        tasks = [asyncio.ensure_future(shard.execute(query, params, prepare, timeout))
+                 for shard in self.shards.values()]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            # gather() leaves the other shards running when one fails, cancel them so they free their
+            # connections instead of running on to their own deadlines.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stream(self, query, params=None, key=None, batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of query from a server-side cursor on the shard that owns key.
+
+        Without a key the shards are streamed one after another.
+        """
+        shards = [self.shard(key)] if key is not None else list(self.shards.values())
+        for shard in shards:
+            rows = shard.stream(query, params, batch_size, batches)
+            try:
+                async for item in rows:
+                    yield item
+            finally:
+                await rows.aclose()
+
+    async def fetch_numpy(self, query, params=None, key=None, dtypes=None, batch_size=COLUMNAR_BATCH_SIZE,
+                          structured=False):
+        """Fetches a SELECT into NumPy arrays from the shard that owns key, or from every shard concatenated.
+
+        Pass dtypes for columns that can be entirely NULL on a shard, so every shard agrees on the dtype.
+        """
+        shards = [self.shard(key)] if key is not None else list(self.shards.values())
+        results = await asyncio.gather(*(shard.fetch_numpy(query, params, dtypes, batch_size) for shard in shards))
+        result = concat_columnar(results)
+        return result.to_structured() if structured else result
+
+    def pool_stats(self):
+        """psycopg_pool's counters per shard."""
+        return {name: shard.pool_stats() for name, shard in self.shards.items()}
+
+    async def test_connection(self):
+        for name, shard in self.shards.items():
+            print(f"Shard {name}:")
+            await shard.test_connection()
+
+    async def disconnect(self):
+        await asyncio.gather(*(shard.disconnect() for shard in self.shards.values()))
+
+    async def release(self):
+        return all(await asyncio.gather(*(shard.release() for shard in self.shards.values())))
+
+    def in_use(self):
+        return any(shard.in_use() for shard in self.shards.values())
+
+    @property
+    def last_used(self):
+        return max(shard.last_used for shard in self.shards.values())
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if not self.registry_managed:
+            await self.disconnect()
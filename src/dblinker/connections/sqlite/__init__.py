@@ -0,0 +1 @@
+from .sqlite_connection_factory import SQLiteConnectionFactory
@@ -0,0 +1,111 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dblinker.common.result_cache import MISS
+from ..fork_safety import abandon
+from .base_connection import SQLiteBaseConnection, open_sqlite_connection, STREAM_BATCH_SIZE
+
+
+class SQLiteAsyncConnection(SQLiteBaseConnection):
+    """An asyncio front end for sqlite3, all SQLite work runs on one dedicated worker thread.
+
+    The event loop only awaits futures, so slow statements and fsyncs never block it.
+    """
+
+    def __init__(self, database, pragmas=None, connect_settings=None):
+        self.database = database
+        self.pragmas = pragmas or {}
+        self.connect_settings = connect_settings or {}
+        self.connection = None
+        self._executor = None
+        self.track_forks()
+
+    async def _run(self, func, *args):
+        """Runs func(*args) on the worker thread and awaits its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def connect(self):
+        """Starts the worker thread and opens the connection on it."""
+        if self.connection is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dblinker-sqlite')
+            self.connection = await self._run(self._open)
+
+    def discard_inherited(self):
+        # The worker thread didn't survive the fork, a new one is started with the child's own connection.
+        abandon(self.connection, self._executor)
+        self.connection = None
+        self._executor = None
+
+    def _open(self):
+        return open_sqlite_connection(self.database, self.pragmas, **self.connect_settings)
+
+    async def execute(self, sql, params=()):
+        """Runs one statement, returning the fetched rows for queries and None otherwise."""
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(sql, params)
+            if rows is not MISS:
+                return rows
+        if self.connection is None:
+            await self.connect()
+        with self.observe_query(sql, params):
+            rows = await self._run(self.run_execute, self.connection, sql, params)
+        if cache is not None:
+            cache.store(token, sql, rows)
+        return rows
+
+    async def executemany(self, sql, params_seq):
+        """Runs a statement for every parameter set in a single transaction."""
+        if self.connection is None:
+            await self.connect()
+        with self.observe_query(sql):
+            rowcount = await self._run(self.run_executemany, self.connection, sql, list(params_seq))
+        if self.result_cache is not None:
+            self.result_cache.invalidate_statement(sql)
+        return rowcount
+
+    async def stream(self, sql, params=(), batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of a query, each batch is fetched on the worker thread. Close early with aclose()."""
+        if self.connection is None:
+            await self.connect()
+        cursor = await self._run(self.connection.execute, sql, params)
+        try:
+            while True:
+                rows = await self._run(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                if batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+        finally:
+            await self._run(cursor.close)
+
+    async def __aenter__(self):
+        if self.connection is None:
+            await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    async def test_connection(self):
+        """Tests the asynchronous database connection."""
+        try:
+            result = await self.execute('SELECT sqlite_version();')
+            journal_mode = (await self.execute('PRAGMA journal_mode;'))[0][0]
+            print(f"Async connection successful: SQLite {result[0][0]}, journal_mode={journal_mode}")
+        except sqlite3.Error as e:
+            print(f"Connection failed: {e}")
+
+    async def disconnect(self):
+        """Closes the connection on the worker thread and stops the thread."""
+        self.close_result_cache()
+        if self.connection is not None:
+            await self._run(self.connection.close)
+            self.connection = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,329 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dblinker.common.result_cache import MISS
+from ..fork_safety import abandon
+from .base_connection import SQLiteBaseConnection, open_sqlite_connection, is_read_only_sql, STREAM_BATCH_SIZE
+
+# Reader threads, each with its own read-only connection, unless async_pool_settings sets 'readers'.
+DEFAULT_READERS = 4
+# Most queued writes the writer thread commits together in one transaction.
+DEFAULT_WRITE_BATCH = 256
+# Writes share the writer's transactions, so statements that open or end transactions are refused.
+TRANSACTION_KEYWORDS = ('begin', 'commit', 'end', 'rollback', 'savepoint', 'release')
+# Put on the write queue by disconnect(), the writer finishes the writes queued before it and exits.
+_STOP = object()
+
+
+class SQLiteReader:
+    """A reader thread and the read-only connection it opened, statements and streams stay on that thread."""
+
+    __slots__ = ('executor', 'connection', 'in_flight')
+
+    def __init__(self, executor, connection):
+        self.executor = executor
+        self.connection = connection
+        self.in_flight = 0
+
+
+class SQLiteAsyncPoolConnection(SQLiteBaseConnection):
+    """An asyncio front end for SQLite with one writer thread and a small pool of reader threads.
+
+    Writes are queued to the writer thread, which commits everything queued while the previous commit ran
+    in a single transaction (up to write_batch writes), so a burst of writes costs a few commits instead of
+    one each. Each write runs in its own savepoint, a failing write is rolled back alone and only its caller
+    sees the error. Callers are answered once their batch is committed. Reads run on the least busy
+    reader thread through a read-only connection, under WAL they never wait on the writer.
+    """
+
+    def __init__(self, database, pragmas=None, pool_settings=None, connect_settings=None):
+        self.database = database
+        self.pragmas = pragmas or {}
+        self.pool_settings = pool_settings or {}
+        self.connect_settings = connect_settings or {}
+        # Read-only connections to an in-memory database would each see an empty database of their own.
+        in_memory = str(database) == ':memory:'
+        self.reader_count = 0 if in_memory else int(self.pool_settings.get('readers', DEFAULT_READERS))
+        self.write_batch = int(self.pool_settings.get('write_batch', DEFAULT_WRITE_BATCH))
+        if self.reader_count < 0 or self.write_batch < 1:
+            raise ValueError("readers must be at least 0 and write_batch at least 1.")
+        # Set by PoolRegistry when the pool is shared, shared pools outlive 'async with' blocks.
+        self.registry_managed = False
+        self._writes = None
+        self._writer_thread = None
+        self._readers = []
+        self._connect_lock = None
+        # Writes queued or being committed, only touched on the event loop.
+        self._pending_writes = 0
+        self.write_batches = self.batched_writes = 0
+        self.track_forks()
+
+    async def connect(self):
+        """Starts the writer thread, which creates the database and switches it to WAL, then the readers."""
+        self.check_fork()
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer_thread is not None:
+                return
+            writes = queue.Queue()
+            opened = Future()
+            thread = threading.Thread(target=self._run_writer, args=(writes, opened), name='dblinker-sqlite-writer',
+                                      daemon=True)
+            thread.start()
+            await asyncio.wrap_future(opened)
+            loop = asyncio.get_running_loop()
+            readers = []
+            for _ in range(self.reader_count):
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dblinker-sqlite-reader')
+                connection = await loop.run_in_executor(executor, self._open_reader)
+                readers.append(SQLiteReader(executor, connection))
+            # Published last, other tasks treat a set writer thread as fully connected.
+            self._readers = readers
+            self._writes, self._writer_thread = writes, thread
+
+    def _open_reader(self):
+        return open_sqlite_connection(self.database, self.pragmas, read_only=True, **self.connect_settings)
+
+    def discard_inherited(self):
+        """Forgets the parent's threads and connections in a forked child, the next call starts new ones."""
+        # The threads didn't survive the fork, and closing the connections could checkpoint the parent's WAL.
+        abandon(self._writes, self._writer_thread, *self._readers)
+        self._writes = None
+        self._writer_thread = None
+        self._readers = []
+        self._pending_writes = 0
+        self._connect_lock = None
+
+    def _run_writer(self, writes, opened):
+        try:
+            connection = open_sqlite_connection(self.database, self.pragmas, **self.connect_settings)
+        except BaseException as e:
+            opened.set_exception(e)
+            return
+        opened.set_result(None)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [writes.get()]
+                # Everything queued while the previous batch committed goes into this one.
+                while len(batch) < self.write_batch:
+                    try:
+                        batch.append(writes.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [job for job in batch if job is not _STOP]
+                # Callers whose task was cancelled while their write waited in the queue are skipped.
+                batch = [job for job in batch if job[1].set_running_or_notify_cancel()]
+                if batch:
+                    self._commit_batch(connection, batch)
+        finally:
+            connection.close()
+
+    def _commit_batch(self, connection, batch):
+        metrics = self.metrics
+        outcomes = []
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            for func, future, queued in batch:
+                if metrics is not None:
+                    # Time spent queued for the writer is this pool's equivalent of a checkout wait.
+                    metrics.checkout_wait.observe(time.perf_counter() - queued)
+                connection.execute('SAVEPOINT dblinker_write')
+                try:
+                    outcomes.append((future, func(connection), None))
+                except Exception as e:
+                    connection.execute('ROLLBACK TO dblinker_write')
+                    outcomes.append((future, None, e))
+                connection.execute('RELEASE dblinker_write')
+            connection.execute('COMMIT')
+        except Exception as e:
+            # BEGIN or COMMIT failed, nothing in the batch was written.
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            outcomes = [(future, None, e) for _, future, _ in batch]
+        self.write_batches += 1
+        self.batched_writes += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    async def _write(self, func):
+        """Queues func(connection) for the writer thread and awaits its result once its batch is committed."""
+        if self._writer_thread is None:
+            await self.connect()
+        future = Future()
+        self._pending_writes += 1
+        self.last_used = time.monotonic()
+        try:
+            self._writes.put((func, future, time.perf_counter()))
+            return await asyncio.wrap_future(future)
+        finally:
+            self._pending_writes -= 1
+            self.last_used = time.monotonic()
+
+    async def _read(self, func, *args):
+        """Runs func(connection, *args) on the least busy reader thread."""
+        if self._writer_thread is None:
+            await self.connect()
+        if not self._readers:
+            return await self._write(lambda connection: func(connection, *args))
+        reader = min(self._readers, key=lambda r: r.in_flight)
+        reader.in_flight += 1
+        self.last_used = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(reader.executor, func, reader.connection, *args)
+        finally:
+            reader.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    @staticmethod
+    def check_statement(sql):
+        words = sql.lstrip().split(None, 1)
+        if words and words[0].lower().rstrip(';') in TRANSACTION_KEYWORDS:
+            raise ValueError("Writes are committed in batches by the writer thread, use execute_pipeline() to run "
+                             "statements in one transaction instead of BEGIN/COMMIT.")
+
+    async def execute(self, sql, params=()):
+        """Runs one statement, reads on a reader thread and writes through the writer, returning rows for queries."""
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(sql, params)
+            if rows is not MISS:
+                return rows
+        with self.observe_query(sql, params):
+            if is_read_only_sql(sql):
+                rows = await self._read(self.run_execute, sql, params)
+            else:
+                self.check_statement(sql)
+                rows = await self._write(lambda connection: self.run_execute(connection, sql, params))
+        if cache is not None:
+            cache.store(token, sql, rows)
+        return rows
+
+    async def executemany(self, sql, params_seq):
+        """Runs a statement for every parameter set, all of them committed together or not at all."""
+        self.check_statement(sql)
+        params_seq = list(params_seq)
+        with self.observe_query(sql):
+            rowcount = await self._write(lambda connection: connection.executemany(sql, params_seq).rowcount)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_statement(sql)
+        return rowcount
+
+    async def execute_pipeline(self, statements):
+        """Runs (sql, params) pairs on the writer as one atomic unit, returning the statement count."""
+        statements = [(sql, params) for sql, params in statements]
+        for sql, _ in statements:
+            self.check_statement(sql)
+
+        def run(connection):
+            for sql, params in statements:
+                connection.execute(sql, params).close()
+            return len(statements)
+
+        with self.observe_query():
+            count = await self._write(run)
+        if self.result_cache is not None:
+            for sql, _ in statements:
+                self.result_cache.invalidate_statement(sql)
+        return count
+
+    async def stream(self, sql, params=(), batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of a query fetched batch by batch on one reader thread. Close early with aclose()."""
+        if self._writer_thread is None:
+            await self.connect()
+        if not self._readers:
+            # Without readers the writer thread owns the only connection, fetch everything in one go.
+            rows = await self.execute(sql, params)
+            for start in range(0, len(rows or ()), batch_size):
+                if batches:
+                    yield rows[start:start + batch_size]
+                else:
+                    for row in rows[start:start + batch_size]:
+                        yield row
+            return
+        reader = min(self._readers, key=lambda r: r.in_flight)
+        reader.in_flight += 1
+        self.last_used = time.monotonic()
+        loop = asyncio.get_running_loop()
+        cursor = await loop.run_in_executor(reader.executor, reader.connection.execute, sql, params)
+        try:
+            while True:
+                rows = await loop.run_in_executor(reader.executor, cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                if batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+        finally:
+            reader.in_flight -= 1
+            self.last_used = time.monotonic()
+            await loop.run_in_executor(reader.executor, cursor.close)
+
+    def pool_stats(self):
+        """Reader and queue counters, batched_writes / write_batches is the average writes per commit."""
+        return {'open_connections': len(self._readers) + (self._writer_thread is not None),
+                'readers': len(self._readers),
+                'queued_writes': self._writes.qsize() if self._writes is not None else 0,
+                'write_batches': self.write_batches, 'batched_writes': self.batched_writes}
+
+    async def __aenter__(self):
+        if self._writer_thread is None:
+            await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if not self.registry_managed:
+            await self.disconnect()
+
+    async def test_connection(self):
+        """Tests a reader connection and the writer."""
+        try:
+            result = await self.execute('SELECT sqlite_version();')
+            journal_mode = (await self._write(lambda connection: connection.execute('PRAGMA journal_mode;')
+                                              .fetchone()[0]))
+            print(f"Async pool connection successful ({len(self._readers)} readers): SQLite {result[0][0]}, "
+                  f"journal_mode={journal_mode}")
+        except sqlite3.Error as e:
+            print(f"Connection failed: {e}")
+
+    async def disconnect(self):
+        """Commits the writes already queued, then closes every connection and stops the threads."""
+        self.close_result_cache()
+        await self._stop_threads()
+
+    async def release(self):
+        """Like disconnect() but keeps the result cache, the next statement starts the threads again.
+
+        Returns False, stopping nothing, while a read or write is running.
+        """
+        if self.in_use():
+            return False
+        await self._stop_threads()
+        return True
+
+    def in_use(self):
+        return self._pending_writes > 0 or any(reader.in_flight for reader in self._readers)
+
+    async def _stop_threads(self):
+        thread, writes = self._writer_thread, self._writes
+        readers, self._readers = self._readers, []
+        self._writer_thread = self._writes = None
+        loop = asyncio.get_running_loop()
+        if thread is not None:
+            writes.put(_STOP)
+            await loop.run_in_executor(None, thread.join)
+        for reader in readers:
+            await loop.run_in_executor(reader.executor, reader.connection.close)
+            reader.executor.shutdown(wait=False)
@@ -0,0 +1,107 @@
+import re
+import sqlite3
+from abc import ABC
+from pathlib import Path
+from urllib.parse import quote
+
+from ..base import BaseConnection
+
+# Tuned defaults, the stock sqlite3.connect() settings fsync every commit and use a 2MB page cache.
+# Any of these can be overridden in the config's 'pragmas' section, a null value leaves SQLite's own default.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',  # Readers don't block the writer and commits append to the WAL instead of rewriting pages
+    'synchronous': 'normal',  # Safe with WAL, fsyncs at checkpoints instead of on every commit
+    'temp_store': 'memory',  # Temporary tables and indices live in RAM
+    'cache_size': -65536,  # Negative values are in KiB, this is a 64MB page cache per connection
+    'mmap_size': 268435456,  # Read pages through a 256MB memory map instead of read() calls
+    'busy_timeout': 5000,  # Wait up to 5 seconds for a lock instead of failing with 'database is locked'
+}
+# Only these pragmas are accepted from config files, as pragma statements cannot take bound parameters.
+ALLOWED_PRAGMAS = ('journal_mode', 'synchronous', 'temp_store', 'cache_size', 'mmap_size', 'busy_timeout',
+                   'foreign_keys', 'page_size', 'wal_autocheckpoint', 'locking_mode', 'auto_vacuum',
+                   'cache_spill', 'journal_size_limit')
+_PRAGMA_VALUE = re.compile(r'^-?[A-Za-z0-9_]+$')
+# Rows fetched per fetchmany() call when streaming.
+STREAM_BATCH_SIZE = 2000
+# Statements starting with these keywords never write to the database.
+READ_ONLY_KEYWORDS = ('select', 'explain', 'values')
+
+
+def merge_pragmas(pragmas=None):
+    """Overlays config pragmas on the tuned defaults, validating names and values."""
+    merged = dict(DEFAULT_PRAGMAS)
+    for name, value in (pragmas or {}).items():
+        if name not in ALLOWED_PRAGMAS:
+            raise ValueError(f"Unsupported SQLite pragma: {name}")
+        if value is not None and not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Invalid value for SQLite pragma {name}: {value}")
+        merged[name] = value
+    return {name: value for name, value in merged.items() if value is not None}
+
+
+def is_read_only_sql(sql):
+    """Returns True for statements that can safely run on a read-only connection."""
+    words = sql.lstrip().split(None, 1)
+    return bool(words) and words[0].lower() in READ_ONLY_KEYWORDS
+
+
+def open_sqlite_connection(database, pragmas=None, read_only=False, **connect_settings):
+    """Opens a sqlite3 connection in autocommit mode and applies the given pragmas."""
+    database = str(database)
+    if read_only and database != ':memory:':
+        # A read-only URI connection can never take the write lock, so it never waits on the writer.
+        database = f"file:{quote(str(Path(database).expanduser()))}?mode=ro"
+        connect_settings['uri'] = True
+    elif database != ':memory:':
+        database = str(Path(database).expanduser())
+    # isolation_level=None disables the implicit BEGIN, transactions are opened explicitly where needed.
+    connection = sqlite3.connect(database, isolation_level=None, **connect_settings)
+    for name, value in (pragmas or {}).items():
+        if read_only and name == 'journal_mode':
+            # Changing the journal mode needs write access, the writer connection sets it for everyone.
+            continue
+        connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
+
+class SQLiteBaseConnection(BaseConnection, ABC):
+    # SQLite-specific shared behavior
+    @staticmethod
+    def run_execute(connection, sql, params=()):
+        """Runs one statement, returning its rows for queries and None otherwise."""
+        cursor = connection.execute(sql, params)
+        try:
+            return cursor.fetchall() if cursor.description is not None else None
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def run_executemany(connection, sql, params_seq):
+        """Runs a statement for every parameter set inside one transaction, returning the row count."""
+        if connection.in_transaction:
+            # Already inside a caller's transaction, let the caller decide when to commit.
+            return connection.executemany(sql, params_seq).rowcount
+        connection.execute('BEGIN')
+        try:
+            rowcount = connection.executemany(sql, params_seq).rowcount
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return rowcount
+
+    @staticmethod
+    def stream_rows(connection, sql, params=(), batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of a query batch_size at a time, or lists of rows with batches=True."""
+        cursor = connection.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if batches:
+                    yield rows
+                else:
+                    yield from rows
+        finally:
+            cursor.close()
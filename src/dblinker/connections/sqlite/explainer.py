@@ -0,0 +1,31 @@
+import os
+from ..fork_safety import abandon
+from .base_connection import open_sqlite_connection
+
+
+class SQLiteExplainer:
+    """Captures EXPLAIN QUERY PLAN output for the slow query log on a read-only connection of its own.
+
+    EXPLAIN QUERY PLAN only prepares the statement, so writes are explained as safely as reads.
+    """
+
+    def __init__(self, database, pragmas=None, connect_settings=None):
+        self.database = database
+        self.pragmas = pragmas or {}
+        self.connect_settings = connect_settings or {}
+        self._connection = None
+        self._pid = os.getpid()
+
+    def __call__(self, query, params=None):
+        if str(self.database) == ':memory:':
+            # Another connection to an in-memory database would see an empty database of its own.
+            return None
+        if self._pid != os.getpid():
+            abandon(self._connection)
+            self._connection = None
+            self._pid = os.getpid()
+        if self._connection is None:
+            self._connection = open_sqlite_connection(self.database, self.pragmas, read_only=True,
+                                                      **self.connect_settings)
+        rows = self._connection.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+        return [{'id': row[0], 'parent': row[1], 'detail': row[3]} for row in rows]
@@ -0,0 +1,82 @@
+import sqlite3
+from dblinker.common.result_cache import MISS
+from ..fork_safety import abandon
+from .base_connection import SQLiteBaseConnection, open_sqlite_connection, STREAM_BATCH_SIZE
+
+
+class SQLiteNormalConnection(SQLiteBaseConnection):
+    def __init__(self, database, pragmas=None, connect_settings=None):
+        # database is the file_location from the config, pragmas are already merged with the defaults.
+        self.database = database
+        self.pragmas = pragmas or {}
+        self.connect_settings = connect_settings or {}
+        self.connection = None
+        self.track_forks()
+
+    def connect(self):
+        # Opens the database file and applies the configured pragmas.
+        self.connection = open_sqlite_connection(self.database, self.pragmas, **self.connect_settings)
+
+    def discard_inherited(self):
+        # Never closed in the child: closing the last connection may checkpoint and remove the parent's WAL.
+        abandon(self.connection)
+        self.connection = None
+
+    def execute(self, sql, params=()):
+        """Runs one statement, returning the fetched rows for queries and None otherwise."""
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(sql, params)
+            if rows is not MISS:
+                return rows
+        if not self.connection:
+            self.connect()
+        with self.observe_query(sql, params):
+            rows = self.run_execute(self.connection, sql, params)
+        if cache is not None:
+            cache.store(token, sql, rows)
+        return rows
+
+    def executemany(self, sql, params_seq):
+        """Runs a statement for every parameter set in a single transaction."""
+        if not self.connection:
+            self.connect()
+        with self.observe_query(sql):
+            rowcount = self.run_executemany(self.connection, sql, params_seq)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_statement(sql)
+        return rowcount
+
+    def stream(self, sql, params=(), batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of a query without fetching them all, or lists of rows with batches=True."""
+        if not self.connection:
+            self.connect()
+        with self.observe_query(sql, params):
+            yield from self.stream_rows(self.connection, sql, params, batch_size, batches)
+
+    def test_connection(self):
+        try:
+            if not self.connection:
+                self.connect()
+            result = self.connection.execute('SELECT sqlite_version();').fetchone()
+            journal_mode = self.connection.execute('PRAGMA journal_mode;').fetchone()[0]
+            print(f"Connection successful: SQLite {result[0]}, journal_mode={journal_mode}")
+        except sqlite3.Error as e:
+            print(f"Connection failed: {e}")
+
+    def disconnect(self):
+        # Closes the connection to the database.
+        self.close_result_cache()
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        # Ensures the connection is established when entering the context.
+        if not self.connection:
+            self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Closes the connection when exiting the context.
+        self.disconnect()
@@ -0,0 +1,228 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dblinker.common.result_cache import MISS
+from ..fork_safety import abandon
+from .base_connection import SQLiteBaseConnection, open_sqlite_connection, is_read_only_sql, STREAM_BATCH_SIZE
+
+
+class SQLitePoolConnection(SQLiteBaseConnection):
+    """A per-thread connection pool, each thread lazily opens and then keeps its own sqlite3 connection.
+
+    Connections of threads that have exited are closed whenever a new one is opened, or by reap_dead_threads().
+
+    With single_writer enabled every write goes through one shared writer connection guarded by a lock,
+    while each thread reads through its own read-only connection. Under WAL the readers never wait on
+    the writer, and writers queue on a Python lock instead of spinning on SQLITE_BUSY.
+    """
+
+    def __init__(self, database, pragmas=None, pool_settings=None, connect_settings=None):
+        self.database = database
+        self.pragmas = pragmas or {}
+        self.pool_settings = pool_settings or {}
+        self.connect_settings = connect_settings or {}
+        self.single_writer = bool(self.pool_settings.get('single_writer', False))
+        # Set by PoolRegistry when the pool is shared, shared pools outlive 'with' blocks.
+        self.registry_managed = False
+        self._local = threading.local()
+        # Thread -> the connection it opened, kept to reap dead threads and so that disconnect() can close them all.
+        self._thread_connections = {}
+        self._lock = threading.Lock()
+        # Statements running right now, counted under _lock so release() never closes a connection in use.
+        self._active = 0
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.track_forks()
+
+    def connect(self):
+        # Connections are opened lazily per thread, in single writer mode the writer is opened up front
+        # because it creates the database file and switches it to WAL before any reader attaches.
+        if self.single_writer:
+            self._get_writer()
+
+    def discard_inherited(self):
+        """Forgets the parent's connections in a forked child, each thread opens its own again on first use."""
+        # Never closed in the child: closing the last connection may checkpoint and remove the parent's WAL.
+        abandon(self._writer, *self._thread_connections.values())
+        self._thread_connections = {}
+        self._writer = None
+        # The forking thread's thread-local connection was copied into the child too.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._writer_lock = threading.Lock()
+
+    def _get_writer(self):
+        with self._lock:
+            if self._writer is None:
+                # The writer is shared between threads, access to it is serialized by _writer_lock.
+                self._writer = open_sqlite_connection(self.database, self.pragmas, check_same_thread=False,
+                                                      **self.connect_settings)
+            return self._writer
+
+    def _get_thread_connection(self):
+        self.check_fork()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self.reap_dead_threads()
+            if self.single_writer:
+                self._get_writer()
+            # check_same_thread is off so disconnect() can close it from any thread, the pool itself
+            # guarantees the connection is only used by the thread that opened it.
+            connection = open_sqlite_connection(self.database, self.pragmas, read_only=self.single_writer,
+                                                check_same_thread=False, **self.connect_settings)
+            self._local.connection = connection
+            with self._lock:
+                self._thread_connections[threading.current_thread()] = connection
+        return connection
+
+    def reap_dead_threads(self):
+        """Closes the connections of threads that have exited, returning how many were closed."""
+        with self._lock:
+            dead = [thread for thread in self._thread_connections if not thread.is_alive()]
+            connections = [self._thread_connections.pop(thread) for thread in dead]
+        for connection in connections:
+            connection.close()
+        return len(connections)
+
+    def _begin(self):
+        with self._lock:
+            self._active += 1
+            self.last_used = time.monotonic()
+
+    def _end(self):
+        with self._lock:
+            self._active -= 1
+            self.last_used = time.monotonic()
+
+    def in_use(self):
+        return self._active > 0
+
+    @contextmanager
+    def connection(self):
+        """Yields the calling thread's connection, read-only in single writer mode."""
+        self._begin()
+        try:
+            yield self._get_thread_connection()
+        finally:
+            self._end()
+
+    @contextmanager
+    def writer(self):
+        """Yields a connection inside a write transaction that is committed on success."""
+        self.check_fork()
+        self._begin()
+        try:
+            if self.single_writer:
+                metrics = self.metrics
+                requested = time.perf_counter()
+                with self._writer_lock:
+                    if metrics is not None:
+                        # Waiting for the writer lock is this pool's equivalent of a checkout wait.
+                        metrics.checkout_wait.observe(time.perf_counter() - requested)
+                    yield from self._transaction(self._get_writer())
+            else:
+                yield from self._transaction(self._get_thread_connection())
+        finally:
+            self._end()
+
+    @staticmethod
+    def _transaction(connection):
+        # BEGIN IMMEDIATE takes the write lock up front, avoiding deadlocks between upgrading readers.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def execute(self, sql, params=()):
+        """Runs one statement, routing writes through the writer, returning rows for queries."""
+        cache = self.result_cache
+        if cache is not None:
+            token, rows = cache.lookup(sql, params)
+            if rows is not MISS:
+                return rows
+        if is_read_only_sql(sql):
+            self._begin()
+            try:
+                with self.observe_query(sql, params):
+                    rows = self.run_execute(self._get_thread_connection(), sql, params)
+            finally:
+                self._end()
+        else:
+            with self.writer() as connection, self.observe_query(sql, params):
+                rows = self.run_execute(connection, sql, params)
+        if cache is not None:
+            cache.store(token, sql, rows)
+        return rows
+
+    def executemany(self, sql, params_seq):
+        """Runs a statement for every parameter set in a single write transaction."""
+        with self.writer() as connection, self.observe_query(sql):
+            rowcount = connection.executemany(sql, params_seq).rowcount
+        if self.result_cache is not None:
+            self.result_cache.invalidate_statement(sql)
+        return rowcount
+
+    def stream(self, sql, params=(), batch_size=STREAM_BATCH_SIZE, batches=False):
+        """Yields the rows of a query from the calling thread's connection, or lists of rows with batches=True."""
+        with self.connection() as connection, self.observe_query(sql, params):
+            yield from self.stream_rows(connection, sql, params, batch_size, batches)
+
+    def pool_stats(self):
+        """The number of open connections, SQLite pools have no checkout queue to report on."""
+        return {'open_connections': self.open_connection_count(), 'single_writer': int(self.single_writer)}
+
+    def open_connection_count(self):
+        """Returns the number of sqlite3 connections currently open in the pool."""
+        self.reap_dead_threads()
+        with self._lock:
+            return len(self._thread_connections) + (self._writer is not None)
+
+    def test_connection(self):
+        """Tests the calling thread's connection and, in single writer mode, the writer."""
+        try:
+            with self.connection() as connection:
+                result = connection.execute('SELECT sqlite_version();').fetchone()
+                journal_mode = connection.execute('PRAGMA journal_mode;').fetchone()[0]
+            mode = 'single writer' if self.single_writer else 'per-thread'
+            print(f"Pool connection successful ({mode}): SQLite {result[0]}, journal_mode={journal_mode}")
+        except sqlite3.Error as e:
+            print(f"Connection failed: {e}")
+
+    def disconnect(self):
+        """Closes every connection opened by the pool."""
+        self.close_result_cache()
+        self._close_connections(force=True)
+
+    def release(self):
+        """Closes every connection opened by the pool, threads open new ones on their next statement.
+
+        Returns False, closing nothing, while a statement is running.
+        """
+        return self._close_connections(force=False)
+
+    def _close_connections(self, force):
+        with self._lock:
+            if self._active and not force:
+                return False
+            connections = [self._writer, *self._thread_connections.values()]
+            self._thread_connections = {}
+            self._writer = None
+            # Threads still holding a closed connection in their thread-local storage get a fresh one.
+            self._local = threading.local()
+        for connection in connections:
+            if connection is not None:
+                connection.close()
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Ensure the pool is properly closed when exiting the context, unless the registry owns it.
+        if not self.registry_managed:
+            self.disconnect()
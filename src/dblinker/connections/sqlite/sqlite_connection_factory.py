@@ -0,0 +1,55 @@
+from dblinker.common.metrics import DEFAULT_LATENCY_BUCKETS
+from dblinker.common.result_cache import ResultCache
+from dblinker.common.slow_query_log import SlowQueryLog
+from dblinker.common.config.config_loader import DBConfig
+from dblinker.connections.sqlite.base_connection import merge_pragmas
+from dblinker.connections.sqlite.normal_connection import SQLiteNormalConnection
+from dblinker.connections.sqlite.pool_connection import SQLitePoolConnection
+from dblinker.connections.sqlite.async_connection import SQLiteAsyncConnection
+from dblinker.connections.sqlite.async_pool_connection import SQLiteAsyncPoolConnection
+from dblinker.connections.sqlite.explainer import SQLiteExplainer
+
+
+class SQLiteConnectionFactory:
+    def __init__(self, config):
+        # Accept either a compiled DBConfig or a raw config dictionary, which is validated on the way in.
+        self.dbconfig = config if isinstance(config, DBConfig) else DBConfig.from_dict(config)
+        self.connection_type = self.dbconfig.connection_type
+        self.database = self.dbconfig.connection_settings.get('file_location')
+        if not self.database:
+            raise ValueError("SQLite configs need a 'file_location'.")
+        self.pragmas = merge_pragmas(self.dbconfig.sections.get('pragmas'))
+        self.pool_settings = dict(self.dbconfig.pool_settings)
+        # Reader thread count and write batch size for the 'async_pool' connection type.
+        self.async_pool_settings = dict(self.dbconfig.async_pool_settings)
+        # Extra sqlite3.connect() keyword arguments, e.g. timeout.
+        self.connect_settings = dict(self.dbconfig.sections.get('connect_settings') or {})
+        self.metrics_settings = dict(self.dbconfig.sections.get('metrics_settings') or {})
+        self.cache_settings = dict(self.dbconfig.sections.get('cache_settings') or {})
+        self.slowlog_settings = dict(self.dbconfig.sections.get('slowlog_settings') or {})
+
+    def get_connection(self):
+        connection_type = self.connection_type
+
+        if connection_type == 'normal':
+            connection = SQLiteNormalConnection(self.database, self.pragmas, self.connect_settings)
+        elif connection_type == 'pool':
+            connection = SQLitePoolConnection(self.database, self.pragmas, self.pool_settings, self.connect_settings)
+        elif connection_type == 'async':
+            connection = SQLiteAsyncConnection(self.database, self.pragmas, self.connect_settings)
+        elif connection_type == 'async_pool':
+            connection = SQLiteAsyncPoolConnection(self.database, self.pragmas, self.async_pool_settings,
+                                                   self.connect_settings)
+        else:
+            raise ValueError(f"Unsupported connection type: {connection_type}")
+
+        if self.metrics_settings.get('enabled'):
+            connection.enable_metrics(self.dbconfig.connection_name,
+                                      self.metrics_settings.get('buckets') or DEFAULT_LATENCY_BUCKETS)
+        if self.cache_settings.get('enabled'):
+            connection.enable_result_cache(ResultCache.from_settings(self.cache_settings))
+        if self.slowlog_settings.get('enabled'):
+            connection.enable_slow_query_log(SlowQueryLog.from_settings(
+                self.slowlog_settings, self.dbconfig.connection_name,
+                SQLiteExplainer(self.database, self.pragmas, self.connect_settings)))
+        return connection
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dblinker import __version__
+from dblinker.common.config.config_loader import DBConfig, default_config_loader
+from dblinker.common.metrics import LatencyHistogram
+from dblinker.connections.postgres.postgres_connection_factory import PostgresConnectionFactory
+from dblinker.connections.sqlite.sqlite_connection_factory import SQLiteConnectionFactory
+
+# Finer buckets than the metrics defaults, from 5 microseconds up, so local p50s are not all in one bucket.
+BENCH_LATENCY_BUCKETS = tuple(round(0.000005 * 1.25 ** i, 7) for i in range(70))
+BENCH_TABLE = 'dblinker_bench'
+BENCH_INSERT_TABLE = 'dblinker_bench_insert'
+BENCH_ROWS = 10000
+BULK_INSERT_BATCH = 100
+# Sections left out of benchmarked configs: cached reads never reach the server, and metrics and the slow
+# query log (with its EXPLAIN ANALYZE reruns) add their own cost to the latencies being measured.
+BENCH_EXCLUDED_SECTIONS = ('cache_settings', 'metrics_settings', 'slowlog_settings')
+WORKLOADS = ('select1', 'point_lookup', 'bulk_insert', 'mixed')
+CONNECTION_TYPES = {'postgresql': ('normal', 'pool', 'async', 'async_pool'),
+                    'sqlite': ('normal', 'pool', 'async', 'async_pool')}
+
+
+class BenchmarkWorkload:
+    """The statements one workload runs, rendered for the database's parameter style."""
+
+    def __init__(self, name, database_type):
+        self.name = name
+        self.database_type = database_type
+        placeholder = '%s' if database_type == 'postgresql' else '?'
+        self.lookup_sql = f"SELECT payload FROM {BENCH_TABLE} WHERE id = {placeholder}"
+        self.update_sql = f"UPDATE {BENCH_TABLE} SET counter = counter + 1 WHERE id = {placeholder}"
+        self.insert_sql = f"INSERT INTO {BENCH_INSERT_TABLE} (id, payload) VALUES ({placeholder}, {placeholder})"
+
+    def next_operation(self, rng):
+        """Returns ('execute', sql, params) or ('bulk', rows) for the next operation."""
+        if self.name == 'select1':
+            return 'execute', 'SELECT 1', ()
+        if self.name == 'point_lookup':
+            return 'execute', self.lookup_sql, (rng.randint(1, BENCH_ROWS),)
+        if self.name == 'bulk_insert':
+            start = rng.randint(1, 2 ** 30)
+            return 'bulk', [(start + i, 'x' * 32) for i in range(BULK_INSERT_BATCH)]
+        # mixed: 80% point lookups, 20% single row updates.
+        if rng.random() < 0.8:
+            return 'execute', self.lookup_sql, (rng.randint(1, BENCH_ROWS),)
+        return 'execute', self.update_sql, (rng.randint(1, BENCH_ROWS),)
+
+
+class BenchmarkManager:
+    def __init__(self, duration=2.0, warmup=0.2):
+        # Seconds each (connection type, workload, concurrency) cell runs for, after a short warmup.
+        self.duration = duration
+        self.warmup = warmup
+
+    def run(self, config_file_path, workloads=WORKLOADS, concurrency_levels=(1, 4, 16), connection_types=None,
+            json_path=None):
+        """Runs every workload for every connection type and concurrency level, printing a results table."""
+        dbconfig = default_config_loader.load(config_file_path)
+        supported = CONNECTION_TYPES[dbconfig.database_type]
+        connection_types = connection_types or supported
+        for connection_type in connection_types:
+            if connection_type not in supported:
+                raise ValueError(f"Unsupported connection type for {dbconfig.database_type}: {connection_type}")
+        for workload in workloads:
+            if workload not in WORKLOADS:
+                raise ValueError(f"Unknown workload: {workload}. Available workloads: {', '.join(WORKLOADS)}")
+
+        self.setup_tables(dbconfig)
+        results = []
+        try:
+            for connection_type in connection_types:
+                variant = self.config_variant(dbconfig, connection_type)
+                for workload in workloads:
+                    for concurrency in concurrency_levels:
+                        result = self.run_cell(variant, BenchmarkWorkload(workload, dbconfig.database_type),
+                                               concurrency)
+                        self.print_result(result, header=not results)
+                        results.append(result)
+        finally:
+            self.drop_tables(dbconfig)
+
+        if json_path:
+            report = {
+                'dblinker_version': __version__,
+                'python_version': platform.python_version(),
+                'platform': platform.platform(),
+                'config': dbconfig.path,
+                'database_type': dbconfig.database_type,
+                'duration_seconds': self.duration,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'results': results,
+            }
+            with open(json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {json_path}")
+        return results
+
+    @staticmethod
+    def config_variant(dbconfig, connection_type):
+        """Returns a copy of the config using another connection type, without BENCH_EXCLUDED_SECTIONS."""
+        data = dbconfig.as_dict()
+        sections = data[dbconfig.database_type]
+        sections['connection_type'] = connection_type
+        for name in BENCH_EXCLUDED_SECTIONS:
+            sections.pop(name, None)
+        return DBConfig.from_dict(data, dbconfig.path)
+
+    @staticmethod
+    def build_connection(dbconfig):
+        if dbconfig.database_type == 'sqlite':
+            return SQLiteConnectionFactory(dbconfig).get_connection()
+        return PostgresConnectionFactory(dbconfig).get_connection()
+
+    def setup_tables(self, dbconfig):
+        """Creates and fills the lookup table and creates the insert target."""
+        connection = self.build_connection(self.config_variant(dbconfig, 'normal'))
+        integer_key = 'bigint' if dbconfig.database_type == 'postgresql' else 'INTEGER'
+        connection.connect()
+        try:
+            for table in (BENCH_TABLE, BENCH_INSERT_TABLE):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"CREATE TABLE {BENCH_TABLE} (id {integer_key} PRIMARY KEY, payload text, "
+                               f"counter integer DEFAULT 0)")
+            connection.execute(f"CREATE TABLE {BENCH_INSERT_TABLE} (id {integer_key}, payload text)")
+            rows = [(i, f'payload-{i}') for i in range(1, BENCH_ROWS + 1)]
+            if dbconfig.database_type == 'postgresql':
+                connection.bulk_load(BENCH_TABLE, ['id', 'payload'], rows=rows)
+                connection.execute(f"ANALYZE {BENCH_TABLE}")
+            else:
+                connection.executemany(f"INSERT INTO {BENCH_TABLE} (id, payload) VALUES (?, ?)", rows)
+        finally:
+            connection.disconnect()
+
+    def drop_tables(self, dbconfig):
+        connection = self.build_connection(self.config_variant(dbconfig, 'normal'))
+        connection.connect()
+        try:
+            for table in (BENCH_TABLE, BENCH_INSERT_TABLE):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+        finally:
+            connection.disconnect()
+
+    def run_cell(self, dbconfig, workload, concurrency):
+        """Benchmarks one workload at one concurrency level, returning a result dictionary."""
+        histogram = LatencyHistogram(BENCH_LATENCY_BUCKETS)
+        # [error count, first error message]
+        errors = [0, None]
+        if dbconfig.connection_type in ('async', 'async_pool'):
+            elapsed = asyncio.run(self._run_async(dbconfig, workload, concurrency, histogram, errors))
+        else:
+            elapsed = self._run_sync(dbconfig, workload, concurrency, histogram, errors)
+        snapshot = histogram.snapshot()
+        operations = snapshot['count']
+        return {
+            'connection_type': dbconfig.connection_type,
+            'workload': workload.name,
+            'concurrency': concurrency,
+            'operations': operations,
+            'errors': errors[0],
+            'elapsed_seconds': round(elapsed, 4),
+            'throughput_ops': round(operations / elapsed, 1) if elapsed > 0 else 0.0,
+            'p50_ms': round(snapshot['p50'] * 1000, 3),
+            'p95_ms': round(snapshot['p95'] * 1000, 3),
+            'p99_ms': round(snapshot['p99'] * 1000, 3),
+            'max_ms': round(snapshot['max'] * 1000, 3),
+            'first_error': errors[1],
+        }
+
+    @staticmethod
+    def record_error(errors, error):
+        errors[0] += 1
+        if errors[1] is None:
+            errors[1] = f"{type(error).__name__}: {error}"
+
+    def _run_sync(self, dbconfig, workload, concurrency, histogram, errors):
+        shared = dbconfig.connection_type == 'pool'
+        if shared:
+            connections = [self.build_connection(dbconfig)] * concurrency
+            connections[0].connect()
+            pool = getattr(connections[0], 'pool', None)
+            if pool is not None:
+                # Let the pool reach min_size before measuring, opening connections is not what is being timed.
+                pool.wait()
+        else:
+            # A normal connection can't be shared between threads, every worker opens its own in its thread.
+            connections = [self.build_connection(dbconfig) for _ in range(concurrency)]
+        lock = threading.Lock()
+        window = {}
+
+        def start_clock():
+            # Runs once every worker is connected, so connecting is not part of the measured window.
+            window['measure_from'] = time.perf_counter() + self.warmup
+            window['deadline'] = window['measure_from'] + self.duration
+
+        barrier = threading.Barrier(concurrency, action=start_clock)
+        connect_errors = []
+
+        def worker(index):
+            connection = connections[index]
+            try:
+                if not shared:
+                    connection.connect()
+            except Exception as e:
+                connect_errors.append(e)
+                barrier.abort()
+                raise
+            try:
+                barrier.wait()
+                measure_from, deadline = window['measure_from'], window['deadline']
+                rng = random.Random(index)
+                while True:
+                    operation = workload.next_operation(rng)
+                    op_start = time.perf_counter()
+                    if op_start >= deadline:
+                        return
+                    try:
+                        if operation[0] == 'bulk':
+                            self.bulk_insert(connection, dbconfig, operation[1])
+                        else:
+                            connection.execute(operation[1], operation[2])
+                    except Exception as e:
+                        with lock:
+                            self.record_error(errors, e)
+                        continue
+                    if op_start >= measure_from:
+                        histogram.observe(time.perf_counter() - op_start)
+            finally:
+                # SQLite connections can only be closed by the thread that opened them.
+                if not shared:
+                    connection.disconnect()
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(worker, range(concurrency)))
+        except threading.BrokenBarrierError:
+            # Results come back in worker order, a worker that connected reports the broken barrier
+            # before the one whose connect failed and broke it.
+            if connect_errors:
+                raise connect_errors[0] from None
+            raise
+        finally:
+            if shared:
+                connections[0].disconnect()
+        return min(time.perf_counter(), window['deadline']) - window['measure_from']
+
+    async def _run_async(self, dbconfig, workload, concurrency, histogram, errors):
+        shared = dbconfig.connection_type == 'async_pool'
+        if shared:
+            connections = [self.build_connection(dbconfig)] * concurrency
+            await connections[0].connect()
+            if getattr(connections[0], 'pool', None) is not None:
+                # Postgres pools open their connections in the background, start measuring once they are up.
+                await connections[0].pool.wait()
+        else:
+            connections = [self.build_connection(dbconfig) for _ in range(concurrency)]
+            for connection in connections:
+                await connection.connect()
+        start = time.perf_counter()
+        measure_from = start + self.warmup
+        deadline = measure_from + self.duration
+
+        async def worker(index):
+            connection = connections[index]
+            rng = random.Random(index)
+            while True:
+                operation = workload.next_operation(rng)
+                op_start = time.perf_counter()
+                if op_start >= deadline:
+                    return
+                try:
+                    if operation[0] == 'bulk':
+                        await self.bulk_insert_async(connection, dbconfig, operation[1])
+                    else:
+                        await connection.execute(operation[1], operation[2])
+                except Exception as e:
+                    self.record_error(errors, e)
+                    continue
+                if op_start >= measure_from:
+                    histogram.observe(time.perf_counter() - op_start)
+
+        try:
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        finally:
+            for connection in (connections[:1] if shared else connections):
+                await connection.disconnect()
+        return min(time.perf_counter(), deadline) - measure_from
+
+    @staticmethod
+    def bulk_insert(connection, dbconfig, rows):
+        # COPY for Postgres, one executemany transaction for SQLite, the fastest path each offers.
+        if dbconfig.database_type == 'postgresql':
+            connection.bulk_load(BENCH_INSERT_TABLE, ['id', 'payload'], rows=rows)
+        else:
+            connection.executemany(f"INSERT INTO {BENCH_INSERT_TABLE} (id, payload) VALUES (?, ?)", rows)
+
+    @staticmethod
+    async def bulk_insert_async(connection, dbconfig, rows):
+        if dbconfig.database_type == 'postgresql':
+            await connection.bulk_load(BENCH_INSERT_TABLE, ['id', 'payload'], rows=rows)
+        else:
+            await connection.executemany(f"INSERT INTO {BENCH_INSERT_TABLE} (id, payload) VALUES (?, ?)", rows)
+
+    @staticmethod
+    def print_result(result, header=False):
+        if header:
+            print(f"{'type':<12}{'workload':<14}{'conc':>5}{'ops':>9}{'ops/s':>11}{'p50 ms':>9}{'p95 ms':>9}"
+                  f"{'p99 ms':>9}{'errors':>8}")
+        print(f"{result['connection_type']:<12}{result['workload']:<14}{result['concurrency']:>5}"
+              f"{result['operations']:>9}{result['throughput_ops']:>11,.0f}{result['p50_ms']:>9.3f}"
+              f"{result['p95_ms']:>9.3f}{result['p99_ms']:>9.3f}{result['errors']:>8}")
+        if result['first_error']:
+            print(f"    first error: {result['first_error']}")
@@ -0,0 +1,38 @@
+import asyncio
+import time
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.connections.pool_registry import PoolRegistry
+from dblinker.managers.dbconnection_manager import DBConnectionManager
+
+
+class BulkLoadManager:
+    def __init__(self):
+        # A private registry, so pools opened for a one-off load are closed once it is done.
+        self.pool_registry = PoolRegistry()
+        self.dbconnection_manager = DBConnectionManager(pool_registry=self.pool_registry)
+
+    def load(self, config_file_path, table, source_file, columns=None, file_format='csv', header=False):
+        """Loads a csv, text or binary COPY file into a table using the connection described by a config file."""
+        dbconfig = default_config_loader.load(config_file_path)
+        if dbconfig.database_type != 'postgresql':
+            raise ValueError(f"Bulk loading is only supported for postgresql configs, not {dbconfig.database_type}.")
+
+        start = time.perf_counter()
+        row_count = asyncio.run(self._load(config_file_path, dbconfig, table, source_file, columns, file_format,
+                                           header))
+        elapsed = time.perf_counter() - start
+        rate = row_count / elapsed if elapsed > 0 else 0
+        print(f"Loaded {row_count} rows into {table} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return row_count
+
+    async def _load(self, config_file_path, dbconfig, table, source_file, columns, file_format, header):
+        connection = await self.dbconnection_manager.get_database_connection(config_file_path)
+        try:
+            if dbconfig.connection_type in ['normal', 'pool', 'routing']:
+                return connection.bulk_load(table, columns, source_file=source_file, file_format=file_format,
+                                            header=header)
+            return await connection.bulk_load(table, columns, source_file=source_file, file_format=file_format,
+                                              header=header)
+        finally:
+            await self.dbconnection_manager.close_connection(connection)
+            await self.pool_registry.aclose_all()
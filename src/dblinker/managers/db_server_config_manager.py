@@ -1,27 +1,30 @@
-import yaml
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.serversettings.host_profile import HostProfile
 from dblinker.serversettings.postgres_server_config_generator import PostgresServerConfigGenerator
 
 class DBServerConfigManager:
     def __init__(self):
         pass
 
-    def get_server_config(self, config_file_path):
+    def get_server_config(self, config_file_path, ram=None, cpus=None, storage=None, config_dir=None, instances=1):
         # Need to detect the database type from the config file.
-        with open(config_file_path, 'r') as f:
-            config_data_dictionary = yaml.safe_load(f)
-        database_type = next(iter(config_data_dictionary))
+        database_type = default_config_loader.load(config_file_path).database_type
 
         if database_type == 'postgresql':
             #print("postgres detected")
-            self.get_postgres_server_config(config_file_path)
+            self.get_postgres_server_config(config_file_path, ram, cpus, storage, config_dir, instances)
         elif database_type == 'sqlite':
             #print("sqlite detected")
             pass
         else:
             raise ValueError(f"Unsupported database type: {database_type}")
 
-    def get_postgres_server_config(self, config_file_path):
-        postgresconfiggenerator = PostgresServerConfigGenerator(config_file_path)
+    def get_postgres_server_config(self, config_file_path, ram=None, cpus=None, storage=None, config_dir=None,
+                                   instances=1):
+        # Values not given are detected on this machine, so run it on the database server or pass them.
+        host_profile = HostProfile.from_options(ram=ram, cpus=cpus, storage=storage)
+        postgresconfiggenerator = PostgresServerConfigGenerator(config_file_path, host_profile=host_profile,
+                                                                config_dir=config_dir, instances=instances)
         postgresconfiggenerator.generate_pg_hba_entry()
         postgresconfiggenerator.generate_pg_hba_entry()
         postgresconfiggenerator.print_configurations()
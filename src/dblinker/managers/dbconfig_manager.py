@@ -1,10 +1,9 @@
 from pathlib import Path
 import yaml
 from importlib import resources
-from tests.database_integration_test import DatabaseIntegrationTest
-import asyncio
 from .settings_manager import SettingsManager
 from dblinker.common.utils.pathutils import PathUtils
+from dblinker.common.config.config_loader import default_config_loader
 
 
 class DBConfigManager:
@@ -57,18 +56,18 @@ class DBConfigManager:
     def test_connection(self, config_file_path):
         """Test database connection using a configuration file."""
 
-        # Step 1: Determine the database type.
-        with open(config_file_path, 'r') as config_file:
-            config_data = yaml.safe_load(config_file)
-        database_type = next(iter(config_data))
+        # Step 1: Determine the database type, the parsed config is cached for the steps that follow.
+        database_type = default_config_loader.load(config_file_path).database_type
         print(f"{database_type} database config file has been detected...")
 
-        # Step 2:
+        # Step 2: The integration tester pulls in the database drivers, so it is imported only when needed.
+        import asyncio
+        from tests.database_integration_test import DatabaseIntegrationTest
         integration_tester = DatabaseIntegrationTest()
 
         if database_type == 'postgresql':
             asyncio.run(integration_tester.test_postgresql_connection(config_file_path))
         elif database_type == 'sqlite':
-            integration_tester.test_sqlite_connection(config_file_path)
+            asyncio.run(integration_tester.test_sqlite_connection(config_file_path))
         else:
             print(f"Unsupported database type: {database_type}")
@@ -1,43 +1,71 @@
-import yaml
+import inspect
+from dblinker.common.config.config_loader import DBConfig, default_config_loader
 from dblinker.connections.postgres.postgres_connection_factory import PostgresConnectionFactory
+from dblinker.connections.sqlite.sqlite_connection_factory import SQLiteConnectionFactory
+from dblinker.connections.pool_registry import default_pool_registry
 
 
 class DBConnectionManager:
-    def __init__(self):
-        pass
+    def __init__(self, pool_registry=None, config_loader=None):
+        # Pool connection types are shared through the registry instead of being rebuilt per call.
+        self.pool_registry = pool_registry if pool_registry is not None else default_pool_registry
+        # Config files are parsed once and served from the loader's cache afterwards.
+        self.config_loader = config_loader if config_loader is not None else default_config_loader
 
     async def get_database_connection(self, config_file_path):
         """Establish a database connection using a configuration file."""
-        with open(config_file_path, 'r') as f:
-            config_data_dictionary = yaml.safe_load(f)
-        database_type = next(iter(config_data_dictionary))
-
-        if database_type == 'postgresql':
-            return await self.get_postgresql_connection(config_data_dictionary)
-        elif database_type == 'sqlite':
-            return self.get_sqlite_connection(config_data_dictionary)
+        dbconfig = self.config_loader.load(config_file_path)
+
+        if dbconfig.database_type == 'postgresql':
+            return await self.get_postgresql_connection(dbconfig)
+        elif dbconfig.database_type == 'sqlite':
+            return await self.get_sqlite_connection(dbconfig)
         else:
-            raise ValueError(f"Unsupported database type: {database_type}")
+            raise ValueError(f"Unsupported database type: {dbconfig.database_type}")
 
-    async def get_postgresql_connection(self, config_data_dictionary):
+    async def get_postgresql_connection(self, dbconfig):
         """Create and return PostgreSQL connection based on the configuration."""
-        factory = PostgresConnectionFactory(config_data_dictionary)
+        if not isinstance(dbconfig, DBConfig):
+            dbconfig = DBConfig.from_dict(dbconfig)
+        connection_type = dbconfig.connection_type
+        if connection_type in ('pool', 'routing'):
+            return self.pool_registry.get_pool(dbconfig)
+        elif connection_type in ('async_pool', 'sharded'):
+            return await self.pool_registry.get_async_pool(dbconfig)
+
+        factory = PostgresConnectionFactory(dbconfig)
         connection = factory.get_connection()
         #print(connection.__dict__)
 
-        if config_data_dictionary['postgresql']['connection_type'] in ['normal', 'pool']:
+        if connection_type == 'normal':
             connection.connect()
             return connection
-        elif config_data_dictionary['postgresql']['connection_type'] in ['async', 'async_pool']:
+        elif connection_type == 'async':
             await connection.connect()
             #print(connection.__dict__)
             return connection
 
-    def get_sqlite_connection(self, config_data_dictionary):
-        """Create and return SQLite connection based on the connection settings."""
-        # SQLite connection logic here, such as creating a connection object
-        print("Establishing SQLite connection...")
-        # Assuming a simple SQLite connection
-        import sqlite3
-        connection = sqlite3.connect(config_data_dictionary['database'])
+    async def get_sqlite_connection(self, dbconfig):
+        """Create and return SQLite connection based on the configuration."""
+        if not isinstance(dbconfig, DBConfig):
+            dbconfig = DBConfig.from_dict(dbconfig)
+        connection_type = dbconfig.connection_type
+        if connection_type == 'pool':
+            return self.pool_registry.get_pool(dbconfig)
+        elif connection_type == 'async_pool':
+            return await self.pool_registry.get_async_pool(dbconfig)
+
+        connection = SQLiteConnectionFactory(dbconfig).get_connection()
+        if connection_type == 'normal':
+            connection.connect()
+        elif connection_type == 'async':
+            await connection.connect()
         return connection
+
+    async def close_connection(self, connection):
+        """Closes a connection returned by get_database_connection, shared pools are left to the registry."""
+        if getattr(connection, 'registry_managed', False):
+            return
+        result = connection.disconnect()
+        if inspect.isawaitable(result):
+            await result
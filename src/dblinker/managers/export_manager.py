@@ -0,0 +1,56 @@
+import asyncio
+from psycopg import sql
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.connections.pool_registry import PoolRegistry
+from dblinker.managers.dbconnection_manager import DBConnectionManager
+
+MB = 1024 * 1024
+
+
+class ExportManager:
+    def __init__(self):
+        # A private registry, so pools opened for a one-off export are closed once it is done.
+        self.pool_registry = PoolRegistry()
+        self.dbconnection_manager = DBConnectionManager(pool_registry=self.pool_registry)
+
+    def export(self, config_file_path, output, query=None, table=None, file_format='csv', compression=None,
+               max_size=None, level=None, header=False):
+        """Exports a query or a whole table into files using COPY TO STDOUT, returning the export summary."""
+        if (query is None) == (table is None):
+            raise ValueError("Pass either a query or a table to export.")
+        dbconfig = default_config_loader.load(config_file_path)
+        if dbconfig.database_type != 'postgresql':
+            raise ValueError(f"Exports are only supported for postgresql configs, not {dbconfig.database_type}.")
+        if dbconfig.connection_type == 'sharded':
+            raise ValueError("Exports are not supported by the 'sharded' connection type, export each shard's config.")
+        if table is not None:
+            query = sql.SQL("SELECT * FROM {table}").format(table=sql.Identifier(*table.split('.')))
+        summary = asyncio.run(self._export(config_file_path, dbconfig, query, output, file_format, compression,
+                                           max_size, level, header))
+        self.print_summary(summary)
+        return summary
+
+    async def _export(self, config_file_path, dbconfig, query, output, file_format, compression, max_size, level,
+                      header):
+        connection = await self.dbconnection_manager.get_database_connection(config_file_path)
+        try:
+            if dbconfig.connection_type in ['normal', 'pool', 'routing']:
+                return connection.export(query, output, file_format=file_format, compression=compression,
+                                         max_size=max_size, level=level, header=header)
+            return await connection.export(query, output, file_format=file_format, compression=compression,
+                                           max_size=max_size, level=level, header=header)
+        finally:
+            await self.dbconnection_manager.close_connection(connection)
+            await self.pool_registry.aclose_all()
+
+    @staticmethod
+    def print_summary(summary):
+        for f in summary['files']:
+            print(f"  {f['path']}  {f['rows']:>12,} rows  {f['bytes'] / MB:>10.1f} MB")
+        seconds = summary['seconds']
+        rate = summary['rows'] / seconds if seconds > 0 else 0
+        throughput = summary['raw_bytes'] / MB / seconds if seconds > 0 else 0
+        ratio = summary['raw_bytes'] / summary['bytes'] if summary['bytes'] else 0
+        print(f"Exported {summary['rows']:,} rows into {len(summary['files'])} files in {seconds:.2f}s "
+              f"({rate:,.0f} rows/s, {throughput:,.1f} MB/s of COPY data, "
+              f"{summary['bytes'] / MB:,.1f} MB written, {ratio:.1f}x compression)")
@@ -0,0 +1,250 @@
+import asyncio
+import csv
+import functools
+import glob
+import json
+import os
+import sqlite3
+import ssl
+import struct
+import sys
+import time
+from pathlib import Path
+from dblinker.common.config.config_loader import default_config_loader, make_conninfo
+
+# Seconds a single target may take, covering TCP, TLS, authentication and the round-trip probes.
+DEFAULT_PROBE_TIMEOUT = 5.0
+# Targets probed at the same time, this bounds open sockets rather than speed.
+DEFAULT_PROBE_CONCURRENCY = 64
+# SELECT 1 round-trips per target, the fastest one is reported as the RTT.
+RTT_SAMPLES = 3
+# The PostgreSQL SSLRequest message: length 8 followed by the magic request code.
+SSL_REQUEST = struct.pack('!ii', 8, 80877103)
+REPORT_COLUMNS = ('config', 'connection_name', 'database_type', 'target', 'role', 'status', 'tcp_ms', 'tls_ms',
+                  'connect_ms', 'rtt_ms', 'ssl', 'server_version', 'error')
+
+
+def resolve_config_paths(target):
+    """Expands a config file, a directory of configs or a glob pattern into a sorted list of files."""
+    path = Path(target).expanduser()
+    if path.is_dir():
+        return sorted(p for pattern in ('*.yaml', '*.yml') for p in path.glob(pattern) if p.is_file())
+    if path.is_file():
+        return [path]
+    if glob.has_magic(str(target)):
+        return sorted(Path(p) for p in glob.glob(os.path.expanduser(str(target))) if os.path.isfile(p))
+    raise ValueError(f"No configuration file, directory or glob matches: {target}")
+
+
+def postgres_targets(dbconfig):
+    """Yields (role, connection_settings, conninfo) for every server a loaded PostgreSQL config connects to.
+
+    role is None for single server configs, 'primary' or 'replica' for routing configs and 'shard <name>'
+    for sharded ones, whose shard configs are loaded the way the connection factory loads them.
+    """
+    connection_type = dbconfig.connection_type
+    if connection_type == 'sharded':
+        for shard in dbconfig.shards:
+            role = f"shard {shard['name']}"
+            if 'config' in shard:
+                shard_config = default_config_loader.load(shard['config'])
+                yield role, shard_config.connection_settings, shard_config.conninfo
+            else:
+                settings = {k: v for k, v in shard.items() if k != 'name'}
+                yield role, settings, make_conninfo({k: v for k, v in settings.items() if v not in (None, '')})
+    elif connection_type == 'routing':
+        yield 'primary', dbconfig.connection_settings, dbconfig.conninfo
+        for replica in dbconfig.replicas:
+            yield 'replica', replica, make_conninfo({k: v for k, v in replica.items() if v not in (None, '')})
+    else:
+        yield None, dbconfig.connection_settings, dbconfig.conninfo
+
+
+class _ProbeProtocol(asyncio.Protocol):
+    """Just enough of a protocol to read the server's one byte answer to an SSLRequest."""
+
+    def __init__(self):
+        self.first_byte = asyncio.get_running_loop().create_future()
+
+    def data_received(self, data):
+        if not self.first_byte.done():
+            self.first_byte.set_result(data[:1])
+
+    def connection_lost(self, exc):
+        # A closed connection reads as an empty answer, the libpq connect that follows reports the real error.
+        if not self.first_byte.done():
+            self.first_byte.set_result(b'')
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+class HealthCheckManager:
+    """Probes many dbconfig targets concurrently on one event loop, with one short-lived connection each.
+
+    Every server a config connects to is a target of its own: the primary and each replica of a routing
+    config, and each shard of a sharded one.
+    """
+
+    def __init__(self, timeout=DEFAULT_PROBE_TIMEOUT, concurrency=DEFAULT_PROBE_CONCURRENCY):
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    def check(self, target, output_format='table', output=None):
+        """Probes every config matched by target and prints a report, returning the number of failures."""
+        paths = resolve_config_paths(target)
+        results = asyncio.run(self.probe_all(paths))
+        self.print_report(results, output_format, output or sys.stdout)
+        return sum(1 for result in results if result['status'] != 'ok')
+
+    async def probe_all(self, paths):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(result, probe):
+            async with semaphore:
+                return await self.run_probe(result, probe)
+
+        return await asyncio.gather(*(bounded(result, probe) for path in paths
+                                      for result, probe in self.plan_probes(path)))
+
+    def plan_probes(self, path):
+        """Returns (result, probe) per target of a config, probe is None when the config could not be read."""
+        result = dict.fromkeys(REPORT_COLUMNS)
+        result['config'] = str(path)
+        try:
+            dbconfig = default_config_loader.load(path)
+            result['connection_name'] = dbconfig.connection_name
+            result['database_type'] = dbconfig.database_type
+            if dbconfig.database_type != 'postgresql':
+                return [(result, functools.partial(self.probe_sqlite, dbconfig, result))]
+            targets = list(postgres_targets(dbconfig))
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}".strip()
+            return [(result, None)]
+        plans = []
+        for role, settings, conninfo in targets:
+            target_result = dict(result, role=role)
+            plans.append((target_result, functools.partial(self.probe_postgresql, settings, conninfo,
+                                                           target_result)))
+        return plans
+
+    async def run_probe(self, result, probe):
+        if probe is None:
+            return result
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            result['status'] = 'ok'
+        except asyncio.TimeoutError:
+            result['status'] = 'timeout'
+            result['error'] = f"No answer within {self.timeout} seconds"
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}".strip()
+        return result
+
+    async def probe_postgresql(self, settings, conninfo, result):
+        # psycopg is only needed once a Postgres target is actually probed.
+        import psycopg
+
+        host = str(settings.get('host') or 'localhost')
+        port = int(settings.get('port') or 5432)
+        result['target'] = f"{host}:{port}"
+
+        # TCP (or unix socket) connect on its own, then the TLS handshake on its own. libpq does both again
+        # during the real connect below, which adds authentication, so the three columns can be compared.
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if host.startswith('/'):
+            transport, protocol = await loop.create_unix_connection(_ProbeProtocol,
+                                                                    os.path.join(host, f".s.PGSQL.{port}"))
+        else:
+            transport, protocol = await loop.create_connection(_ProbeProtocol, host, port)
+        result['tcp_ms'] = elapsed_ms(start)
+        try:
+            # libpq never negotiates SSL over a unix socket.
+            if settings.get('sslmode', 'prefer') != 'disable' and not host.startswith('/'):
+                transport, result['tls_ms'] = await self.time_tls_handshake(transport, protocol, host)
+        finally:
+            transport.close()
+
+        start = time.perf_counter()
+        connection = await psycopg.AsyncConnection.connect(conninfo, autocommit=True)
+        result['connect_ms'] = elapsed_ms(start)
+        try:
+            result['ssl'] = 'yes' if connection.pgconn.ssl_in_use else 'no'
+            result['server_version'] = connection.info.server_version
+            samples = []
+            for _ in range(RTT_SAMPLES):
+                start = time.perf_counter()
+                await connection.execute('SELECT 1')
+                samples.append(elapsed_ms(start))
+            result['rtt_ms'] = min(samples)
+        finally:
+            await connection.close()
+
+    @staticmethod
+    async def time_tls_handshake(transport, protocol, host):
+        """Sends an SSLRequest and times the TLS handshake, the time is None when the server declines SSL."""
+        start = time.perf_counter()
+        transport.write(SSL_REQUEST)
+        answer = await protocol.first_byte
+        if answer != b'S':
+            return transport, None
+        # Only the handshake is timed here, certificate verification is left to libpq's sslmode.
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        loop = asyncio.get_running_loop()
+        transport = await loop.start_tls(transport, protocol, context, server_hostname=host)
+        return transport, elapsed_ms(start)
+
+    async def probe_sqlite(self, dbconfig, result):
+        database = dbconfig.sections.get('file_location')
+        if not database:
+            raise ValueError("Missing 'file_location' in the SQLite config.")
+        result['target'] = str(database)
+        result['ssl'] = 'n/a'
+        loop = asyncio.get_running_loop()
+        # sqlite3 blocks, run it on the default executor so other probes keep going.
+        await loop.run_in_executor(None, self._probe_sqlite_file, str(Path(database).expanduser()), result)
+
+    @staticmethod
+    def _probe_sqlite_file(database, result):
+        start = time.perf_counter()
+        # Read-only, so probing a missing path reports an error instead of creating an empty database.
+        connection = sqlite3.connect(f"{Path(database).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            connection.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            result['connect_ms'] = elapsed_ms(start)
+            result['server_version'] = sqlite3.sqlite_version
+            start = time.perf_counter()
+            connection.execute('SELECT 1').fetchone()
+            result['rtt_ms'] = elapsed_ms(start)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def print_report(results, output_format, output):
+        if output_format == 'json':
+            json.dump(results, output, indent=2, default=str)
+            output.write('\n')
+        elif output_format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            def cell(value):
+                return '-' if value is None else str(value)
+
+            columns = ('connection_name', 'target', 'role', 'status', 'tcp_ms', 'tls_ms', 'connect_ms', 'rtt_ms', 'ssl')
+            rows = [[cell(result[column]) for column in columns] for result in results]
+            widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+            output.write('  '.join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + '\n')
+            for row, result in zip(rows, results):
+                output.write('  '.join(v.ljust(w) for v, w in zip(row, widths)).rstrip() + '\n')
+                if result['error']:
+                    output.write(f"    {result['config']}: {result['error']}\n")
+            failures = sum(1 for result in results if result['status'] != 'ok')
+            output.write(f"{len(results) - failures}/{len(results)} targets healthy\n")
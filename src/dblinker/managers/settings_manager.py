@@ -1,5 +1,6 @@
 import yaml
 from pathlib import Path
+from dblinker.common.utils.pathutils import PathUtils
 
 
 class SettingsManager:
@@ -18,5 +19,10 @@ class SettingsManager:
         with open(self.settings_file, "r") as file:
             return yaml.safe_load(file)
 
+    def connection_config_dir(self):
+        """The directory of named connection configs from appConnectionConfigDir, None when it isn't set."""
+        path_elements = self.settings.get('appConnectionConfigDir')
+        return PathUtils.construct_path(path_elements) if path_elements else None
+
     def print_hello_world(self):
         print(f"{self.package_name} says \"Hello World\" - This is a place holder for the settings cli class.")
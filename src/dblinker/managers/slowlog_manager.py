@@ -0,0 +1,78 @@
+import json
+import math
+from pathlib import Path
+
+SLOWLOG_SORT_KEYS = ('total', 'mean', 'p99', 'count')
+
+
+class SlowLogManager:
+    """Summarizes slow query log files by statement fingerprint."""
+
+    @staticmethod
+    def read_entries(path):
+        """Yields the entries of a log file, lines cut short by a crash mid-write are skipped."""
+        with open(Path(path).expanduser(), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'query_id' in entry and 'ms' in entry:
+                    yield entry
+
+    def summarize(self, paths, slow_only=False, connection=None, sort='total'):
+        """Groups entries by query_id, returning one dict per fingerprint sorted by sort, largest first.
+
+        Sampled entries are included unless slow_only is set, they show how often a statement that is
+        usually fast runs, at the rate given by sample_percent.
+        """
+        if sort not in SLOWLOG_SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {sort}. Supported keys are: {', '.join(SLOWLOG_SORT_KEYS)}")
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        groups = {}
+        for path in paths:
+            for entry in self.read_entries(path):
+                if (slow_only and not entry.get('slow')) or (connection and entry.get('connection') != connection):
+                    continue
+                group = groups.get(entry['query_id'])
+                if group is None:
+                    group = groups[entry['query_id']] = {'query_id': entry['query_id'],
+                                                         'fingerprint': entry.get('fingerprint'), 'times': [],
+                                                         'slow': 0, 'errors': 0, 'plan': None, 'plan_ts': None}
+                group['times'].append(float(entry['ms']))
+                group['slow'] += bool(entry.get('slow'))
+                group['errors'] += 'error' in entry
+                if 'plan' in entry and (group['plan_ts'] is None or entry.get('ts', 0) >= group['plan_ts']):
+                    # The most recent plan, earlier ones may predate an index or a change in the data.
+                    group['plan'], group['plan_ts'] = entry['plan'], entry.get('ts', 0)
+        summary = [self._stats(group) for group in groups.values()]
+        summary.sort(key=lambda row: row[sort], reverse=True)
+        return summary
+
+    @staticmethod
+    def _stats(group):
+        times = sorted(group.pop('times'))
+        count = len(times)
+        group.pop('plan_ts')
+        # Nearest-rank percentile, an actual logged duration rather than an interpolation.
+        group.update({'count': count, 'total': sum(times), 'mean': sum(times) / count,
+                      'p99': times[max(math.ceil(count * 0.99) - 1, 0)], 'max': times[-1]})
+        return group
+
+    @staticmethod
+    def print_summary(summary, limit=20, show_plans=False):
+        print(f"  {'query_id':<16}  {'count':>8}  {'slow':>6}  {'total ms':>12}  {'mean ms':>10}  {'p99 ms':>10}  "
+              f"fingerprint")
+        for row in summary[:limit]:
+            fingerprint = row['fingerprint'] or ''
+            if len(fingerprint) > 100:
+                fingerprint = fingerprint[:97] + '...'
+            errors = f"  ({row['errors']} errors)" if row['errors'] else ''
+            print(f"  {row['query_id']:<16}  {row['count']:>8,}  {row['slow']:>6,}  {row['total']:>12,.1f}  "
+                  f"{row['mean']:>10,.1f}  {row['p99']:>10,.1f}  {fingerprint}{errors}")
+            if show_plans and row['plan'] is not None:
+                print('\n'.join('      ' + line for line in json.dumps(row['plan'], indent=2).splitlines()))
+        total = sum(row['total'] for row in summary)
+        print(f"{len(summary)} statement fingerprints, {sum(row['count'] for row in summary):,} entries, "
+              f"{total / 1000:,.1f}s in total")
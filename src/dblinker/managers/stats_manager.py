@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.connections.pool_registry import PoolRegistry
+from dblinker.managers.dbconnection_manager import DBConnectionManager
+
+
+class StatsManager:
+    def __init__(self):
+        # A private registry, so the pool exercised for the report is closed afterwards.
+        self.pool_registry = PoolRegistry()
+        self.dbconnection_manager = DBConnectionManager(pool_registry=self.pool_registry)
+
+    def print_stats(self, config_file_path, query='SELECT 1', count=100, concurrency=4, output_format='text'):
+        """Runs query count times through the configured connection type and prints the collected metrics."""
+        dbconfig = default_config_loader.load(config_file_path)
+        metrics, snapshot, elapsed = asyncio.run(self._collect(config_file_path, query, count, concurrency))
+        if output_format == 'json':
+            print(metrics.to_json(snapshot=snapshot))
+        elif output_format == 'prometheus':
+            print(metrics.to_prometheus(snapshot=snapshot), end='')
+        else:
+            self.print_text_report(dbconfig, snapshot, count, elapsed)
+        return metrics
+
+    async def _collect(self, config_file_path, query, count, concurrency):
+        dbconfig = default_config_loader.load(config_file_path)
+        connection = await self.dbconnection_manager.get_database_connection(config_file_path)
+        try:
+            metrics = connection.metrics or connection.enable_metrics(dbconfig.connection_name)
+            start = time.perf_counter()
+            if dbconfig.connection_type == 'async_pool' and dbconfig.database_type == 'postgresql':
+                await connection.run_many([query] * count, concurrency, return_exceptions=True)
+            elif dbconfig.connection_type in ('async_pool', 'sharded'):
+                # concurrency callers at a time, so concurrent writes show up as shared commits. Sharded
+                # statements without a key run on every shard.
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def run_one():
+                    async with semaphore:
+                        await self._ignore_errors_async(connection.execute(query))
+
+                await asyncio.gather(*(run_one() for _ in range(count)))
+            elif dbconfig.connection_type == 'async':
+                for _ in range(count):
+                    await self._ignore_errors_async(connection.execute(query))
+            elif dbconfig.connection_type == 'pool':
+                # Pools are shared between threads, the thread pool puts concurrent load on the checkout path.
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(lambda _: self._ignore_errors(connection.execute, query), range(count)))
+            else:
+                for _ in range(count):
+                    self._ignore_errors(connection.execute, query)
+            elapsed = time.perf_counter() - start
+            # Taken while the pool is still open, its counters are gone once it is closed below.
+            return metrics, metrics.snapshot(), elapsed
+        finally:
+            await self.dbconnection_manager.close_connection(connection)
+            await self.pool_registry.aclose_all()
+
+    @staticmethod
+    def _ignore_errors(func, *args):
+        # Failures are already counted by the connection's metrics, keep going so they show up in the report.
+        try:
+            return func(*args)
+        except Exception:
+            return None
+
+    @staticmethod
+    async def _ignore_errors_async(coroutine):
+        try:
+            return await coroutine
+        except Exception:
+            return None
+
+    @staticmethod
+    def print_text_report(dbconfig, snapshot, count, elapsed):
+        latency = snapshot['query_latency']
+        wait = snapshot['checkout_wait']
+        failed = sum(snapshot['errors'].values())
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"Connection: {dbconfig.connection_name} ({dbconfig.database_type}, {dbconfig.connection_type})")
+        print(f"Queries: {count - failed} ok, {failed} failed in {elapsed:.2f}s ({rate:,.0f} queries/s)\n")
+        print(f"{'':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+        for label, histogram in (('Query latency', latency), ('Checkout wait', wait)):
+            if histogram['count']:
+                print(f"{label:<16}" + ''.join(f"{histogram[key] * 1000:>10.2f}" for key in ('p50', 'p95', 'p99', 'max')))
+        if snapshot['errors']:
+            print("\nErrors: " + ', '.join(f"{name}={total}" for name, total in sorted(snapshot['errors'].items())))
+        pool = snapshot.get('pool')
+        if pool:
+            print()
+            # Routing and sharded connections report one pool per host or shard.
+            pools = pool.items() if all(isinstance(value, dict) for value in pool.values()) else [(None, pool)]
+            for host, stats in pools:
+                label = f"Pool {host}" if host is not None else "Pool"
+                print(f"{label}: " + ', '.join(f"{name}={value}" for name, value in sorted(stats.items())))
@@ -0,0 +1,253 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from psycopg import connect, sql
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.connections.sqlite.base_connection import merge_pragmas, open_sqlite_connection
+
+# Rows read from the source and written to the target at once.
+TRANSFER_BATCH_SIZE = 5000
+# Batches that may wait between the reader and the writer, this bounds memory whatever the table size.
+TRANSFER_QUEUE_DEPTH = 4
+# Postgres to Postgres transfers pass COPY data through undecoded, in blocks of about this many bytes.
+RAW_BLOCK_SIZE = 1024 * 1024
+# Values sqlite3 stores as they are, anything else (Decimal, datetime, UUID, json) is converted first.
+SQLITE_NATIVE_TYPES = (int, float, str, bytes, type(None))
+# Put on the queue by the reader once the source is exhausted.
+_END = object()
+
+
+class _Stopped(Exception):
+    """Raised in the reader thread when the writer has failed and stopped taking batches."""
+
+
+def sqlite_value(value):
+    """Converts a value read from Postgres into one sqlite3 can bind."""
+    if isinstance(value, SQLITE_NATIVE_TYPES):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    # Dates and times keep the ISO 8601 text SQLite's date functions understand.
+    return str(value)
+
+
+def open_sqlite(dbconfig, read_only=False):
+    """Opens a plain sqlite3 connection with the config's pragmas and connect settings."""
+    database = dbconfig.connection_settings.get('file_location')
+    if not database:
+        raise ValueError("SQLite configs need a 'file_location'.")
+    return open_sqlite_connection(database, merge_pragmas(dbconfig.sections.get('pragmas')), read_only=read_only,
+                                  **dict(dbconfig.sections.get('connect_settings') or {}))
+
+
+def sqlite_identifier(name):
+    return '.'.join('"' + part.replace('"', '""') + '"' for part in name.split('.'))
+
+
+class TransferManager:
+    """Copies tables between sqlite and postgresql configs, in either direction.
+
+    Each table is read by its own thread and written by another, with at most queue_depth batches in
+    between, so reading the source and writing the target overlap. Postgres targets load through COPY FROM
+    STDIN, SQLite targets through batched executemany calls, and either way a table is written in one
+    transaction: a failed transfer leaves the target as it was. Between two Postgres databases the COPY
+    data is passed through without being decoded at all.
+    """
+
+    def __init__(self, batch_size=TRANSFER_BATCH_SIZE, queue_depth=TRANSFER_QUEUE_DEPTH, workers=1):
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.workers = max(workers or 1, 1)
+
+    def transfer(self, source_config_path, target_config_path, tables, target_table=None, columns=None, where=None,
+                 truncate=False):
+        """Transfers tables from the source config to the target config, returning one result dict per table.
+
+        target_table renames a single table on the way, columns limits the copied columns (the target must
+        have columns of the same names), where filters the source rows and truncate empties the target
+        table first, within the same transaction.
+        """
+        if isinstance(tables, str):
+            tables = [tables]
+        if not tables:
+            raise ValueError("Pass at least one table to transfer.")
+        if target_table and len(tables) > 1:
+            raise ValueError("A target table name can only be given when transferring a single table.")
+        source = default_config_loader.load(source_config_path)
+        target = default_config_loader.load(target_config_path)
+        for dbconfig in (source, target):
+            if dbconfig.connection_type == 'sharded':
+                raise ValueError("Transfers are not supported by the 'sharded' connection type, "
+                                 "transfer each shard's config.")
+        # SQLite has a single writer, parallel table writes would only queue on its lock.
+        workers = 1 if target.database_type == 'sqlite' else min(self.workers, len(tables))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.transfer_table, source, target, table, target_table or table, columns,
+                                       where, truncate) for table in tables]
+            return [future.result() for future in futures]
+
+    def transfer_table(self, source, target, table, target_table, columns=None, where=None, truncate=False):
+        start = time.perf_counter()
+        # Raw COPY data only makes sense when both ends speak it.
+        raw = source.database_type == 'postgresql' and target.database_type == 'postgresql'
+        batches = queue.Queue(maxsize=max(self.queue_depth, 1))
+        stop = threading.Event()
+        reader = threading.Thread(target=self._read, args=(source, table, columns, where, raw, batches, stop),
+                                  name=f'dblinker-transfer-{table}', daemon=True)
+        reader.start()
+        try:
+            names = self._take(batches)
+            if target.database_type == 'postgresql':
+                rows = self.write_postgres(target, target_table, names, self._drain(batches), raw, truncate)
+            else:
+                rows = self.write_sqlite(target, target_table, names, self._drain(batches), truncate)
+        finally:
+            stop.set()
+            reader.join()
+        return {'table': table, 'target': target_table, 'rows': rows,
+                'seconds': round(time.perf_counter() - start, 3)}
+
+    @staticmethod
+    def _take(batches):
+        item = batches.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _drain(self, batches):
+        while True:
+            item = self._take(batches)
+            if item is _END:
+                return
+            yield item
+
+    def _read(self, dbconfig, table, columns, where, raw, batches, stop):
+        """Runs in the reader thread: puts the column names, then batches, then _END or the error raised."""
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise _Stopped()
+
+        try:
+            if dbconfig.database_type == 'postgresql':
+                self.read_postgres(dbconfig, table, columns, where, raw, put)
+            else:
+                self.read_sqlite(dbconfig, table, columns, where, put)
+            put(_END)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            try:
+                put(e)
+            except _Stopped:
+                pass
+
+    def read_postgres(self, dbconfig, table, columns, where, raw, put):
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns)) if columns else sql.SQL('*')
+        query = sql.SQL("SELECT {columns} FROM {table} WHERE ({where})").format(
+            columns=column_list, table=sql.Identifier(*table.split('.')), where=sql.SQL(where or 'true'))
+        with connect(dbconfig.conninfo) as conn:
+            if raw:
+                names = [column.name for column in
+                         conn.execute(sql.SQL("SELECT * FROM ({query}) s LIMIT 0").format(query=query)).description]
+                put(names)
+                block, size = [], 0
+                with conn.cursor() as cur, cur.copy(sql.SQL("COPY ({query}) TO STDOUT").format(query=query)) as copy:
+                    for data in copy:
+                        block.append(bytes(data))
+                        size += len(data)
+                        if size >= RAW_BLOCK_SIZE:
+                            put(block)
+                            block, size = [], 0
+                if block:
+                    put(block)
+                return
+            # A server-side cursor keeps only one batch of rows in memory at a time.
+            with conn.transaction(), conn.cursor(name='dblinker_transfer') as cur:
+                cur.execute(query)
+                put([column.name for column in cur.description])
+                while True:
+                    rows = cur.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    put(rows)
+
+    def read_sqlite(self, dbconfig, table, columns, where, put):
+        column_list = ', '.join(map(sqlite_identifier, columns)) if columns else '*'
+        connection = open_sqlite(dbconfig, read_only=True)
+        try:
+            # One statement reads one consistent snapshot of the table, even while other processes write.
+            cursor = connection.execute(f"SELECT {column_list} FROM {sqlite_identifier(table)} "
+                                        f"WHERE ({where or '1'})")
+            put([column[0] for column in cursor.description])
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                put(rows)
+            cursor.close()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def write_postgres(dbconfig, table, names, batches, raw, truncate):
+        table_id = sql.Identifier(*table.split('.'))
+        statement = sql.SQL("COPY {table} ({columns}) FROM STDIN").format(
+            table=table_id, columns=sql.SQL(', ').join(map(sql.Identifier, names)))
+        rows = 0
+        with connect(dbconfig.conninfo) as conn, conn.transaction():
+            if truncate:
+                conn.execute(sql.SQL("TRUNCATE {table}").format(table=table_id))
+            with conn.cursor() as cur, cur.copy(statement) as copy:
+                for batch in batches:
+                    if raw:
+                        copy.write(b''.join(batch))
+                    else:
+                        for row in batch:
+                            copy.write_row(row)
+                    rows += len(batch)
+        return rows
+
+    @staticmethod
+    def write_sqlite(dbconfig, table, names, batches, truncate):
+        connection = open_sqlite(dbconfig)
+        insert = (f"INSERT INTO {sqlite_identifier(table)} ({', '.join(map(sqlite_identifier, names))}) "
+                  f"VALUES ({', '.join('?' * len(names))})")
+        rows = 0
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if truncate:
+                    connection.execute(f"DELETE FROM {sqlite_identifier(table)}")
+                for batch in batches:
+                    # Every row is checked, a column that is NULL in the first row may hold Decimals further down.
+                    if not all(isinstance(value, SQLITE_NATIVE_TYPES) for row in batch for value in row):
+                        batch = [tuple(map(sqlite_value, row)) for row in batch]
+                    connection.executemany(insert, batch)
+                    rows += len(batch)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+        return rows
+
+    @staticmethod
+    def print_results(results, elapsed):
+        for result in results:
+            rate = result['rows'] / result['seconds'] if result['seconds'] > 0 else 0
+            target = f" -> {result['target']}" if result['target'] != result['table'] else ''
+            print(f"  {result['table']}{target:<24} {result['rows']:>12,} rows  {result['seconds']:>8.2f}s  "
+                  f"{rate:>10,.0f} rows/s")
+        total = sum(result['rows'] for result in results)
+        rate = total / elapsed if elapsed > 0 else 0
+        print(f"Transferred {total:,} rows in {len(results)} tables in {elapsed:.2f}s ({rate:,.0f} rows/s)")
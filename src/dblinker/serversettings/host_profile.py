@@ -0,0 +1,97 @@
+import os
+import re
+from pathlib import Path
+
+STORAGE_TYPES = ('ssd', 'hdd', 'san')
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2, 'g': 1024 ** 3, 'gb': 1024 ** 3,
+               't': 1024 ** 4, 'tb': 1024 ** 4}
+
+
+def parse_size(value):
+    """Parses '16GB', '512MB' or a plain byte count into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).lower() not in _SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value}. Use a number with an optional unit such as 16GB or 512MB.")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def format_size(size):
+    """Formats bytes the way postgresql.conf expects, in the largest whole unit."""
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('kB', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    # postgresql.conf has no byte unit for memory settings, round down to kB.
+    return f"{max(size // 1024, 1)}kB"
+
+
+class HostProfile:
+    """The RAM, CPU count and storage type of the machine a database server runs on."""
+
+    def __init__(self, ram_bytes, cpus, storage='ssd'):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unsupported storage type: {storage}. Supported types are: {', '.join(STORAGE_TYPES)}")
+        self.ram_bytes = int(ram_bytes)
+        self.cpus = max(int(cpus), 1)
+        self.storage = storage
+        # Which values were measured on this machine rather than given, shown alongside the suggestions.
+        self.detected = set()
+
+    @classmethod
+    def from_options(cls, ram=None, cpus=None, storage=None):
+        """Uses the given values and detects the missing ones on the local machine."""
+        detected = set()
+        if ram is None:
+            ram_bytes = cls.detect_ram()
+            detected.add('ram')
+        else:
+            ram_bytes = parse_size(ram)
+        if cpus is None:
+            cpus = cls.detect_cpus()
+            detected.add('cpus')
+        if storage is None:
+            storage = cls.detect_storage()
+            detected.add('storage')
+        profile = cls(ram_bytes, cpus, storage)
+        profile.detected = detected
+        return profile
+
+    @staticmethod
+    def detect_ram():
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemTotal:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        try:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (ValueError, OSError, AttributeError):
+            raise ValueError("Could not detect the amount of RAM, pass it explicitly, e.g. --ram 16GB.")
+
+    @staticmethod
+    def detect_cpus():
+        # The CPUs this process may run on, which respects container and taskset limits where supported.
+        if hasattr(os, 'sched_getaffinity'):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def detect_storage():
+        """'hdd' when every local block device reports itself as rotational, 'ssd' otherwise."""
+        flags = []
+        for path in Path('/sys/block').glob('*/queue/rotational'):
+            if path.parent.parent.name.startswith(('loop', 'ram', 'zram')):
+                continue
+            try:
+                flags.append(path.read_text().strip() == '1')
+            except OSError:
+                continue
+        return 'hdd' if flags and all(flags) else 'ssd'
+
+    def describe(self):
+        def source(name):
+            return ' (detected)' if name in self.detected else ''
+
+        return (f"RAM {format_size(self.ram_bytes - self.ram_bytes % (1024 ** 2))}{source('ram')}, "
+                f"{self.cpus} CPUs{source('cpus')}, {self.storage} storage{source('storage')}")
@@ -1,15 +1,74 @@
+import math
 import yaml
+from dblinker.common.config.config_loader import default_config_loader
+from dblinker.serversettings.host_profile import HostProfile, format_size
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+# Planner and I/O settings per storage type, SANs usually have many spindles or flash behind them.
+STORAGE_SETTINGS = {
+    'ssd': {'random_page_cost': 1.1, 'effective_io_concurrency': 200},
+    'hdd': {'random_page_cost': 4.0, 'effective_io_concurrency': 2},
+    'san': {'random_page_cost': 1.1, 'effective_io_concurrency': 300},
+}
+# Extra room over the summed pools for admin sessions, monitoring and migrations.
+CONNECTION_HEADROOM = 1.1
+MIN_MAX_CONNECTIONS = 20
+
+
+def server_endpoint(connection_settings):
+    """The (host, port) a set of connection settings points at, which is what max_connections applies to."""
+    return (str(connection_settings.get('host') or 'localhost'), int(connection_settings.get('port') or 5432))
+
+
+def pool_max_size(pool_settings, default=4):
+    """The most connections a pool opens, psycopg_pool's max_size defaults to min_size."""
+    return int(pool_settings.get('max_size') or pool_settings.get('min_size', default))
+
+
+def config_connections(dbconfig):
+    """Yields ((host, port), connections) for every server a loaded PostgreSQL config opens connections to."""
+    connection_type = dbconfig.connection_type
+    if connection_type in ('normal', 'async'):
+        yield server_endpoint(dbconfig.connection_settings), 1
+    elif connection_type == 'pool':
+        yield server_endpoint(dbconfig.connection_settings), pool_max_size(dbconfig.pool_settings)
+    elif connection_type == 'async_pool':
+        yield server_endpoint(dbconfig.connection_settings), pool_max_size(dbconfig.async_pool_settings)
+    elif connection_type == 'routing':
+        # One pool per host, all sized by pool_settings.
+        size = pool_max_size(dbconfig.pool_settings)
+        yield server_endpoint(dbconfig.connection_settings), size
+        for replica in dbconfig.replicas:
+            yield server_endpoint(replica), size
+    elif connection_type == 'sharded':
+        # One async pool per shard, a shard config's own async_pool_settings win over the router's.
+        for shard in dbconfig.shards:
+            if 'config' in shard:
+                shard_config = default_config_loader.load(shard['config'])
+                settings = shard_config.async_pool_settings or dbconfig.async_pool_settings
+                yield server_endpoint(shard_config.connection_settings), pool_max_size(settings)
+            else:
+                yield server_endpoint(shard), pool_max_size(dbconfig.async_pool_settings)
+
 
 class PostgresServerConfigGenerator:
-    def __init__(self, yaml_file_path):
+    def __init__(self, yaml_file_path, host_profile=None, config_dir=None, instances=1):
         self.yaml_file_path = yaml_file_path
+        self.dbconfig = None
         self.config = self.read_yaml()  # Read the configuration file upon instantiation
+        # The machine the server runs on, detected locally unless given.
+        self.host_profile = host_profile
+        # Every dbconfig in this directory that points at the same server adds its pools to max_connections.
+        self.config_dir = config_dir
+        # How many application processes open each config's connections, pools are per process.
+        self.instances = max(int(instances), 1)
 
     def read_yaml(self):
-        """Reads the YAML configuration file."""
+        """Reads the YAML configuration file through the shared config loader cache."""
         try:
-            with open(self.yaml_file_path, 'r') as file:
-                return yaml.safe_load(file)
+            self.dbconfig = default_config_loader.load(self.yaml_file_path)
+            return self.dbconfig.as_dict()
         except FileNotFoundError:
             print(f"Error: File not found - {self.yaml_file_path}")
         except yaml.YAMLError as e:
@@ -35,22 +94,75 @@ class PostgresServerConfigGenerator:
             entries.append(entry)
         return entries
 
+    def count_connections(self):
+        """Returns (total, [(config path, connections)]) for the server this config points at.
+
+        Without a config directory only this config's pools count.
+        """
+        endpoint = server_endpoint(self.dbconfig.connection_settings)
+        dbconfigs = [self.dbconfig]
+        if self.config_dir:
+            dbconfigs = [c for c in default_config_loader.load_directory(self.config_dir)
+                         if c.database_type == 'postgresql']
+            if not any(c.path == self.dbconfig.path for c in dbconfigs):
+                dbconfigs.insert(0, self.dbconfig)
+        breakdown = []
+        for dbconfig in dbconfigs:
+            connections = sum(count for target, count in config_connections(dbconfig) if target == endpoint)
+            if connections:
+                breakdown.append((dbconfig.path, connections * self.instances))
+        return sum(count for _, count in breakdown), breakdown
+
     def generate_postgresql_conf(self):
-        """Generates minimal entries for postgresql.conf to ensure compatibility based on connection pooling settings."""
+        """Generates entries for postgresql.conf: max_connections sized from the pools plus a performance profile."""
         settings = []
-        connection_type = self.config['postgresql']['connection_type']
-        if connection_type in ['pool', 'async_pool']:
-            pool_settings = self.config['postgresql'].get('pool_settings', {})
-            max_size = pool_settings.get('max_size', 100)
-            max_connections = int(max_size * 1.1)
-            settings.append(f"max_connections = {max_connections}")
-        else:
-            settings.append("max_connections = 20")
+        total, _ = self.count_connections()
+        max_connections = max(math.ceil(total * CONNECTION_HEADROOM), MIN_MAX_CONNECTIONS)
+        settings.append(f"max_connections = {max_connections}")
+        settings.extend(self.generate_performance_settings(max_connections))
 
         # Generate SSL settings
         settings.extend(self.generate_ssl_settings())
         return settings
 
+    def generate_performance_settings(self, max_connections):
+        """Memory, parallelism, WAL and planner settings sized for the host, for a mixed OLTP/reporting load."""
+        if self.host_profile is None:
+            self.host_profile = HostProfile.from_options()
+        ram = self.host_profile.ram_bytes
+        cpus = self.host_profile.cpus
+        storage = STORAGE_SETTINGS[self.host_profile.storage]
+
+        # Whole megabytes keep the values readable, the OS page cache holds the rest of the data.
+        shared_buffers = ram // 4 // MB * MB
+        effective_cache_size = ram * 3 // 4 // MB * MB
+        maintenance_work_mem = min(ram // 16 // MB * MB, 2 * GB)
+        # 3% of shared_buffers, 16MB is a full WAL segment and gains nothing above it.
+        wal_buffers = min(max(shared_buffers * 3 // 100 // 1024 * 1024, 64 * 1024), 16 * MB)
+        # No parallel queries on one CPU, and more than 4 workers per query rarely pays off.
+        workers_per_gather = min(cpus // 2, 4)
+        # Every connection can run a few sorts or hashes at once, each parallel worker gets its own work_mem.
+        work_mem = (ram - shared_buffers) // (max_connections * 3) // max(workers_per_gather, 1)
+        work_mem = max(work_mem // MB * MB if work_mem >= MB else work_mem // 1024 * 1024, 64 * 1024)
+
+        return [
+            f"shared_buffers = {format_size(shared_buffers)}  # 25% of RAM",
+            f"effective_cache_size = {format_size(effective_cache_size)}  # 75% of RAM",
+            f"work_mem = {format_size(work_mem)}  # (RAM - shared_buffers) / (max_connections * 3) / parallel workers",
+            f"maintenance_work_mem = {format_size(maintenance_work_mem)}",
+            f"max_worker_processes = {max(cpus, 8)}",
+            f"max_parallel_workers = {cpus}",
+            f"max_parallel_workers_per_gather = {workers_per_gather}",
+            f"max_parallel_maintenance_workers = {workers_per_gather}",
+            f"wal_buffers = {format_size(wal_buffers)}",
+            "checkpoint_timeout = 15min",
+            "checkpoint_completion_target = 0.9",
+            "min_wal_size = 1GB",
+            "max_wal_size = 4GB",
+            f"random_page_cost = {storage['random_page_cost']}",
+            f"effective_io_concurrency = {storage['effective_io_concurrency']}",
+        ]
+
     def generate_ssl_settings(self):
         """Generates SSL configuration entries for postgresql.conf based on client settings."""
         ssl_settings = []
@@ -66,8 +178,15 @@ class PostgresServerConfigGenerator:
         if self.config:
             pg_hba_entries = self.generate_pg_hba_entry()
             postgresql_conf_entries = self.generate_postgresql_conf()
+            total, breakdown = self.count_connections()
             print("1) Database type detected: PostgreSQL\n")
-            print("2) Minimal database server settings needed for this config file:\n")
+            print(f"   Host: {self.host_profile.describe()}")
+            instances = f" ({self.instances} instances each)" if self.instances > 1 else ""
+            print(f"   Connections from dbconfigs: {total}{instances}")
+            for path, connections in breakdown:
+                print(f"     {connections:>5}  {path}")
+            print()
+            print("2) Database server settings suggested for this config file:\n")
 
             # Print pg_hba.conf configurations if they exist
             if len(pg_hba_entries) > 1:  # More than just the header
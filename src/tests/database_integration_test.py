@@ -1,30 +1,48 @@
 from dblinker.managers.dbconnection_manager import DBConnectionManager
-import yaml
+from dblinker.connections.pool_registry import PoolRegistry
+from dblinker.common.config.config_loader import default_config_loader
 
 
 class DatabaseIntegrationTest:
     def __init__(self):
-        self.dbconnection_manager = DBConnectionManager()
+        # A private registry, so the pools opened for a test are closed once the test is over.
+        self.pool_registry = PoolRegistry()
+        self.dbconnection_manager = DBConnectionManager(pool_registry=self.pool_registry)
 
     async def test_postgresql_connection(self, config_file_path):
         try:
             # Retrieve the database connection; assume it's already prepared to be used as an async context manager
             connection = await self.dbconnection_manager.get_database_connection(config_file_path)
 
-            # Read the configuration file to determine the connection type
-            with open(config_file_path, 'r') as config_file:
-                config = yaml.safe_load(config_file)
+            # The configuration was parsed by the connection manager, this is served from the loader's cache
+            dbconfig = default_config_loader.load(config_file_path)
 
-            if config['postgresql']['connection_type'] in ['normal', 'pool']:
+            if dbconfig.connection_type in ['normal', 'pool', 'routing']:
                 with connection as sync_connection:
                     sync_connection.test_connection()
-            elif config['postgresql']['connection_type'] in ['async', 'async_pool']:
+            elif dbconfig.connection_type in ['async', 'async_pool', 'sharded']:
                 async with connection as async_connection:
                     await async_connection.test_connection()
 
         except Exception as e:
             print(f"An error occurred while testing the connection: {e}")
+        finally:
+            await self.pool_registry.aclose_all()
 
-    def test_sqlite_connection(self, config_file_path):
+    async def test_sqlite_connection(self, config_file_path):
         print(f"Testing SQLite connection... {config_file_path}")
-        # SQLite testing logic goes here
+        try:
+            connection = await self.dbconnection_manager.get_database_connection(config_file_path)
+            dbconfig = default_config_loader.load(config_file_path)
+
+            if dbconfig.connection_type in ['normal', 'pool']:
+                with connection as sync_connection:
+                    sync_connection.test_connection()
+            elif dbconfig.connection_type in ('async', 'async_pool'):
+                async with connection as async_connection:
+                    await async_connection.test_connection()
+
+        except Exception as e:
+            print(f"An error occurred while testing the connection: {e}")
+        finally:
+            await self.pool_registry.aclose_all()
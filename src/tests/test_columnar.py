@@ -0,0 +1,95 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from dblinker.common.columnar import ColumnarBuilder, ColumnarResult, concat_columnar, _to_utc_naive
+
+
+def test_append_fills_typed_columns_and_masks_nulls():
+    builder = ColumnarBuilder(['id', 'price', 'name'], ['int64', 'float64', 'object'])
+    builder.append([(1, 1.5, 'a'), (2, None, None)])
+    builder.append([(None, 3.0, 'c')])
+    result = builder.result()
+    assert result.row_count == 3
+    assert result['id'].dtype == numpy.int64
+    assert result['id'].tolist() == [1, 2, 0]
+    assert numpy.isnan(result['price'][1])
+    assert result['name'].tolist() == ['a', None, 'c']
+    assert result.masks['id'].tolist() == [False, False, True]
+    assert result.masks['price'].tolist() == [False, True, False]
+    assert result.masks['name'].tolist() == [False, True, False]
+    assert result.masked('id').sum() == 3
+
+
+def test_append_keeps_array_values_in_object_columns():
+    builder = ColumnarBuilder(['tags', 'vector'], ['object', 'object'])
+    builder.append([(['a', 'b'], numpy.array([1, 2])), (None, numpy.array([3, 4])), (['c', 'd'], None)])
+    result = builder.result()
+    assert result['tags'].shape == (3,)
+    assert result['tags'][0] == ['a', 'b']
+    assert result['tags'][1] is None
+    assert result['vector'][1].tolist() == [3, 4]
+    assert result.masks['vector'].tolist() == [False, False, True]
+
+
+def test_arrays_grow_past_expected_rows():
+    builder = ColumnarBuilder(['id'], ['int32'], expected_rows=2)
+    for start in range(0, 9, 3):
+        builder.append([(value,) for value in range(start, start + 3)])
+    result = builder.result()
+    assert result['id'].tolist() == list(range(9))
+    assert result['id'].dtype == numpy.int32
+
+
+def test_unique_column_names_are_required():
+    with pytest.raises(ValueError):
+        ColumnarBuilder(['id', 'id'], ['int64', 'int64'])
+
+
+def test_datetime_columns_and_utc_conversion():
+    builder = ColumnarBuilder(['at'], ['datetime64[us]'])
+    builder.converters = [_to_utc_naive]
+    builder.append([(datetime(2024, 1, 1, 12, tzinfo=timezone(timedelta(hours=2))),), (None,)])
+    result = builder.result()
+    assert result['at'][0] == numpy.datetime64('2024-01-01T10:00:00')
+    assert numpy.isnat(result['at'][1])
+
+
+def test_for_postgres_keeps_array_columns_as_objects():
+    pytest.importorskip('psycopg')
+    from psycopg.postgres import types
+    column = namedtuple('Column', 'name type_code')
+    int4 = types.get('int4')
+    builder = ColumnarBuilder.for_postgres([column('id', int4.oid), column('ids', int4.array_oid)])
+    assert [dtype.kind for dtype in builder.dtypes] == ['i', 'O']
+    builder.append([(1, [1, 2]), (2, [3])])
+    assert builder.result()['ids'].tolist() == [[1, 2], [3]]
+
+
+def build(rows):
+    builder = ColumnarBuilder(['id', 'tags'], ['int64', 'object'])
+    builder.append(rows)
+    return builder.result()
+
+
+def test_concat_columnar_joins_columns_and_masks():
+    first = build([(1, ['a']), (2, None)])
+    second = build([(None, ['b', 'c'])])
+    result = concat_columnar([first, second])
+    assert result['id'].tolist() == [1, 2, 0]
+    assert result['tags'].tolist() == [['a'], None, ['b', 'c']]
+    assert result.masks['tags'].tolist() == [False, True, False]
+    assert result.masks['id'].tolist() == [False, False, True]
+    assert concat_columnar([first]) is first
+
+
+def test_concat_columnar_rejects_mismatched_columns():
+    first = ColumnarResult({'id': numpy.array([1])}, {})
+    second = ColumnarResult({'other': numpy.array([2])}, {})
+    with pytest.raises(ValueError):
+        concat_columnar([first, second])
+    with pytest.raises(ValueError):
+        concat_columnar([])
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from dblinker.connections.pool_registry import PoolRegistry
+
+
+def sqlite_config(path, connection_type):
+    return {'sqlite': {'connection_type': connection_type, 'file_location': str(path)}}
+
+
+def test_async_requests_release_idle_sync_and_async_pools(tmp_path):
+    registry = PoolRegistry(idle_timeout=0.05)
+    sync_pool = registry.get_pool(sqlite_config(tmp_path / 'sync.db', 'pool'))
+    assert sync_pool.execute('SELECT 1') == [(1,)]
+
+    async def main():
+        first = await registry.get_async_pool(sqlite_config(tmp_path / 'first.db', 'async_pool'))
+        await first.execute('SELECT 1')
+        await asyncio.sleep(0.1)
+        # Both idle pools, the synchronous one included, are released by this request.
+        second = await registry.get_async_pool(sqlite_config(tmp_path / 'second.db', 'async_pool'))
+        assert len(registry) == 1
+        assert sync_pool.open_connection_count() == 0
+        # Released pools stay usable and are handed out again.
+        assert await first.execute('SELECT 2') == [(2,)]
+        again = await asyncio.wait_for(
+            registry.get_async_pool(sqlite_config(tmp_path / 'first.db', 'async_pool')), 5)
+        assert again is first
+        assert await second.execute('SELECT 3') == [(3,)]
+        await registry.aclose_all()
+
+    asyncio.run(main())
+    assert sync_pool.execute('SELECT 4') == [(4,)]
+    registry.close_all()
+
+
+def test_failed_release_does_not_leave_waiters_hanging(tmp_path, monkeypatch):
+    registry = PoolRegistry(idle_timeout=0.05)
+    broken = registry.get_pool(sqlite_config(tmp_path / 'broken.db', 'pool'))
+
+    def fail():
+        raise RuntimeError('release failed')
+
+    monkeypatch.setattr(broken, 'release', fail)
+    time.sleep(0.1)
+
+    async def main():
+        config = sqlite_config(tmp_path / 'async.db', 'async_pool')
+        try:
+            await registry.get_async_pool(config)
+        except RuntimeError:
+            pass
+        assert not registry._connecting
+        pool = await asyncio.wait_for(registry.get_async_pool(config), 5)
+        assert await pool.execute('SELECT 1') == [(1,)]
+        monkeypatch.undo()
+        await registry.aclose_all()
+
+    asyncio.run(main())
+
+
+def test_pools_in_use_are_not_released(tmp_path):
+    registry = PoolRegistry(idle_timeout=0.05)
+    pool = registry.get_pool(sqlite_config(tmp_path / 'busy.db', 'pool'))
+    pool.execute('CREATE TABLE t (x INTEGER)')
+    pool.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(100)])
+    # A caller keeps using the pool without asking the registry for it again.
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        pool.execute('SELECT count(*) FROM t')
+        registry.evict_idle()
+        assert len(registry) == 1
+        time.sleep(0.01)
+    # An open stream holds its connection, the pool stays open however long it has been idle.
+    rows = pool.stream('SELECT x FROM t ORDER BY x', batch_size=10)
+    assert next(rows) == (0,)
+    time.sleep(0.1)
+    registry.evict_idle()
+    assert pool.in_use()
+    assert len(list(rows)) == 99
+    assert not pool.in_use()
+    time.sleep(0.1)
+    registry.evict_idle()
+    assert len(registry) == 0
+    assert pool.open_connection_count() == 0
+    registry.close_all()
@@ -0,0 +1,49 @@
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from dblinker.common.config.config_loader import DBConfig
+from dblinker.managers.transfer_manager import TransferManager, sqlite_value
+
+
+def sqlite_target(path):
+    return DBConfig({'sqlite': {'connection_type': 'normal', 'file_location': str(path)}})
+
+
+def test_sqlite_value_converts_non_native_types():
+    assert sqlite_value(None) is None
+    assert sqlite_value(Decimal('1.50')) == '1.50'
+    assert sqlite_value({'a': 1}) == '{"a": 1}'
+    assert sqlite_value(memoryview(b'ab')) == b'ab'
+    assert sqlite_value(date(2024, 1, 2)) == '2024-01-02'
+
+
+def test_write_sqlite_converts_values_after_nulls_in_the_first_row(tmp_path):
+    database = tmp_path / 'target.db'
+    with sqlite3.connect(database) as connection:
+        connection.execute('CREATE TABLE t (id INTEGER, amount TEXT, day TEXT)')
+    batches = [[(1, None, None), (2, Decimal('9.99'), date(2024, 5, 1))], [(3, Decimal('0.01'), None)]]
+    rows = TransferManager.write_sqlite(sqlite_target(database), 't', ['id', 'amount', 'day'], iter(batches),
+                                        truncate=False)
+    assert rows == 3
+    with sqlite3.connect(database) as connection:
+        assert connection.execute('SELECT * FROM t ORDER BY id').fetchall() == [
+            (1, None, None), (2, '9.99', '2024-05-01'), (3, '0.01', None)]
+
+
+def test_write_sqlite_rolls_back_on_error(tmp_path):
+    database = tmp_path / 'target.db'
+    with sqlite3.connect(database) as connection:
+        connection.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        connection.execute('INSERT INTO t VALUES (1)')
+
+    def batches():
+        yield [(2,)]
+        raise RuntimeError('source failed')
+
+    with pytest.raises(RuntimeError):
+        TransferManager.write_sqlite(sqlite_target(database), 't', ['id'], batches(), truncate=True)
+    with sqlite3.connect(database) as connection:
+        assert connection.execute('SELECT id FROM t').fetchall() == [(1,)]